@@ -0,0 +1,97 @@
+import copy
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from guides.lrucache import LRUCache
+
+User = get_user_model()
+
+TOKEN_EXPIRE_SECONDS = getattr(settings, 'TOKEN_EXPIRE_SECONDS', 1209600)  # 默认2周
+TOKEN_CACHE_TTL = getattr(settings, 'TOKEN_CACHE_TTL', 60)
+token_cache = LRUCache(
+    max_entries=getattr(settings, 'TOKEN_CACHE_MAX_ENTRIES', 10000),
+    ttl=TOKEN_CACHE_TTL,
+)
+
+
+def revoked_key(user_id):
+    return f'auth:tokens-revoked:{user_id}'
+
+
+def revoke_tokens(user_id):
+    """在共享缓存中记录撤销时间：所有工作进程命中本地缓存时发现早于该时间的条目并重新查库"""
+    cache.set(revoked_key(user_id), time.time(), TOKEN_CACHE_TTL + 1)
+
+
+def token_expired(token):
+    return token.created + timedelta(seconds=TOKEN_EXPIRE_SECONDS) <= timezone.now()
+
+
+def issue_token(user):
+    """获取用户令牌，已过期的令牌会被轮换为新令牌"""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and token_expired(token):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    带进程内LRU缓存的令牌认证
+    令牌→用户的解析结果缓存 TOKEN_CACHE_TTL 秒，命中时不查数据库，只读一次共享缓存中的撤销标记；
+    令牌删除、用户停用时通过信号清除本进程缓存并写入撤销时间，其他工作进程据此失效各自的缓存；
+    过期检查使用缓存中的创建时间。
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is not None:
+            token, fetched_at = entry
+            revoked_at = cache.get(revoked_key(token.user_id))
+            if revoked_at is not None and revoked_at >= fetched_at:
+                token_cache.delete(key)
+                entry = None
+        if entry is None:
+            # 记录查询开始的时间：查询期间发生的撤销时间不早于它，下次命中时同样会失效
+            fetched_at = time.time()
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('无效的令牌')
+            token_cache.set(key, (token, fetched_at))
+
+        if not token.user.is_active:
+            token_cache.delete(key)
+            raise exceptions.AuthenticationFailed('用户已停用或已删除')
+
+        if token_expired(token):
+            token_cache.delete(key)
+            Token.objects.filter(key=key).delete()
+            raise exceptions.AuthenticationFailed('令牌已过期，请重新登录')
+
+        # 每个请求拿到独立的用户对象，避免跨请求共享关联缓存
+        return (copy.copy(token.user), token)
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+    revoke_tokens(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def evict_inactive_user_tokens(sender, instance, **kwargs):
+    if not instance.is_active:
+        token_cache.delete_where(lambda key, entry: entry[0].user_id == instance.pk)
+        revoke_tokens(instance.pk)
@@ -0,0 +1,8 @@
+from rest_framework.pagination import PageNumberPagination
+
+
+class GuidePagination(PageNumberPagination):
+    """攻略列表分页（?page=、?page_size=，单页最多100条）"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,54 @@
+"""高速JSON渲染/解析
+
+安装了 orjson 时使用 orjson，否则退回标准库 json（紧凑分隔符、不转义中文）。
+由视图通过 renderer_classes / parser_classes 按需选用。
+"""
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于部署环境
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def loads(content):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class FastJSONRenderer(BaseRenderer):
+    """使用 orjson（可用时）的JSON渲染器"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+class FastJSONParser(BaseParser):
+    """使用 orjson（可用时）的JSON解析器"""
+    media_type = 'application/json'
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON解析错误 - {exc}')
@@ -1,18 +1,79 @@
 from rest_framework import serializers
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from guides.models import Guide, ChatMessage
+from guides.chatfilter import check_message
+from guides.fingerprints import find_duplicate
+from guides.likes import MODES, TOGGLE
+from guides.models import Guide, ChatMessage, UserProfile
+from guides.profiles import get_profile
 
 User = get_user_model()
 
+class UserProfileSerializer(serializers.ModelSerializer):
+    """用户资料序列化器"""
+    
+    class Meta:
+        model = UserProfile
+        fields = ('avatar', 'bio', 'level', 'experience', 'games_played', 'wins', 'win_rate')
+        read_only_fields = ('level', 'experience', 'games_played', 'wins', 'win_rate')
+    
+    def update(self, instance, validated_data):
+        # 只写回修改的字段，避免缓存中的旧战绩覆盖数据库
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
 class UserSerializer(serializers.ModelSerializer):
-    """用户序列化器"""
+    """用户序列化器（查询集应 select_related('userprofile') 以免逐条查询资料）"""
+    profile = serializers.SerializerMethodField()
     
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined')
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'profile')
         read_only_fields = ('id', 'date_joined')
+    
+    def get_profile(self, obj):
+        return UserProfileSerializer(get_profile(obj)).data
+
+class AuthorSummarySerializer(serializers.ModelSerializer):
+    """作者摘要序列化器（列表默认使用，?expand=author 时替换为完整的 UserSerializer）"""
+    
+    class Meta:
+        model = User
+        fields = ('id', 'username')
+        read_only_fields = fields
+
+def parse_field_list(value):
+    """'a, b,c' -> {'a', 'b', 'c'}"""
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class SparseFieldsMixin:
+    """
+    稀疏字段集：?fields=a,b 只返回指定字段，?expand=x 加入 expandable_fields 中的可选字段
+    只对GET请求生效，写操作仍使用完整字段
+    """
+    expandable_fields = {}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        
+        expand = parse_field_list(request.query_params.get('expand'))
+        for name in expand & set(self.expandable_fields):
+            self.fields[name] = self.expandable_fields[name]()
+        
+        requested = parse_field_list(request.query_params.get('fields'))
+        if requested:
+            for name in set(self.fields) - requested - expand:
+                self.fields.pop(name)
 
 class UserRegisterSerializer(serializers.ModelSerializer):
     """用户注册序列化器"""
@@ -47,19 +108,24 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         validated_data['password'] = make_password(validated_data['password'])
         return User.objects.create(**validated_data)
 
-class GuideListSerializer(serializers.ModelSerializer):
-    """攻略列表序列化器"""
-    author = UserSerializer(read_only=True)
+class GuideListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """攻略列表序列化器（只返回摘要，查询集应 defer 正文字段）"""
+    author = AuthorSummarySerializer(read_only=True)
     likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     
     class Meta:
         model = Guide
         fields = (
-            'id', 'title', 'content', 'category', 'tags', 
+            'id', 'title', 'excerpt', 'category', 'tags', 
             'author', 'created_at', 'updated_at', 'views', 
-            'likes_count', 'is_liked', 'cover_image'
+            'likes_count', 'is_liked', 'cover_image', 'hot_score'
         )
+        read_only_fields = ('excerpt', 'hot_score')
+    
+    expandable_fields = {
+        'author': lambda: UserSerializer(read_only=True),
+    }
     
     def get_likes_count(self, obj):
         return obj.liked_by.count()
@@ -70,8 +136,8 @@ class GuideListSerializer(serializers.ModelSerializer):
             return obj.liked_by.filter(id=request.user.id).exists()
         return False
 
-class GuideSerializer(serializers.ModelSerializer):
-    """攻略详情序列化器"""
+class GuideSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """攻略详情序列化器（点赞用户列表需 ?expand=liked_by）"""
     author = UserSerializer(read_only=True)
     likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
@@ -81,9 +147,13 @@ class GuideSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'title', 'content', 'category', 'tags', 
             'author', 'created_at', 'updated_at', 'views', 
-            'liked_by', 'likes_count', 'is_liked', 'cover_image'
+            'likes_count', 'is_liked', 'cover_image', 'hot_score'
         )
-        read_only_fields = ('created_at', 'updated_at', 'views', 'liked_by')
+        read_only_fields = ('created_at', 'updated_at', 'views', 'hot_score')
+    
+    expandable_fields = {
+        'liked_by': lambda: serializers.PrimaryKeyRelatedField(many=True, read_only=True),
+    }
     
     def get_likes_count(self, obj):
         return obj.liked_by.count()
@@ -93,6 +163,14 @@ class GuideSerializer(serializers.ModelSerializer):
         if request and request.user.is_authenticated:
             return obj.liked_by.filter(id=request.user.id).exists()
         return False
+    
+    def validate_content(self, value):
+        duplicate = find_duplicate(value, exclude=self.instance.pk if self.instance else None)
+        if duplicate:
+            raise serializers.ValidationError(
+                f"内容与已有攻略（ID {duplicate[0]}）重复（相似度 {duplicate[1]:.0%}）", code='duplicate'
+            )
+        return value
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     """聊天消息序列化器"""
@@ -111,7 +189,10 @@ class SendMessageSerializer(serializers.Serializer):
     def validate_message(self, value):
         if not value.strip():
             raise serializers.ValidationError("消息内容不能为空")
-        return value.strip()
+        result = check_message(value.strip())
+        if result.rejected:
+            raise serializers.ValidationError("消息包含违规内容，未发送")
+        return result.text
     
     def validate_room_name(self, value):
         valid_rooms = ['general', 'strategy', 'newbie', 'team']
@@ -124,4 +205,171 @@ class ChatRoomSerializer(serializers.Serializer):
     name = serializers.CharField()
     display_name = serializers.CharField()
     description = serializers.CharField()
-    online_users = serializers.IntegerField()
\ No newline at end of file
+    online_users = serializers.IntegerField()
+    unread_count = serializers.IntegerField()
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    """排行榜条目序列化器"""
+    rank = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    username = serializers.CharField()
+    level = serializers.IntegerField()
+    experience = serializers.IntegerField()
+    games_played = serializers.IntegerField()
+    wins = serializers.IntegerField()
+    win_rate = serializers.FloatField()
+
+class MatchPlayerResultSerializer(serializers.Serializer):
+    """单个玩家的对局结果"""
+    user_id = serializers.IntegerField()
+    won = serializers.BooleanField()
+    experience = serializers.IntegerField(required=False, min_value=0, max_value=10000)
+
+class MatchReportSerializer(serializers.Serializer):
+    """整场对局结果上报序列化器"""
+    match_id = serializers.CharField(max_length=64)
+    results = MatchPlayerResultSerializer(many=True, allow_empty=False)
+    
+    def validate_results(self, value):
+        user_ids = [result['user_id'] for result in value]
+        if len(user_ids) != len(set(user_ids)):
+            raise serializers.ValidationError("同一玩家不能重复出现在一场对局中")
+        
+        existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        missing = sorted(set(user_ids) - existing)
+        if missing:
+            raise serializers.ValidationError(f"用户不存在: {', '.join(map(str, missing))}")
+        return value
+
+class ValuesSerializer:
+    """
+    基于 QuerySet.values() 的只读列表序列化器，跳过模型实例化与字段对象开销
+    fields 为 输出字段 -> ORM查询路径 的映射，嵌套对象使用点号输出名（如 'sender.id'）
+    """
+    fields = {}
+    datetime_fields = ()
+    
+    def __init__(self, request=None, only=None):
+        self.request = request
+        fields = self.fields
+        if only:
+            fields = {name: path for name, path in fields.items() if name.split('.')[0] in only}
+        self._columns = [(name.split('.'), path) for name, path in fields.items()]
+        self._datetime_paths = {self.fields[name] for name in self.datetime_fields if name in fields}
+    
+    def prepare(self, queryset):
+        """子类可在此添加注解"""
+        return queryset
+    
+    def values(self, queryset, *extra):
+        """extra 为额外取出但不输出的列（如分页游标）"""
+        return self.prepare(queryset.prefetch_related(None)).values(*[path for _, path in self._columns], *extra)
+    
+    def iter_serialize(self, rows):
+        datetime_paths = self._datetime_paths
+        columns = self._columns
+        for row in rows:
+            item = {}
+            for keys, path in columns:
+                value = row[path]
+                if value is not None and path in datetime_paths:
+                    value = format_datetime(value)
+                target = item
+                for key in keys[:-1]:
+                    target = target.setdefault(key, {})
+                target[keys[-1]] = value
+            yield item
+    
+    def serialize(self, rows):
+        return list(self.iter_serialize(rows))
+
+def format_datetime(value):
+    """与 DRF DateTimeField 的输出格式保持一致"""
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+class GuideListValuesSerializer(ValuesSerializer):
+    """攻略列表的快速序列化（输出与 GuideListSerializer 默认字段一致）"""
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'excerpt': 'excerpt',
+        'category': 'category',
+        'tags': 'tags',
+        'author.id': 'author_id',
+        'author.username': 'author__username',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+        'views': 'views',
+        'likes_count': 'likes_count',
+        'is_liked': 'is_liked',
+        'cover_image': 'cover_image',
+        'hot_score': 'hot_score',
+    }
+    datetime_fields = ('created_at', 'updated_at')
+    
+    def prepare(self, queryset):
+        user = getattr(self.request, 'user', None)
+        user_id = user.id if user is not None and user.is_authenticated else None
+        return queryset.annotate(
+            likes_count=Count('liked_by', distinct=True),
+            is_liked=Exists(Guide.liked_by.through.objects.filter(guide_id=OuterRef('pk'), user_id=user_id)),
+        )
+
+class GuideDetailValuesSerializer(GuideListValuesSerializer):
+    """批量获取/增量同步用的快速序列化（在列表字段基础上包含正文）"""
+    fields = {**GuideListValuesSerializer.fields, 'content': 'content'}
+
+class ChatMessageValuesSerializer(ValuesSerializer):
+    """聊天记录的快速序列化（输出与 ChatMessageSerializer 完全一致）"""
+    fields = {
+        'id': 'id',
+        'sender.id': 'sender_id',
+        'sender.username': 'sender__username',
+        'sender.email': 'sender__email',
+        'sender.first_name': 'sender__first_name',
+        'sender.last_name': 'sender__last_name',
+        'sender.date_joined': 'sender__date_joined',
+        'sender.profile.avatar': 'sender__userprofile__avatar',
+        'sender.profile.bio': 'sender__userprofile__bio',
+        'sender.profile.level': 'sender__userprofile__level',
+        'sender.profile.experience': 'sender__userprofile__experience',
+        'sender.profile.games_played': 'sender__userprofile__games_played',
+        'sender.profile.wins': 'sender__userprofile__wins',
+        'sender.profile.win_rate': 'sender__userprofile__win_rate',
+        'content': 'content',
+        'timestamp': 'timestamp',
+        'room_name': 'room_name',
+    }
+    datetime_fields = ('sender.date_joined', 'timestamp')
+    # 尚未创建资料的用户：与 get_profile 惰性创建的默认资料一致
+    profile_defaults = {
+        'avatar': '', 'bio': '', 'level': 1, 'experience': 0, 'games_played': 0, 'wins': 0, 'win_rate': 0.0,
+    }
+    
+    def iter_serialize(self, rows):
+        for item in super().iter_serialize(rows):
+            profile = item.get('sender', {}).get('profile')
+            if profile is not None and profile.get('level') is None:
+                profile.update(self.profile_defaults)
+            yield item
+
+MAX_BATCH_SIZE = 100
+
+class GuideIdListSerializer(serializers.Serializer):
+    """批量操作的攻略ID列表"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
+
+class BulkLikeSerializer(GuideIdListSerializer):
+    """批量点赞：toggle 逐篇切换，like/unlike 统一设置"""
+    action = serializers.ChoiceField(choices=MODES, default=TOGGLE)
+
+class AssistantQuestionSerializer(serializers.Serializer):
+    """攻略助手提问"""
+    question = serializers.CharField(max_length=1000, trim_whitespace=True)
@@ -0,0 +1,37 @@
+"""流式JSON导出
+
+?stream=1 时以 StreamingHttpResponse 逐行输出JSON数组，
+行数据来自 QuerySet.iterator()，不会把整个结果集读入内存。
+"""
+from django.http import StreamingHttpResponse
+
+from .renderers import dumps
+
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def iter_json_array(items):
+    yield b'['
+    first = True
+    for item in items:
+        if first:
+            first = False
+        else:
+            yield b','
+        yield dumps(item)
+    yield b']'
+
+
+def stream_values(values_serializer, queryset):
+    """按 values 序列化器逐行流式输出查询结果"""
+    rows = values_serializer.values(queryset).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    response = StreamingHttpResponse(
+        iter_json_array(values_serializer.iter_serialize(rows)),
+        content_type='application/json'
+    )
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,372 @@
+import gzip
+import json
+from concurrent.futures import Future
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from guides.assistant import get_service, prompt_key, question_prompt, reset_service
+from guides.likes import bulk_set_likes
+from guides.middleware import CompressionMiddleware
+from guides.models import ChatMessage, Guide
+
+from . import renderers
+from .authentication import token_cache
+from .serializers import ChatMessageSerializer, GuideListSerializer
+from .views import ChatHistoryView
+
+
+class TokenClientTestCase(APITestCase):
+    """以令牌方式登录的API测试基类"""
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(username='apiuser', password='123456')
+        response = self.client.post('/api/auth/login/', {'username': 'apiuser', 'password': '123456'})
+        self.client.logout()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+
+
+class CachedTokenAuthenticationTest(TokenClientTestCase):
+    def test_repeated_requests_skip_token_lookup(self):
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+
+    def test_logout_invalidates_cached_token(self):
+        self.client.get('/api/auth/profile/')
+        self.client.post('/api/auth/logout/')
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/auth/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_revocation_reaches_other_workers(self):
+        self.client.get('/api/auth/profile/')
+        # 其他工作进程的本地缓存仍持有该令牌：信号只能清除执行注销的进程
+        key = Token.objects.get(user=self.user).key
+        stale = token_cache.get(key)
+        self.client.post('/api/auth/logout/')
+        token_cache.set(key, stale)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+
+class ThrottleTest(TokenClientTestCase):
+    def test_send_message_is_throttled(self):
+        with self.settings(RATE_LIMITS={'chat_send': '1/m'}):
+            data = {'message': '你好', 'room_name': 'general'}
+            self.assertEqual(self.client.post('/api/chat/send/', data).status_code, 200)
+            response = self.client.post('/api/chat/send/', data)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class ChatFilterTest(TokenClientTestCase):
+    def test_rejected_message_is_not_saved(self):
+        response = self.client.post('/api/chat/send/', {'message': '代充请加微信', 'room_name': 'general'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('message', response.data)
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_masked_message_is_saved(self):
+        response = self.client.post('/api/chat/send/', {'message': 'Fuck 这个地图', 'room_name': 'general'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['content'], '**** 这个地图')
+
+
+class GuideCreateTest(TokenClientTestCase):
+    def test_duplicate_content_is_rejected(self):
+        data = {'title': '团队配合', 'content': '开局先分头做任务，发现尸体马上报告，会议上交换各自的位置信息。', 'category': 'team'}
+        with self.settings(RATE_LIMITS={'add_guide': '10/m'}):
+            response = self.client.post('/api/guides/', data)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(Guide.objects.get().author, self.user)
+            response = self.client.post('/api/guides/', {**data, 'title': '换个标题'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['content'][0].code, 'duplicate')
+
+
+class SparseFieldsTest(TokenClientTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            Guide.objects.create(title=f'稀疏字段{i}', content='测试内容' * 20, author=self.user, category='strategy')
+
+    def test_fields_narrow_payload_and_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/guides/category/strategy/', {'fields': 'id,title'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        guide_sql = [q['sql'] for q in ctx.captured_queries if 'guides_guide' in q['sql']]
+        self.assertEqual(len(guide_sql), 2)  # COUNT + 当前页
+        self.assertNotIn('auth_user', guide_sql[1])
+        self.assertNotIn('"content"', guide_sql[1])
+
+    def test_author_summary_and_expand(self):
+        response = self.client.get('/api/guides/search/', {'q': '稀疏'})
+        self.assertEqual(set(response.data['results'][0]['author']), {'id', 'username'})
+
+        response = self.client.get('/api/guides/search/', {'q': '稀疏', 'expand': 'author'})
+        self.assertIn('profile', response.data['results'][0]['author'])
+
+    def test_liked_by_only_when_expanded(self):
+        guide = Guide.objects.first()
+        self.assertNotIn('liked_by', self.client.get(f'/api/guides/{guide.pk}/').data)
+        response = self.client.get(f'/api/guides/{guide.pk}/', {'expand': 'liked_by'})
+        self.assertEqual(response.data['liked_by'], [])
+
+    def test_viewset_list_and_detail_accept_fields(self):
+        response = self.client.get('/api/guides/', {'fields': 'id,title,likes_count'})
+        self.assertEqual(set(response.data[0]), {'id', 'title', 'likes_count'})
+        guide = Guide.objects.first()
+        response = self.client.get(f'/api/guides/{guide.pk}/', {'fields': 'title,views'})
+        self.assertEqual(response.data, {'title': guide.title, 'views': 1})
+
+
+class FastSerializationTest(TokenClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.guide = Guide.objects.create(title='快速序列化', content='测试内容' * 20, author=self.user, tags='a,b')
+        self.guide.liked_by.add(self.user)
+        ChatMessage.objects.create(sender=self.user, content='你好', room_name='general')
+
+    def test_fast_list_matches_model_serializer(self):
+        response = self.client.get('/api/guides/')
+        request = SimpleNamespace(method='GET', query_params={}, user=self.user)
+        expected = GuideListSerializer(Guide.objects.all(), many=True, context={'request': request}).data
+        self.assertEqual(json.loads(response.content), json.loads(json.dumps(expected)))
+        self.assertTrue(response.data[0]['is_liked'])
+        self.assertEqual(response.data[0]['likes_count'], 1)
+
+    def test_chat_history_fast_path_matches_model_serializer(self):
+        newcomer = User.objects.create_user(username='newcomer', password='123456')
+        ChatMessage.objects.create(sender=newcomer, content='第一次发言', room_name='general')
+        response = self.client.get('/api/chat/history/general/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        expected = ChatMessageSerializer(ChatMessage.objects.order_by('-timestamp'), many=True).data
+        self.assertEqual(json.loads(response.content)['results'], json.loads(json.dumps(expected)))
+
+        with mock.patch.object(ChatHistoryView, 'values_serializer_class', None):
+            slow = self.client.get('/api/chat/history/general/')
+        self.assertEqual(slow.content, response.content)
+
+    def test_renderer_fallback_without_orjson(self):
+        data = {'name': '量子', 'when': timezone.now()}
+        fast = renderers.dumps(data)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(json.loads(renderers.dumps(data)), json.loads(fast))
+
+
+class PaginationStreamingTest(TokenClientTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(25):
+            Guide.objects.create(title=f'分页{i}', content='测试内容', author=self.user, category='team')
+
+    def test_category_and_search_are_paginated(self):
+        response = self.client.get('/api/guides/category/team/')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 20)
+        response = self.client.get('/api/guides/search/', {'q': '分页', 'page': 2, 'page_size': 10})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_stream_export_returns_all_rows(self):
+        response = self.client.get('/api/guides/category/team/', {'stream': '1', 'fields': 'id,title'})
+        self.assertTrue(response.streaming)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(set(rows[0]), {'id', 'title'})
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def compress(self, content, accept='gzip, deflate'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda r: HttpResponse(content))(request)
+
+    def test_large_response_is_gzipped(self):
+        response = self.compress(b'quantum ' * 500)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'quantum ' * 500)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_small_or_unaccepted_response_is_untouched(self):
+        self.assertFalse(self.compress(b'tiny').has_header('Content-Encoding'))
+        self.assertFalse(self.compress(b'quantum ' * 500, accept='gzip;q=0').has_header('Content-Encoding'))
+
+    def test_streaming_response_is_compressed(self):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        middleware = CompressionMiddleware(lambda r: StreamingHttpResponse(iter([b'a' * 2000, b'b' * 2000])))
+        response = middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'a' * 2000 + b'b' * 2000)
+
+
+class BulkOperationsTest(TokenClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.guides = [
+            Guide.objects.create(title=f'批量{i}', content=f'正文{i}', author=self.user) for i in range(3)
+        ]
+        self.ids = [guide.pk for guide in self.guides]
+
+    def test_batch_fetch_in_one_query(self):
+        ids = ','.join(str(pk) for pk in self.ids + [9999])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/guides/batch/', {'ids': ids, 'fields': 'title,content'})
+        guide_sql = [q['sql'] for q in ctx.captured_queries if 'guides_guide' in q['sql']]
+        self.assertEqual(len(guide_sql), 1)
+        self.assertEqual([item['id'] for item in response.data['results']], self.ids)
+        self.assertEqual(response.data['results'][0]['content'], '正文0')
+        self.assertEqual(response.data['missing'], [9999])
+        self.assertEqual(self.client.get('/api/guides/batch/').status_code, 400)
+
+    def test_bulk_like_toggles_in_one_request(self):
+        self.guides[0].liked_by.add(self.user)
+        response = self.client.post('/api/guides/bulk_like/', {'ids': self.ids}, format='json')
+        liked = {item['id']: item['is_liked'] for item in response.data['results']}
+        self.assertEqual(liked, {self.ids[0]: False, self.ids[1]: True, self.ids[2]: True})
+
+        response = self.client.post('/api/guides/bulk_like/', {'ids': self.ids, 'action': 'like'}, format='json')
+        self.assertTrue(all(item['is_liked'] and item['likes_count'] == 1 for item in response.data['results']))
+
+    def test_bulk_set_likes_reports_missing(self):
+        results, missing = bulk_set_likes(self.user, [self.ids[0], 9999], 'unlike')
+        self.assertEqual(results, {self.ids[0]: (False, 0)})
+        self.assertEqual(missing, [9999])
+
+    def test_sync_returns_changes_since_timestamp(self):
+        response = self.client.get('/api/guides/sync/')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertFalse(response.data['has_more'])
+
+        Guide.objects.update(changed_at=timezone.now() - timedelta(hours=1))
+        response = self.client.get('/api/guides/sync/')
+        since, after_id = response.data['next_since'], response.data['next_id']
+        self.assertEqual(after_id, self.ids[-1])
+        self.guides[1].title = '已修改'
+        self.guides[1].save()
+        response = self.client.get('/api/guides/sync/', {'since': since, 'after_id': after_id})
+        self.assertEqual([item['title'] for item in response.data['results']], ['已修改'])
+        self.assertEqual(self.client.get('/api/guides/sync/', {'since': 'yesterday'}).status_code, 400)
+
+    def test_sync_cursor_stays_behind_uncommitted_changes(self):
+        data = self.client.get('/api/guides/sync/').data
+        # 同步之后才提交、但 changed_at 在提交前就已写入（早于同步时刻）的变化
+        late = Guide.objects.create(title='慢事务', content='c', author=self.user)
+        Guide.objects.filter(pk=late.pk).update(changed_at=timezone.now() - timedelta(seconds=10))
+        results = self.client.get('/api/guides/sync/', {
+            'since': data['next_since'], 'after_id': data['next_id']
+        }).data['results']
+        self.assertIn(late.pk, [item['id'] for item in results])
+
+    def test_clearing_a_users_likes_touches_the_guides(self):
+        for guide in self.guides[:2]:
+            guide.liked_by.add(self.user)
+        old = timezone.now() - timedelta(hours=1)
+        Guide.objects.update(changed_at=old)
+        self.user.liked_guides.clear()
+        touched = set(Guide.objects.filter(changed_at__gt=old).values_list('pk', flat=True))
+        self.assertEqual(touched, set(self.ids[:2]))
+
+    def test_sync_pages_through_large_deltas(self):
+        with mock.patch('api.views.SYNC_LIMIT', 2):
+            response = self.client.get('/api/guides/sync/')
+            self.assertTrue(response.data['has_more'])
+            response = self.client.get('/api/guides/sync/', {
+                'since': response.data['next_since'], 'after_id': response.data['next_id']
+            })
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual([item['id'] for item in response.data['results']], self.ids[2:])
+
+    def test_sync_cursor_advances_through_identical_timestamps(self):
+        Guide.objects.update(changed_at=timezone.now())
+        seen = []
+        params = {'since': '2000-01-01T00:00:00Z'}
+        with mock.patch('api.views.SYNC_LIMIT', 1):
+            for _ in range(5):
+                data = self.client.get('/api/guides/sync/', params).data
+                seen += [item['id'] for item in data['results']]
+                if not data['has_more']:
+                    break
+                params = {'since': data['next_since'], 'after_id': data['next_id']}
+        self.assertEqual(seen, sorted(self.ids))
+
+    def test_likes_and_views_are_synced(self):
+        since = self.client.get('/api/guides/sync/').data['next_since']
+        bulk_set_likes(self.user, [self.ids[0]], 'like')
+        self.client.post(f'/api/guides/{self.ids[1]}/like/')
+        self.client.force_login(self.user)
+        self.client.get(f'/guide/{self.ids[2]}/')
+        results = self.client.get('/api/guides/sync/', {'since': since}).data['results']
+        self.assertEqual(sorted(item['id'] for item in results), sorted(self.ids))
+
+
+class ChatUnreadTest(TokenClientTestCase):
+    def test_room_list_reports_unread(self):
+        other = User.objects.create_user(username='talker', password='123456')
+        ChatMessage.objects.create(sender=other, content='你好', room_name='newbie')
+        rooms = {room['name']: room['unread_count'] for room in self.client.get('/api/chat/rooms/').data}
+        self.assertEqual(rooms['newbie'], 1)
+
+        self.client.get('/api/chat/history/newbie/')
+        rooms = {room['name']: room['unread_count'] for room in self.client.get('/api/chat/rooms/').data}
+        self.assertEqual(rooms['newbie'], 0)
+
+
+class AssistantApiTest(TokenClientTestCase):
+    def setUp(self):
+        super().setUp()
+        # 同步生成，避免工作线程与测试事务争用数据库
+        override = self.settings(ASSISTANT_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_service()
+        self.addCleanup(reset_service)
+
+    def test_ask_and_summary(self):
+        response = self.client.post('/api/assistant/ask/', {'question': '新手先练什么角色？'})
+        self.assertEqual(response.data['status'], 'done')
+        self.assertFalse(response.data['cached'])
+        response = self.client.post('/api/assistant/ask/', {'question': '新手先练什么角色？'})
+        self.assertTrue(response.data['cached'])
+        result = self.client.get(f"/api/assistant/result/{response.data['id']}/")
+        self.assertEqual(result.data['answer'], response.data['answer'])
+
+        guide = Guide.objects.create(title='摘要测试', content='第一段\n第二段', author=self.user)
+        response = self.client.get(f'/api/guides/{guide.pk}/summary/')
+        self.assertEqual(response.data['status'], 'done')
+
+    def test_slow_backend_returns_pending(self):
+        future = Future()
+        future.cached = False
+        with mock.patch.object(get_service(), 'submit', return_value=('abc', future)), \
+                self.settings(ASSISTANT_WAIT_SECONDS=0.01):
+            response = self.client.post('/api/assistant/ask/', {'question': '慢问题'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get('/api/assistant/result/unknown/').status_code, 404)
+
+    def test_backend_error_details_are_not_returned(self):
+        service = get_service()
+        with mock.patch.object(service.backend, 'generate', side_effect=RuntimeError('api_key=secret')), \
+                self.assertLogs('guides.assistant', 'ERROR'):
+            response = self.client.post('/api/assistant/ask/', {'question': '出错'})
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.data['code'], 'assistant_unavailable')
+        result = self.client.get(f"/api/assistant/result/{prompt_key(service.backend, question_prompt('出错'))}/")
+        self.assertEqual(result.status_code, 502)
+        self.assertNotIn('secret', result.content.decode())
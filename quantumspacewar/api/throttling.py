@@ -0,0 +1,22 @@
+from rest_framework.throttling import BaseThrottle
+
+from guides.ratelimit import hit, request_ident
+
+
+class CacheRateThrottle(BaseThrottle):
+    """
+    基于 guides.ratelimit 滑动窗口的DRF限流
+    视图通过 throttle_scope 指定作用域（限额见 settings.RATE_LIMITS），
+    throttle_key 指定按 'user' 还是 'ip' 计数
+    """
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return True
+        result = hit(scope, request_ident(request, getattr(view, 'throttle_key', 'user')))
+        self.retry_after = result.retry_after
+        return result.allowed
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
@@ -24,6 +24,18 @@ urlpatterns = [
     path('chat/history/<str:room_name>/', views.ChatHistoryView.as_view(), name='chat_history'),
     path('chat/send/', views.SendMessageView.as_view(), name='send_message'),
     
+    # 排行榜相关
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', views.MyRankView.as_view(), name='leaderboard_me'),
+    path('leaderboard/<str:board>/', views.LeaderboardView.as_view(), name='leaderboard_board'),
+    
+    # 攻略助手
+    path('assistant/ask/', views.AssistantAskView.as_view(), name='assistant_ask'),
+    path('assistant/result/<str:key>/', views.AssistantResultView.as_view(), name='assistant_result'),
+    
+    # 对局相关
+    path('matches/', views.MatchResultView.as_view(), name='match_results'),
+    
     # 使用router的URL
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,20 +1,91 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.views import APIView
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import timedelta
 
+from guides import leaderboard
+from guides.assistant import ERROR_CODE, ERROR_MESSAGE, get_service, question_prompt, summary_prompt
+from guides.chatread import mark_read, unread_counts
+from guides.likes import bulk_set_likes
+from guides.matches import record_match
+from guides.profiles import get_profile
 from guides.models import Guide, ChatMessage
 from .serializers import (
     GuideSerializer, GuideListSerializer, UserSerializer, 
-    UserRegisterSerializer, ChatMessageSerializer, ChatRoomSerializer
+    UserRegisterSerializer, ChatMessageSerializer, ChatRoomSerializer, SendMessageSerializer,
+    LeaderboardEntrySerializer, MatchReportSerializer, UserProfileSerializer,
+    parse_field_list, GuideListValuesSerializer, ChatMessageValuesSerializer,
+    GuideDetailValuesSerializer, GuideIdListSerializer, BulkLikeSerializer, format_datetime,
+    AssistantQuestionSerializer
 )
+from .authentication import issue_token
+from .pagination import GuidePagination
 from .permissions import IsOwnerOrReadOnly
+from .renderers import FastJSONParser, FastJSONRenderer
+from .streaming import stream_values, wants_stream
+from .throttling import CacheRateThrottle
+
+def assistant_response(key, future):
+    """在 ASSISTANT_WAIT_SECONDS 内完成则直接返回回答，否则返回202由客户端轮询结果"""
+    try:
+        answer = future.result(timeout=getattr(settings, 'ASSISTANT_WAIT_SECONDS', 2))
+    except FutureTimeoutError:
+        return Response({'status': 'pending', 'id': key}, status=status.HTTP_202_ACCEPTED)
+    except Exception:
+        # 异常已由助手服务记录日志，不把后端的错误详情返回给客户端
+        return assistant_failed()
+    return Response({'status': 'done', 'id': key, 'answer': answer, 'cached': future.cached})
+
+
+def assistant_failed():
+    return Response(
+        {'status': 'failed', 'code': ERROR_CODE, 'error': ERROR_MESSAGE}, status=status.HTTP_502_BAD_GATEWAY
+    )
+
+SYNC_LIMIT = 200  # 增量同步单次返回的最大条数
+# changed_at 在事务提交前由应用写入，慢事务提交时的 changed_at 可能早于已返回给客户端的游标；
+# 同步到末尾时游标最多推进到 当前时间 - SYNC_SAFETY_MARGIN，窗口内的变化下次会重复返回（客户端按ID覆盖）
+SYNC_SAFETY_MARGIN = timedelta(seconds=60)
+
+GUIDE_COLUMNS = {field.name for field in Guide._meta.concrete_fields}
+
+def sparse_guide_queryset(queryset, request, full_author=False):
+    """
+    根据 ?fields= / ?expand= 收窄查询：只选取请求的列，
+    未请求作者时不再关联用户表，未请求点赞信息时不预取点赞用户
+    """
+    expand = parse_field_list(request.query_params.get('expand'))
+    full_author = full_author or 'author' in expand
+    queryset = queryset.select_related('author__userprofile' if full_author else 'author')
+    if 'liked_by' in expand:
+        queryset = queryset.prefetch_related('liked_by')
+    
+    requested = parse_field_list(request.query_params.get('fields'))
+    if request.method != 'GET' or not requested:
+        return queryset
+    
+    requested |= expand
+    columns = ['id'] + sorted((requested & GUIDE_COLUMNS) - {'id', 'author'})
+    if 'author' in requested:
+        columns += ['author'] if full_author else ['author__id', 'author__username']
+    else:
+        queryset = queryset.select_related(None)
+    if not requested & {'likes_count', 'is_liked', 'liked_by'}:
+        queryset = queryset.prefetch_related(None)
+    return queryset.only(*columns)
 
 class GuideViewSet(viewsets.ModelViewSet):
     """
@@ -27,16 +98,32 @@ class GuideViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'author']
     search_fields = ['title', 'content', 'tags']
-    ordering_fields = ['created_at', 'updated_at', 'views', 'liked_by']
+    ordering_fields = ['created_at', 'updated_at', 'views', 'liked_by', 'hot_score']
     ordering = ['-created_at']
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    parser_classes = [FastJSONParser, FormParser, MultiPartParser]
+    
+    def get_throttles(self):
+        if self.action == 'create':
+            self.throttle_scope = 'add_guide'
+            return [CacheRateThrottle()]
+        if self.action == 'summary':
+            self.throttle_scope = 'assistant'
+            return [CacheRateThrottle()]
+        return super().get_throttles()
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'my_guides'):
             return GuideListSerializer
         return GuideSerializer
     
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+    
     def get_queryset(self):
-        queryset = Guide.objects.select_related('author').prefetch_related('liked_by')
+        queryset = Guide.objects.prefetch_related('liked_by')
+        if self.action in ('list', 'my_guides'):
+            queryset = queryset.defer('content', 'content_html')
         
         # 搜索功能
         search_query = self.request.query_params.get('search', None)
@@ -52,7 +139,27 @@ class GuideViewSet(viewsets.ModelViewSet):
         if category and category != '全部':
             queryset = queryset.filter(category=category)
         
-        return queryset
+        return sparse_guide_queryset(
+            queryset, self.request,
+            full_author=self.get_serializer_class() is GuideSerializer
+        )
+    
+    def list(self, request, *args, **kwargs):
+        """列表默认走 values() 快速序列化；需要展开关联（?expand=）时退回 ModelSerializer"""
+        if parse_field_list(request.query_params.get('expand')):
+            return super().list(request, *args, **kwargs)
+        
+        fast = GuideListValuesSerializer(
+            request=request, only=parse_field_list(request.query_params.get('fields'))
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        if wants_stream(request):
+            return stream_values(fast, queryset)
+        rows = fast.values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(rows))
     
     def retrieve(self, request, *args, **kwargs):
         """获取攻略详情时增加浏览量"""
@@ -81,6 +188,91 @@ class GuideViewSet(viewsets.ModelViewSet):
             'is_liked': guide.liked_by.filter(id=user.id).exists()
         })
     
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """AI生成的攻略摘要（内容不变时命中缓存）"""
+        guide = get_object_or_404(Guide.objects.only('id', 'title', 'content'), pk=pk)
+        return assistant_response(*get_service().submit(summary_prompt(guide)))
+    
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """按ID列表批量获取攻略（?ids=1,2,3），一次查询返回"""
+        ids = GuideIdListSerializer(data={'ids': sorted(parse_field_list(request.query_params.get('ids')))})
+        ids.is_valid(raise_exception=True)
+        guide_ids = ids.validated_data['ids']
+        
+        only = parse_field_list(request.query_params.get('fields'))
+        if only:
+            only.add('id')
+        fast = GuideDetailValuesSerializer(request=request, only=only)
+        results = fast.serialize(fast.values(Guide.objects.filter(id__in=guide_ids).order_by('id')))
+        found = {item['id'] for item in results}
+        return Response({
+            'results': results,
+            'missing': sorted(set(guide_ids) - found)
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk_like(self, request):
+        """在一个事务中批量点赞/取消点赞"""
+        serializer = BulkLikeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results, missing = bulk_set_likes(
+            request.user, serializer.validated_data['ids'], serializer.validated_data['action']
+        )
+        return Response({
+            'results': [
+                {'id': guide_id, 'is_liked': is_liked, 'likes_count': likes_count}
+                for guide_id, (is_liked, likes_count) in sorted(results.items())
+            ],
+            'missing': missing
+        })
+    
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        增量同步：按 (changed_at, id) 键集游标升序返回有变化（内容、点赞、浏览量）的攻略，每次最多 SYNC_LIMIT 条
+        客户端保存返回的 next_since 与 next_id，作为下次请求的 since 与 after_id；has_more 为真时继续拉取
+        最近 SYNC_SAFETY_MARGIN 内的变化可能重复返回，客户端按ID覆盖即可
+        """
+        since = request.query_params.get('since')
+        queryset = Guide.objects.order_by('changed_at', 'id')
+        if since:
+            since_dt = parse_datetime(since)
+            if since_dt is None:
+                return Response({'error': 'since 必须是ISO 8601格式的时间'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since_dt):
+                since_dt = timezone.make_aware(since_dt)
+            try:
+                after_id = int(request.query_params.get('after_id', 0))
+            except ValueError:
+                return Response({'error': 'after_id 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+            # 同一时间戳的行按ID继续翻页，批量更新产生的大量同时间戳变化也不会卡住游标
+            queryset = queryset.filter(
+                Q(changed_at__gt=since_dt) | Q(changed_at=since_dt, id__gt=after_id)
+            )
+        
+        fast = GuideDetailValuesSerializer(request=request)
+        safe_since = timezone.now() - SYNC_SAFETY_MARGIN
+        rows = list(fast.values(queryset, 'changed_at')[:SYNC_LIMIT + 1])
+        has_more = len(rows) > SYNC_LIMIT
+        rows = rows[:SYNC_LIMIT]
+        if rows:
+            next_since, next_id = rows[-1]['changed_at'], rows[-1]['id']
+        elif since:
+            next_since, next_id = since_dt, after_id
+        else:
+            next_since, next_id = safe_since, 0
+        # 翻页中途不回退（否则同一页会反复返回），到末尾时不越过安全边界
+        if not has_more and next_since > safe_since:
+            next_since, next_id = safe_since, 0
+        return Response({
+            'results': fast.serialize(rows),
+            'has_more': has_more,
+            'next_since': format_datetime(next_since),
+            'next_id': next_id,
+        })
+    
     @action(detail=False, methods=['get'])
     def my_guides(self, request):
         """获取当前用户的攻略"""
@@ -93,36 +285,54 @@ class GuideViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-class GuideByCategoryView(APIView):
-    """按分类获取攻略"""
+class PaginatedGuideListMixin:
+    """攻略列表的分页响应；?stream=1 时改为流式导出全部结果"""
+    pagination_class = GuidePagination
+    
+    def list_response(self, request, guides):
+        if wants_stream(request):
+            fast = GuideListValuesSerializer(
+                request=request, only=parse_field_list(request.query_params.get('fields'))
+            )
+            return stream_values(fast, guides)
+        
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(sparse_guide_queryset(guides, request), request, view=self)
+        serializer = GuideListSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+class GuideByCategoryView(PaginatedGuideListMixin, APIView):
+    """按分类获取攻略（分页）"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request, category):
-        guides = Guide.objects.filter(category=category).order_by('-created_at')
-        serializer = GuideListSerializer(guides, many=True)
-        return Response(serializer.data)
+        guides = Guide.objects.filter(
+            category=category
+        ).defer('content', 'content_html').order_by('-created_at')
+        return self.list_response(request, guides)
 
-class GuideSearchView(APIView):
-    """搜索攻略"""
+class GuideSearchView(PaginatedGuideListMixin, APIView):
+    """搜索攻略（分页）"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         search_query = request.query_params.get('q', '')
         if not search_query:
-            return Response({'results': []})
+            return Response({'count': 0, 'next': None, 'previous': None, 'results': []})
         
         guides = Guide.objects.filter(
             Q(title__icontains=search_query) |
             Q(content__icontains=search_query) |
             Q(tags__icontains=search_query)
-        ).order_by('-created_at')
-        
-        serializer = GuideListSerializer(guides, many=True)
-        return Response({'results': serializer.data})
+        ).defer('content', 'content_html').order_by('-created_at')
+        return self.list_response(request, guides)
 
 class UserLoginView(APIView):
     """用户登录"""
     permission_classes = [AllowAny]
+    throttle_classes = [CacheRateThrottle]
+    throttle_scope = 'login'
+    throttle_key = 'ip'
     
     def post(self, request):
         username = request.data.get('username')
@@ -145,9 +355,8 @@ class UserLoginView(APIView):
             else:
                 request.session.set_expiry(0)  # 浏览器关闭时过期
             
-            # 获取或创建token
-            from rest_framework.authtoken.models import Token
-            token, created = Token.objects.get_or_create(user=user)
+            # 获取token（过期则轮换）
+            token = issue_token(user)
             
             user_serializer = UserSerializer(user)
             return Response({
@@ -171,9 +380,8 @@ class UserRegisterView(APIView):
         if serializer.is_valid():
             user = serializer.save()
             
-            # 获取或创建token
-            from rest_framework.authtoken.models import Token
-            token, created = Token.objects.get_or_create(user=user)
+            # 获取token（过期则轮换）
+            token = issue_token(user)
             
             user_serializer = UserSerializer(user)
             return Response({
@@ -205,9 +413,17 @@ class UserProfileView(APIView):
     def get(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
+    
+    def patch(self, request):
+        """更新头像、简介（保存时由信号清除资料缓存）"""
+        serializer = UserProfileSerializer(get_profile(request.user), data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(UserSerializer(request.user).data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class ChatRoomListView(APIView):
-    """聊天室列表"""
+    """聊天室列表（含当前用户各房间的未读数）"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
@@ -238,30 +454,42 @@ class ChatRoomListView(APIView):
             }
         ]
         
+        unread = unread_counts(request.user.id, [room['name'] for room in rooms])
+        for room in rooms:
+            room['unread_count'] = unread[room['name']]
+        
         serializer = ChatRoomSerializer(rooms, many=True)
         return Response(serializer.data)
 
 class ChatHistoryView(APIView):
-    """聊天记录"""
+    """聊天记录（默认 values() 快速序列化 + 高速JSON渲染，输出与 ChatMessageSerializer 一致）"""
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer]
+    values_serializer_class = ChatMessageValuesSerializer  # 设为 None 时使用 ChatMessageSerializer
     
     def get(self, request, room_name):
         page = int(request.query_params.get('page', 1))
         page_size = 20
+        queryset = ChatMessage.objects.filter(room_name=room_name).order_by('-timestamp')
         
-        messages = ChatMessage.objects.filter(
-            room_name=room_name
-        ).order_by('-timestamp')[(page-1)*page_size:page*page_size]
-        
-        serializer = ChatMessageSerializer(messages, many=True)
+        if self.values_serializer_class is not None:
+            fast = self.values_serializer_class(request=request)
+            results = fast.serialize(fast.values(queryset)[(page-1)*page_size:page*page_size])
+        else:
+            messages = queryset.select_related('sender__userprofile')[(page-1)*page_size:page*page_size]
+            results = ChatMessageSerializer(messages, many=True).data
+        if page == 1 and results:
+            mark_read(request.user.id, room_name, max(item['id'] for item in results))
         return Response({
-            'results': serializer.data,
-            'has_next': len(messages) == page_size
+            'results': results,
+            'has_next': len(results) == page_size
         })
 
 class SendMessageView(APIView):
     """发送消息"""
     permission_classes = [IsAuthenticated]
+    throttle_classes = [CacheRateThrottle]
+    throttle_scope = 'chat_send'
     
     def post(self, request):
         serializer = SendMessageSerializer(data=request.data)
@@ -281,6 +509,89 @@ class SendMessageView(APIView):
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class AssistantAskView(APIView):
+    """向攻略助手提问"""
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [CacheRateThrottle]
+    throttle_scope = 'assistant'
+    
+    def post(self, request):
+        serializer = AssistantQuestionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        prompt = question_prompt(serializer.validated_data['question'])
+        return assistant_response(*get_service().submit(prompt))
+
+class AssistantResultView(APIView):
+    """轮询助手回答（提问或摘要返回202时使用）"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, key):
+        state, value = get_service().status(key)
+        if state == 'done':
+            return Response({'status': 'done', 'id': key, 'answer': value})
+        if state == 'pending':
+            return Response({'status': 'pending', 'id': key}, status=status.HTTP_202_ACCEPTED)
+        if state == 'failed':
+            return assistant_failed()
+        return Response({'error': '结果不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+class LeaderboardView(APIView):
+    """玩家排行榜（按经验值或胜率）"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, board='experience'):
+        ranking = leaderboard.get_board(board)
+        if ranking is None:
+            return Response(
+                {'error': f"无效的排行榜，有效值: {', '.join(leaderboard.BOARDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        
+        results = ranking.cached_page(page)
+        total = ranking.total()
+        return Response({
+            'board': board,
+            'page': page,
+            'total': total,
+            'has_next': page * leaderboard.PAGE_SIZE < total,
+            'results': LeaderboardEntrySerializer(results, many=True).data
+        })
+
+class MyRankView(APIView):
+    """当前用户在各排行榜中的名次"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response({
+            name: ranking.rank(request.user.id)
+            for name, ranking in leaderboard.BOARDS.items()
+        })
+
+class MatchResultView(APIView):
+    """对局结果上报（由游戏服务器账号调用，按match_id幂等）"""
+    permission_classes = [IsAdminUser]
+    
+    def post(self, request):
+        serializer = MatchReportSerializer(data=request.data)
+        if serializer.is_valid():
+            match, created = record_match(
+                serializer.validated_data['match_id'],
+                serializer.validated_data['results'],
+                reported_by=request.user
+            )
+            return Response({
+                'success': True,
+                'match_id': match.match_id,
+                'duplicate': not created,
+                'message': '对局结果已录入' if created else '该对局已录入，忽略重复上报'
+            }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 class ChatViewSet(viewsets.ViewSet):
     """聊天相关视图集"""
     permission_classes = [IsAuthenticated]
@@ -0,0 +1,77 @@
+"""后台列表页基准测试
+
+用批量生成的数据（默认 5000 用户、20000 攻略、20000 聊天消息）请求各后台列表页，
+统计每页的SQL条数与耗时。
+
+用法（在 quantumspacewar 目录下）：
+    python benchmarks/bench_admin.py [用户数] [攻略数] [重复次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bootstrap import test_database  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from guides.models import ChatMessage, Guide  # noqa: E402
+
+PAGES = [
+    ('攻略列表', '/admin/guides/guide/'),
+    ('攻略列表 按作者筛选', '/admin/guides/guide/?author__id__exact=2'),
+    ('用户列表', '/admin/auth/user/'),
+    ('聊天消息列表', '/admin/guides/chatmessage/'),
+    ('聊天消息 按房间筛选', '/admin/guides/chatmessage/?room_name__exact=general'),
+]
+
+
+def seed(users, guides):
+    now = timezone.now()
+    User.objects.bulk_create(
+        User(username=f'bench{i}', last_login=now - timezone.timedelta(minutes=i)) for i in range(users)
+    )
+    user_ids = list(User.objects.values_list('id', flat=True))
+    Guide.objects.bulk_create(
+        (Guide(title=f'基准攻略{i}', content='基准测试内容' * 50, author_id=user_ids[i % len(user_ids)],
+               category='strategy', created_at=now)
+         for i in range(guides)),
+        batch_size=1000
+    )
+    ChatMessage.objects.bulk_create(
+        (ChatMessage(sender_id=user_ids[i % len(user_ids)], content=f'消息{i}',
+                     room_name=('general', 'strategy', 'newbie', 'team')[i % 4])
+         for i in range(guides)),
+        batch_size=1000
+    )
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    guides = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    with test_database():
+        seed(users, guides)
+        admin = User.objects.create_superuser(username='benchadmin', password='123456')
+        client = Client()
+        client.force_login(admin)
+
+        print(f'用户 {users}，攻略/消息 {guides}，取 {repeat} 次最优')
+        for name, url in PAGES:
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - start)
+            print(f'{name:24}{response.status_code:>6}{len(ctx.captured_queries):>6} 条SQL'
+                  f'{min(timings) * 1000:>10.1f} ms{len(response.content) / 1024:>10.1f} KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""搜索输入联想基准测试
+
+对比同一前缀：
+- 数据库 icontains 查询取热度前10（首页搜索的做法）
+- 进程内前缀索引（冷查询：节点缓存刚失效；热查询：节点缓存有效）
+
+用法（在 quantumspacewar 目录下）：
+    python benchmarks/bench_autocomplete.py [攻略数] [重复次数]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bootstrap import test_database  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db.models import Q  # noqa: E402
+
+from guides import autocomplete  # noqa: E402
+from guides.models import Guide  # noqa: E402
+
+WORDS = ['刺客', '侦探', '平民', '队长', '工程师', '太空站', '反应堆', '投票', '会议', '管道']
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(0)
+
+    with test_database():
+        users = User.objects.bulk_create(User(username=f'player{i}') for i in range(200))
+        Guide.objects.bulk_create(
+            (Guide(title=''.join(rng.sample(WORDS, 3)) + str(i), content='', author=rng.choice(users),
+                   tags=','.join(rng.sample(WORDS, 2)), hot_score=rng.random() * 100)
+             for i in range(count)),
+            batch_size=2000
+        )
+
+        start = time.perf_counter()
+        index = autocomplete.build_index()
+        build = time.perf_counter() - start
+
+        def database(prefix):
+            list(Guide.objects.filter(Q(title__icontains=prefix) | Q(tags__icontains=prefix))
+                 .order_by('-hot_score').values_list('id', 'title')[:10])
+
+        def cold(prefix):
+            for node in index._path(autocomplete.normalize(prefix)):
+                node.top = None
+            index.suggest(prefix)
+
+        print(f'{count} 篇攻略，索引构建耗时 {build * 1000:.0f} 毫秒；查询 {repeat} 次取最优（单位：毫秒/次）')
+        print(f'{"前缀":10}{"数据库":>10}{"索引(冷)":>12}{"索引(热)":>12}')
+        for prefix in ('刺', '刺客侦', 'play', 'player1'):
+            index.suggest(prefix)
+            db = best_of(repeat, lambda: database(prefix))
+            slow = best_of(repeat, lambda: cold(prefix))
+            fast = best_of(repeat, lambda: index.suggest(prefix))
+            print(f'{prefix:10}{db * 1000:>12.3f}{slow * 1000:>12.3f}{fast * 1000:>12.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""聊天过滤基准测试
+
+对比逐词查找（对每个词执行 `word in text`）与 Aho-Corasick 自动机的单条消息过滤耗时，
+词表越大差距越明显。不需要数据库。
+
+用法（在 quantumspacewar 目录下）：
+    python benchmarks/bench_chatfilter.py [重复次数]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _bootstrap  # noqa: E402,F401
+
+from guides.chatfilter import ChatFilter, parse_words  # noqa: E402
+
+ALPHABET = '刺客侦探平民队长工程师太空站量子反应堆任务投票会议舱门管道'
+
+
+def make_words(count):
+    rng = random.Random(count)
+    words = {''.join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 6))) for _ in range(count)}
+    words |= {f'spam{i}' for i in range(count // 4)}
+    return sorted(words)
+
+
+def naive_check(words, text):
+    lowered = text.casefold()
+    for word in words:
+        if word in lowered:
+            lowered = lowered.replace(word, '*' * len(word))
+    return lowered
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    message = '开会了！我觉得二号是刺客，他刚才一直在反应堆附近转，投票的时候大家注意一下。' * 2
+
+    print(f'单条消息（{len(message)} 字）过滤耗时，{repeat} 次取最优（单位：微秒/条）')
+    print(f'{"词表大小":>8}{"逐词查找":>12}{"自动机":>10}{"加速":>8}')
+    for count in (100, 1000, 10000):
+        words = make_words(count)
+        chat_filter = ChatFilter(parse_words(words))
+        slow = best_of(repeat, lambda: naive_check(words, message))
+        fast = best_of(repeat, lambda: chat_filter.check(message))
+        print(f'{count:>10}{slow * 1e6:>14.1f}{fast * 1e6:>12.1f}{slow / fast:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
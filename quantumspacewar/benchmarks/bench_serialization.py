@@ -0,0 +1,82 @@
+"""列表序列化吞吐基准测试
+
+对比每 1000 行数据：
+- ModelSerializer + DRF JSONRenderer（原实现）
+- values() 快速序列化 + FastJSONRenderer（orjson / 标准库回退）
+
+用法（在 quantumspacewar 目录下）：
+    python benchmarks/bench_serialization.py [行数] [重复次数]
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bootstrap import test_database  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api import renderers  # noqa: E402
+from api.serializers import (  # noqa: E402
+    ChatMessageSerializer, ChatMessageValuesSerializer,
+    GuideListSerializer, GuideListValuesSerializer,
+)
+from guides.models import ChatMessage, Guide, UserProfile  # noqa: E402
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(name, rows, seconds):
+    print(f'{name:44}{seconds * 1000 / rows * 1000:>10.1f} ms/千行{rows / seconds:>12.0f} 行/秒')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with test_database():
+        users = [User.objects.create(username=f'bench{i}') for i in range(20)]
+        UserProfile.objects.bulk_create(UserProfile(user=user) for user in users)
+        Guide.objects.bulk_create(
+            Guide(title=f'基准攻略{i}', excerpt='基准测试摘要' * 10, content='基准测试内容' * 50,
+                  author=users[i % len(users)], tags='刺客,潜行')
+            for i in range(rows)
+        )
+        ChatMessage.objects.bulk_create(
+            ChatMessage(sender=users[i % len(users)], content=f'消息{i}', room_name='general')
+            for i in range(rows)
+        )
+        request = SimpleNamespace(method='GET', query_params={}, user=users[0])
+
+        guides = Guide.objects.select_related('author').prefetch_related('liked_by').defer('content', 'content_html')
+        messages = ChatMessage.objects.select_related('sender__userprofile')
+
+        print(f'行数: {rows}，取 {repeat} 次最优')
+        report('攻略列表  ModelSerializer + JSONRenderer', rows, best_of(repeat, lambda: JSONRenderer().render(
+            GuideListSerializer(guides.all(), many=True, context={'request': request}).data)))
+        fast = GuideListValuesSerializer(request=request)
+        report('攻略列表  values() + FastJSONRenderer', rows, best_of(repeat, lambda: renderers.dumps(
+            fast.serialize(fast.values(guides.all())))))
+        with mock.patch.object(renderers, 'orjson', None):
+            report('攻略列表  values() + 标准库json回退', rows, best_of(repeat, lambda: renderers.dumps(
+                fast.serialize(fast.values(guides.all())))))
+
+        report('聊天记录  ModelSerializer + JSONRenderer', rows, best_of(repeat, lambda: JSONRenderer().render(
+            ChatMessageSerializer(messages.all(), many=True).data)))
+        fast = ChatMessageValuesSerializer(request=request)
+        report('聊天记录  values() + FastJSONRenderer', rows, best_of(repeat, lambda: renderers.dumps(
+            fast.serialize(fast.values(ChatMessage.objects.all())))))
+
+
+if __name__ == '__main__':
+    main()
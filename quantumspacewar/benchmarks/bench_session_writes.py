@@ -0,0 +1,77 @@
+"""会话写入量基准测试
+
+对比浏览 N 篇攻略时：
+- before：旧实现，每篇攻略向 db 会话写入 viewed_guide_{pk} 标记；
+- after：当前实现（cached_db 会话 + 缓存中的布隆过滤器去重）。
+统计 django_session 表的写入次数与会话数据大小。
+
+用法（在 quantumspacewar 目录下）：
+    python benchmarks/bench_session_writes.py [浏览篇数]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bootstrap import test_database  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.contrib.sessions.backends.db import SessionStore as DbSessionStore  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from guides.models import Guide  # noqa: E402
+
+
+def session_writes(queries):
+    return sum(
+        1 for query in queries
+        if 'django_session' in query['sql'] and query['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE'))
+    )
+
+
+def run_before(guide_ids):
+    session = DbSessionStore()
+    session.create()
+    with CaptureQueriesContext(connection) as ctx:
+        for pk in guide_ids:
+            session = DbSessionStore(session.session_key)
+            if not session.get(f'viewed_guide_{pk}'):
+                session[f'viewed_guide_{pk}'] = True
+                session.save()
+    size = len(DbSessionStore(session.session_key).encode(session._get_session()))
+    return session_writes(ctx.captured_queries), size
+
+
+def run_after(guide_ids, user):
+    client = Client()
+    client.force_login(user)
+    with CaptureQueriesContext(connection) as ctx:
+        for pk in guide_ids:
+            client.get(f'/guide/{pk}/')
+    session = client.session
+    size = len(session.encode(session._get_session()))
+    return session_writes(ctx.captured_queries), size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with test_database():
+        user = User.objects.create_user(username='bench', password='bench123456')
+        guides = Guide.objects.bulk_create(
+            Guide(title=f'基准攻略{i}', content='基准测试内容' * 10, author=user)
+            for i in range(count)
+        )
+        guide_ids = [guide.pk for guide in guides]
+
+        before_writes, before_size = run_before(guide_ids)
+        after_writes, after_size = run_after(guide_ids, user)
+
+        print(f'浏览攻略数: {count}')
+        print(f'{"":8}{"会话写入次数":>12}{"会话大小(字节)":>16}')
+        print(f'{"before":8}{before_writes:>12}{before_size:>16}')
+        print(f'{"after":8}{after_writes:>12}{after_size:>16}')
+
+
+if __name__ == '__main__':
+    main()
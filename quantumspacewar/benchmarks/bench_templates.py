@@ -0,0 +1,108 @@
+"""模板渲染基准测试
+
+用代表性上下文渲染主要页面模板，对比每次渲染的耗时：
+- 不缓存：每次都重新读取、解析模板文件（未配置缓存加载器时的行为）
+- 缓存加载器：模板只解析一次（生产环境配置）
+
+用法（在 quantumspacewar 目录下）：
+    python benchmarks/bench_templates.py [重复次数]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bootstrap import test_database  # noqa: E402
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.contrib.messages.storage.fallback import FallbackStorage  # noqa: E402
+from django.contrib.sessions.backends.cache import SessionStore  # noqa: E402
+from django.core.paginator import Paginator  # noqa: E402
+from django.template.backends.django import DjangoTemplates  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from guides.forms import GuideForm  # noqa: E402
+from guides.models import ChatMessage, Guide  # noqa: E402
+
+SOURCE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def make_backend(cached):
+    config = settings.TEMPLATES[0]
+    options = {**config['OPTIONS'], 'debug': False}
+    options['loaders'] = [('django.template.loaders.cached.Loader', SOURCE_LOADERS)] if cached else SOURCE_LOADERS
+    return DjangoTemplates({
+        'NAME': 'cached' if cached else 'uncached',
+        'DIRS': config['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': options,
+    })
+
+
+def make_request(user):
+    request = RequestFactory().get('/')
+    request.user = user
+    request.session = SessionStore()
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def contexts(user):
+    guides = Guide.objects.select_related('author').defer('content', 'content_html')
+    guide = Guide.objects.select_related('author').first()
+    messages = list(ChatMessage.objects.select_related('sender').order_by('-timestamp')[:50])[::-1]
+    rooms = ['general', 'strategy', 'newbie', 'team']
+    return {
+        'home.html': {'page_obj': Paginator(guides, 10).get_page(1), 'search_query': '',
+                      'sort_by': '-created_at', 'total_count': guides.count()},
+        'guide_detail.html': {'guide': guide, 'related_guides': list(guides.exclude(pk=guide.pk)[:5])},
+        'my_guides.html': {'page_obj': Paginator(guides.filter(author=user), 10).get_page(1)},
+        'add_guide.html': {'form': GuideForm()},
+        'chat/chat_room.html': {'room_name': 'general', 'messages': messages, 'active_rooms': rooms},
+        'chat/messages_list.html': {'messages': messages[-5:], 'room_name': 'general', 'active_rooms': rooms},
+        'chat/message_item.html': {'message': messages[-1], 'is_current_user': True},
+    }
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with test_database():
+        user = User.objects.create_user(username='bench', password='123456')
+        Guide.objects.bulk_create(
+            Guide(title=f'基准攻略{i}', excerpt='基准测试摘要' * 10, content='基准测试内容' * 50,
+                  content_html='<p>' + '基准测试内容' * 50 + '</p>', author=user, tags='刺客,潜行')
+            for i in range(30)
+        )
+        ChatMessage.objects.bulk_create(
+            ChatMessage(sender=user, content=f'消息{i}', room_name='general') for i in range(50)
+        )
+        request = make_request(user)
+        uncached, cached = make_backend(False), make_backend(True)
+
+        print(f'每个模板渲染 {repeat} 次取最优（单位：毫秒/次）')
+        print(f'{"模板":28}{"不缓存":>10}{"缓存加载器":>12}{"加速":>8}')
+        for name, context in contexts(user).items():
+            # 先各渲染一次，排除查询集首次求值的开销
+            uncached.get_template(name).render(context, request)
+            cached.get_template(name).render(context, request)
+            slow = best_of(repeat, lambda: uncached.get_template(name).render(context, request))
+            fast = best_of(repeat, lambda: cached.get_template(name).render(context, request))
+            print(f'{name:30}{slow * 1000:>10.3f}{fast * 1000:>12.3f}{slow / fast:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,19 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Guide
+from .admin_utils import AutocompleteFilter, FastChangeListMixin
+from .models import Guide, ChatMessage, Job
 
-# 自定义用户管理界面
-class CustomUserAdmin(UserAdmin):
+class AuthorFilter(AutocompleteFilter):
+    title = '作者'
+    field_name = 'author'
+
+class SenderFilter(AutocompleteFilter):
+    title = '发送者'
+    field_name = 'sender'
+
+# 自定义用户管理界面（按 last_login 排序依赖迁移 0011 中为 auth_user 添加的索引）
+class CustomUserAdmin(FastChangeListMixin, UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'last_login')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined')
     search_fields = ('username', 'email', 'first_name', 'last_name')
@@ -25,12 +34,12 @@ admin.site.register(User, CustomUserAdmin)
 
 # 自定义Guide管理界面
 @admin.register(Guide)
-class GuideAdmin(admin.ModelAdmin):
-    # 列表视图优化
+class GuideAdmin(FastChangeListMixin, admin.ModelAdmin):
+    # 列表视图优化：作者用自动完成筛选，不使用需要逐月统计的 date_hierarchy
     list_display = ['title', 'author', 'category', 'views', 'created_at', 'updated_at']
-    list_filter = ['created_at', 'updated_at', 'author', 'category']
+    list_filter = ['created_at', 'updated_at', AuthorFilter, 'category']
+    list_select_related = ['author']
     search_fields = ['title', 'content', 'author__username', 'tags']
-    date_hierarchy = 'created_at'
     ordering = ('-created_at',)
     list_per_page = 20
     actions_on_top = True
@@ -64,6 +73,35 @@ class GuideAdmin(admin.ModelAdmin):
         css = {
             'all': ('css/admin.css',)
         }
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # 列表页不加载正文
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('content', 'content_html')
+        return queryset
+
+@admin.register(ChatMessage)
+class ChatMessageAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ['short_content', 'sender', 'room_name', 'timestamp']
+    list_filter = ['room_name', SenderFilter, 'timestamp']
+    list_select_related = ['sender']
+    search_fields = ['content']
+    autocomplete_fields = ['sender']
+    ordering = ('-timestamp',)
+    list_per_page = 50
+    
+    @admin.display(description='内容')
+    def short_content(self, obj):
+        return obj.content[:50]
+
+@admin.register(Job)
+class JobAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_at', 'locked_by', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['attempts', 'last_error', 'locked_by', 'locked_at', 'created_at', 'finished_at']
+    ordering = ('-created_at',)
+    list_per_page = 50
 
 # 自定义管理站点
 admin.site.site_header = '量子太空杀攻略站 - 管理后台'
@@ -0,0 +1,98 @@
+"""后台列表页的性能工具
+
+- EstimatedCountPaginator：未筛选的大表使用数据库统计信息估算总数，
+  其余情况最多数到 COUNT_LIMIT 行，避免每次翻页都对整表 COUNT(*)；
+- AutocompleteFilter：外键筛选改为自动完成输入框，不再在侧栏列出全部关联对象。
+"""
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+COUNT_LIMIT = 10000
+
+
+def estimate_table_rows(model, using):
+    """从数据库统计信息读取表的估算行数，不支持时返回None"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s', [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """总数可能不精确的分页器（只用于后台列表）"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_table_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        # 超过上限的部分不再计数，翻页最多到第 COUNT_LIMIT 行，更靠后的数据请用搜索或筛选缩小范围
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """外键自动完成筛选（被关联模型需在同一 admin 站点注册并设置 search_fields，本字段无需加入 autocomplete_fields）"""
+    template = 'admin/guides/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f'{self.field_name}__id__exact'
+        super().__init__(request, params, model, model_admin)
+        field = model._meta.get_field(self.field_name)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+        )
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'widget': self.form_field.widget.render(
+                self.parameter_name, self.value(), attrs={'id': f'filter_{self.parameter_name}'}
+            ),
+            'parameter_name': self.parameter_name,
+        }
+
+
+class FastChangeListMixin:
+    """大表后台列表：估算总数、不再额外统计全表行数，并加载自动完成筛选的静态资源"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, type) and issubclass(list_filter, AutocompleteFilter):
+                field = self.model._meta.get_field(list_filter.field_name)
+                return media + AutocompleteSelect(field, self.admin_site).media
+        return media
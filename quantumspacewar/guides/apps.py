@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class GuidesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'guides'
-    verbose_name = '攻略管理'
\ No newline at end of file
+    verbose_name = '攻略管理'
+    
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
@@ -0,0 +1,261 @@
+"""攻略助手（AI问答与攻略摘要）
+
+- 后端可插拔：settings.ASSISTANT_BACKEND 指定类路径，默认离线的 StubBackend，
+  配置 GEMINI_API_KEY 环境变量后可使用 GeminiBackend（密钥不写入代码）；
+- 生成在线程池中执行，submit() 立即返回 Future，视图只等待 ASSISTANT_WAIT_SECONDS，
+  超时返回待处理状态由客户端轮询，不会长时间占用请求线程；aask() 供异步视图 await；
+- 相同 (模型, 提示词) 的并发请求合并为一次后端调用；生成中标记与失败信息保存在共享缓存中，
+  轮询请求落到任意工作进程都能查到状态；
+- 结果持久化在 AssistantResponse 表中，按 (后端, 模型, 提示词) 的哈希查找，
+  超过 ASSISTANT_CACHE_MAX_ENTRIES 条时按最近使用时间淘汰（LRU）；命中次数先在缓存中累加，
+  随最近使用时间一起写库。
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.text import Truncator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'guides.assistant.StubBackend'
+DEFAULT_WORKERS = 4
+DEFAULT_CACHE_MAX_ENTRIES = 1000
+TOUCH_INTERVAL = timedelta(hours=1)  # 命中时最多每小时更新一次最近使用时间，避免每次命中都写库
+ERROR_TIMEOUT = 300
+ERROR_CODE = 'assistant_unavailable'  # 返回给客户端的通用错误码，后端异常详情（可能含请求与配置信息）只写日志
+ERROR_MESSAGE = '助手暂时无法回答，请稍后再试'
+PENDING_TIMEOUT = 300  # 生成中标记的有效期，工作进程异常退出时标记到期自动消失
+SUMMARY_SOURCE_CHARS = 4000
+
+SYSTEM_PROMPT = '你是“量子太空杀”游戏攻略站的助手，回答要简洁、准确，使用中文。'
+
+
+class AssistantBackend:
+    """助手后端接口"""
+    name = None
+    model = None
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+
+class StubBackend(AssistantBackend):
+    """离线测试用的本地模型：返回基于提示词的确定性结果"""
+    name = 'stub'
+    model = 'stub-1'
+
+    def generate(self, prompt):
+        text = prompt.strip().splitlines()[-1] if prompt.strip() else ''
+        return f'【离线助手】{Truncator(text).chars(120)}'
+
+
+class GeminiBackend(AssistantBackend):
+    """Google Gemini（需安装 google-generativeai，并设置 GEMINI_API_KEY 环境变量）"""
+    name = 'gemini'
+
+    def __init__(self):
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise ImproperlyConfigured('GeminiBackend 需要安装 google-generativeai')
+        api_key = os.environ.get('GEMINI_API_KEY')
+        if not api_key:
+            raise ImproperlyConfigured('GeminiBackend 需要设置 GEMINI_API_KEY 环境变量')
+        genai.configure(api_key=api_key)
+        self.model = getattr(settings, 'ASSISTANT_MODEL', 'gemini-2.5-pro')
+        self._model = genai.GenerativeModel(self.model)
+
+    def generate(self, prompt):
+        return self._model.generate_content(prompt).text
+
+
+def prompt_key(backend, prompt):
+    return hashlib.sha256(f'{backend.name}:{backend.model}\n{prompt}'.encode()).hexdigest()
+
+
+def summary_prompt(guide):
+    content = Truncator(guide.content).chars(SUMMARY_SOURCE_CHARS)
+    return f'{SYSTEM_PROMPT}\n请用三句话总结下面这篇攻略的要点。\n标题：{guide.title}\n{content}'
+
+
+def pending_key(key):
+    return f'assistant:pending:{key}'
+
+
+def error_key(key):
+    return f'assistant:error:{key}'
+
+
+def hits_key(key):
+    return f'assistant:hits:{key}'
+
+
+def question_prompt(question):
+    return f'{SYSTEM_PROMPT}\n玩家提问：\n{question}'
+
+
+class InlineExecutor:
+    """在调用线程中同步执行（ASSISTANT_WORKERS=0 时使用，便于调试与测试）"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class AssistantService:
+    """带请求合并与持久缓存的助手服务"""
+
+    def __init__(self, backend, max_workers=DEFAULT_WORKERS, max_entries=DEFAULT_CACHE_MAX_ENTRIES, executor=None):
+        self.backend = backend
+        self.max_entries = max_entries
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers, thread_name_prefix='assistant') if max_workers else InlineExecutor()
+        self._executor = executor
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def cached(self, key, count_hit=True):
+        """读取持久缓存，命中时返回回答文本；count_hit=False 用于轮询状态，不计入命中次数"""
+        from .models import AssistantResponse
+
+        row = AssistantResponse.objects.filter(key=key).values('id', 'response', 'last_used_at').first()
+        if row is None:
+            return None
+        if not count_hit:
+            return row['response']
+        hits = self._count_hit(key)
+        now = timezone.now()
+        if now - row['last_used_at'] >= TOUCH_INTERVAL:
+            AssistantResponse.objects.filter(id=row['id']).update(last_used_at=now, hits=F('hits') + hits)
+            # 用 decr 扣除已写库的次数，期间其他进程新增的命中保留到下次写入
+            try:
+                cache.decr(hits_key(key), hits)
+            except ValueError:
+                pass
+        return row['response']
+
+    def _count_hit(self, key):
+        """在缓存中累加命中次数，返回尚未写库的次数"""
+        if cache.add(hits_key(key), 1, None):
+            return 1
+        try:
+            return cache.incr(hits_key(key))
+        except ValueError:
+            cache.set(hits_key(key), 1, None)
+            return 1
+
+    def submit(self, prompt):
+        """提交提示词，返回 (key, Future)；已缓存时返回已完成的 Future"""
+        key = prompt_key(self.backend, prompt)
+        answer = self.cached(key)
+        if answer is not None:
+            future = Future()
+            future.set_result(answer)
+            future.cached = True
+            return key, future
+
+        with self._lock:
+            future = self._pending.get(key)
+            created = future is None
+            if created:
+                cache.set(pending_key(key), True, PENDING_TIMEOUT)
+                future = self._executor.submit(self._generate, key, prompt)
+                future.cached = False
+                self._pending[key] = future
+        if created:
+            # 在锁外注册：已完成的 Future 会在当前线程立即执行回调
+            future.add_done_callback(lambda f: self._finish(key, f))
+        return key, future
+
+    async def aask(self, prompt):
+        _, future = self.submit(prompt)
+        return await asyncio.wrap_future(future)
+
+    def status(self, key):
+        """查询结果：返回 ('done', 回答) / ('pending', None) / ('failed', ERROR_CODE) / (None, None)"""
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None and not future.done():
+            return 'pending', None
+        answer = self.cached(key, count_hit=False)
+        if answer is not None:
+            return 'done', answer
+        if cache.get(error_key(key)):
+            return 'failed', ERROR_CODE
+        # 生成可能在其他工作进程中进行
+        if cache.get(pending_key(key)):
+            return 'pending', None
+        return None, None
+
+    def _finish(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+        error = future.exception()
+        if error is not None:
+            logger.error('助手生成失败（%s）', key, exc_info=error)
+            cache.set(error_key(key), True, ERROR_TIMEOUT)
+        cache.delete(pending_key(key))
+
+    def _generate(self, key, prompt):
+        try:
+            answer = self.backend.generate(prompt)
+            self._store(key, prompt, answer)
+            return answer
+        finally:
+            # 工作线程各自持有数据库连接，每次生成后释放
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    def _store(self, key, prompt, answer):
+        from .models import AssistantResponse
+
+        try:
+            AssistantResponse.objects.create(
+                key=key, backend=self.backend.name, model=self.backend.model, prompt=prompt, response=answer
+            )
+        except IntegrityError:
+            return
+        # 超出容量时淘汰最久未使用的条目
+        overflow = AssistantResponse.objects.count() - self.max_entries
+        if overflow > 0:
+            stale = AssistantResponse.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow]
+            AssistantResponse.objects.filter(id__in=list(stale)).delete()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            backend = import_string(getattr(settings, 'ASSISTANT_BACKEND', DEFAULT_BACKEND))()
+            _service = AssistantService(
+                backend,
+                max_workers=getattr(settings, 'ASSISTANT_WORKERS', DEFAULT_WORKERS),
+                max_entries=getattr(settings, 'ASSISTANT_CACHE_MAX_ENTRIES', DEFAULT_CACHE_MAX_ENTRIES),
+            )
+        return _service
+
+
+def reset_service():
+    global _service
+    with _service_lock:
+        _service = None
@@ -0,0 +1,251 @@
+"""搜索框输入联想
+
+进程内维护一棵前缀树，索引攻略标题、标签和作者名：
+- 每个节点惰性缓存其子树中热度最高的 MAX_SUGGESTIONS 条，查询只需沿前缀走到节点并读取缓存；
+- 攻略保存/删除时由信号增量更新本进程的索引，只使经过路径上的节点缓存失效；
+- 其他进程通过缓存中的代数（generation）得知索引已变化并重建；热度分由定时任务批量刷新，
+  不经过信号，因此索引最长 AUTOCOMPLETE_MAX_AGE 秒后也会整体重建；
+- 重建在后台线程中进行，完成后整体替换，期间查询继续使用旧索引，不阻塞请求。
+
+热度：标题取攻略的 hot_score，标签和作者取其所有攻略 hot_score 之和。
+"""
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 10
+MAX_PREFIX_LENGTH = 50
+GENERATION_KEY = 'autocomplete:generation'
+GENERATION_CHECK_INTERVAL = 1.0
+DEFAULT_MAX_AGE = 300
+
+TITLE = 'title'
+TAG = 'tag'
+AUTHOR = 'author'
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text).casefold().strip()
+
+
+class _Node:
+    __slots__ = ('children', 'keys', 'top')
+    
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+        self.top = None  # 子树热度前N的 (score, key)，None 表示需要重新计算
+
+
+class PrefixIndex:
+    """前缀树 + 每个节点的热门结果缓存"""
+    
+    def __init__(self):
+        self.root = _Node()
+        self.entries = {}  # key -> [显示文本, 索引文本, 热度]
+        self.contributions = {}  # key -> {guide_id: 热度}
+        self.guide_keys = {}  # guide_id -> 该攻略贡献的 key 列表
+    
+    def _path(self, term, create=False):
+        node, path = self.root, [self.root]
+        for char in term:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = _Node()
+            node = child
+            path.append(node)
+        return path
+    
+    def _contribute(self, key, text, guide_id, score):
+        term = normalize(text)[:MAX_PREFIX_LENGTH]
+        if not term:
+            return False
+        path = self._path(term, create=True)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [text, term, 0.0]
+            self.contributions[key] = {}
+            path[-1].keys.add(key)
+        contributions = self.contributions[key]
+        entry[2] += score - contributions.get(guide_id, 0.0)
+        contributions[guide_id] = score
+        for node in path:
+            node.top = None
+        return True
+    
+    def _withdraw(self, key, guide_id):
+        contributions = self.contributions.get(key)
+        if contributions is None or guide_id not in contributions:
+            return
+        entry = self.entries[key]
+        entry[2] -= contributions.pop(guide_id)
+        path = self._path(entry[1])
+        if not contributions:
+            del self.entries[key], self.contributions[key]
+            path[-1].keys.discard(key)
+        for node in path:
+            node.top = None
+    
+    def add_guide(self, guide_id, title, tags, author_id, author_name, score):
+        self.remove_guide(guide_id)
+        candidates = [((TITLE, guide_id), title), ((AUTHOR, author_id), author_name)]
+        candidates += [((TAG, normalize(tag)), tag.strip()) for tag in tags.split(',') if tag.strip()]
+        keys = []
+        for key, text in candidates:
+            if key not in keys and self._contribute(key, text, guide_id, score):
+                keys.append(key)
+        self.guide_keys[guide_id] = keys
+    
+    def remove_guide(self, guide_id):
+        for key in self.guide_keys.pop(guide_id, ()):
+            self._withdraw(key, guide_id)
+    
+    def _top(self, node):
+        if node.top is None:
+            candidates = [(self.entries[key][2], key) for key in node.keys]
+            for child in node.children.values():
+                candidates.extend(self._top(child))
+            node.top = heapq.nlargest(MAX_SUGGESTIONS, candidates, key=lambda item: item[0])
+        return node.top
+    
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        term = normalize(prefix)[:MAX_PREFIX_LENGTH]
+        if not term:
+            return []
+        path = self._path(term)
+        if path is None:
+            return []
+        results = []
+        for score, key in self._top(path[-1])[:limit]:
+            kind, ident = key
+            item = {'type': kind, 'text': self.entries[key][0]}
+            if kind == TITLE:
+                item['id'] = ident
+            results.append(item)
+        return results
+
+
+def build_index():
+    from .models import Guide
+
+    index = PrefixIndex()
+    rows = Guide.objects.values_list('id', 'title', 'tags', 'author_id', 'author__username', 'hot_score')
+    for row in rows.iterator(chunk_size=2000):
+        index.add_guide(*row)
+    return index
+
+
+_state = {'index': None, 'generation': None, 'built': 0.0, 'checked': 0.0, 'rebuilding': None}
+_lock = threading.RLock()  # 保护 _state 与当前索引（查询、增量更新、替换），只短暂持有
+_build_lock = threading.Lock()  # 首次构建时同时到达的请求只构建一次
+
+
+def _current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 0, None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def _rebuild(generation):
+    """后台线程：重建索引后原子替换，期间请求继续使用旧索引"""
+    try:
+        index = build_index()
+        with _lock:
+            _state.update(index=index, generation=generation, built=time.monotonic())
+    except Exception:
+        logger.exception('输入联想索引重建失败')
+    finally:
+        with _lock:
+            _state['rebuilding'] = None
+        connections.close_all()
+
+
+def get_index():
+    """返回本进程的索引；其他进程修改过攻略或索引过旧时在后台重建，重建完成前返回旧索引"""
+    now = time.monotonic()
+    index = _state['index']
+    if index is not None and now - _state['checked'] < GENERATION_CHECK_INTERVAL:
+        return index
+
+    if index is None:
+        # 冷启动没有旧索引可用，只能同步构建（预热时已完成，正常不会落到请求中）
+        with _build_lock:
+            if _state['index'] is None:
+                generation = _current_generation()
+                index = build_index()
+                with _lock:
+                    _state.update(index=index, generation=generation, built=time.monotonic(), checked=now)
+            return _state['index']
+
+    max_age = getattr(settings, 'AUTOCOMPLETE_MAX_AGE', DEFAULT_MAX_AGE)
+    generation = _current_generation()
+    with _lock:
+        stale = generation != _state['generation'] or now - _state['built'] > max_age
+        if stale and _state['rebuilding'] is None:
+            thread = threading.Thread(
+                target=_rebuild, args=(generation,), name='autocomplete-rebuild', daemon=True
+            )
+            _state['rebuilding'] = thread
+            thread.start()
+        _state['checked'] = now
+        return _state['index']
+
+
+def suggest(prefix, limit=MAX_SUGGESTIONS):
+    index = get_index()
+    # 查询会惰性填充节点缓存，且增量更新在其他线程（事务提交回调）中修改同一棵树，读写都需持锁；
+    # 命中缓存时查询只是沿前缀走一遍，持锁时间很短
+    with _lock:
+        return index.suggest(prefix, max(1, min(limit, MAX_SUGGESTIONS)))
+
+
+def _changed(apply):
+    """增量更新本进程的索引并递增代数，使其他进程重建"""
+    try:
+        generation = cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 0, None)
+        generation = cache.incr(GENERATION_KEY)
+    with _lock:
+        index = _state['index']
+        if index is None:
+            return
+        apply(index)
+        # 期间没有其他进程修改时，本进程的索引仍是最新的
+        if generation == _state['generation'] + 1:
+            _state['generation'] = generation
+
+
+def guide_saved(guide):
+    _changed(lambda index: index.add_guide(
+        guide.pk, guide.title, guide.tags, guide.author_id, guide.author.username, guide.hot_score
+    ))
+
+
+def guide_deleted(guide_id):
+    _changed(lambda index: index.remove_guide(guide_id))
+
+
+def wait_for_rebuild(timeout=None):
+    """等待进行中的后台重建完成（测试与预热使用）"""
+    thread = _state['rebuilding']
+    if thread is not None:
+        thread.join(timeout)
+
+
+def reset_index():
+    wait_for_rebuild()
+    with _lock:
+        _state.update(index=None, generation=None, built=0.0, checked=0.0, rebuilding=None)
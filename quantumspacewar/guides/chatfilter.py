@@ -0,0 +1,167 @@
+"""聊天内容过滤
+
+词表编译为 Aho-Corasick 自动机，每条消息只需线性扫描一遍，与词表大小无关：
+- 匹配不区分大小写和全角/半角；
+- 普通词命中后用 * 遮盖，词表中以 ! 开头的词命中后拒绝整条消息；
+- 词表文件（settings.CHAT_FILTER_WORDS_FILE）修改后，各进程在 CHAT_FILTER_RELOAD_INTERVAL 秒内自动重新编译。
+"""
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import deque, namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MASK = 'mask'
+REJECT = 'reject'
+MASK_CHAR = '*'
+DEFAULT_RELOAD_INTERVAL = 5
+
+FilterResult = namedtuple('FilterResult', ['text', 'rejected', 'matches'])
+
+
+@lru_cache(maxsize=8192)
+def fold(char):
+    """单字符归一化：全角转半角并忽略大小写（保持长度不变，便于按位置遮盖）"""
+    folded = unicodedata.normalize('NFKC', char).casefold()
+    return folded if len(folded) == 1 else char
+
+
+class Automaton:
+    """Aho-Corasick 多模式匹配自动机"""
+    
+    def __init__(self, words):
+        # 每个状态：转移表、失败指针、以该状态结尾的 (词长, 动作) 列表
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for word, action in words.items():
+            self._add(word, action)
+        self._link()
+    
+    def _add(self, word, action):
+        state = 0
+        for char in word:
+            nxt = self.goto[state].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = nxt
+        self.output[state].append((len(word), action))
+    
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+    
+    def finditer(self, text):
+        """依次产出 (起始位置, 结束位置, 动作)"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for index, char in enumerate(text):
+            char = fold(char)
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, action in output[state]:
+                yield index + 1 - length, index + 1, action
+
+
+class ChatFilter:
+    def __init__(self, words):
+        self.automaton = Automaton(words)
+        self.size = len(words)
+    
+    def check(self, text):
+        """返回 FilterResult：遮盖后的文本、是否拒绝、命中的词"""
+        spans = list(self.automaton.finditer(text))
+        if not spans:
+            return FilterResult(text, False, [])
+        matches = [text[start:end] for start, end, _ in spans]
+        if any(action == REJECT for _, _, action in spans):
+            return FilterResult(text, True, matches)
+        chars = list(text)
+        for start, end, _ in spans:
+            chars[start:end] = MASK_CHAR * (end - start)
+        return FilterResult(''.join(chars), False, matches)
+
+
+def parse_words(lines):
+    """解析词表行：# 开头为注释，! 开头为拒绝词"""
+    words = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        action = MASK
+        if line.startswith('!'):
+            action, line = REJECT, line[1:].strip()
+        word = ''.join(fold(char) for char in line)
+        if word:
+            # 同一个词同时出现在两种列表时按更严格的处理
+            if words.get(word) != REJECT:
+                words[word] = action
+    return words
+
+
+def load_filter(path):
+    with open(path, encoding='utf-8') as f:
+        return ChatFilter(parse_words(f))
+
+
+_state = {'filter': None, 'path': None, 'mtime': None, 'checked': 0.0}
+_lock = threading.Lock()
+
+
+def get_filter():
+    """返回当前词表编译出的过滤器；词表文件变化后重新编译"""
+    interval = getattr(settings, 'CHAT_FILTER_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL)
+    now = time.monotonic()
+    if _state['filter'] is not None and now - _state['checked'] < interval:
+        return _state['filter']
+
+    with _lock:
+        if _state['filter'] is not None and now - _state['checked'] < interval:
+            return _state['filter']
+        path = getattr(settings, 'CHAT_FILTER_WORDS_FILE', None)
+        try:
+            mtime = os.path.getmtime(path) if path else None
+        except OSError:
+            mtime = None
+        if _state['filter'] is None or (path, mtime) != (_state['path'], _state['mtime']):
+            try:
+                _state['filter'] = load_filter(path) if mtime is not None else ChatFilter({})
+            except (OSError, UnicodeDecodeError):
+                logger.exception('加载聊天过滤词表失败: %s', path)
+                if _state['filter'] is None:
+                    _state['filter'] = ChatFilter({})
+            else:
+                logger.info('聊天过滤词表已加载: %s（%d 个词）', path, _state['filter'].size)
+            _state['path'], _state['mtime'] = path, mtime
+        _state['checked'] = now
+        return _state['filter']
+
+
+def reset_filter():
+    """丢弃已编译的过滤器（测试或修改配置后使用）"""
+    with _lock:
+        _state.update(filter=None, path=None, mtime=None, checked=0.0)
+
+
+def check_message(text):
+    return get_filter().check(text)
@@ -0,0 +1,91 @@
+"""聊天室已读游标与未读数
+
+- 每个用户每个房间只存一个“已读到的最后消息ID”（ChatReadCursor），不再逐条标记消息；
+- 游标先写缓存，同一房间距上次落库不足 CURSOR_FLUSH_INTERVAL 秒的推进只更新缓存，
+  轮询再频繁也最多每30秒一条 UPDATE；缓存失效时最多丢失最近30秒的进度（只会多显示几条未读）；
+- 未读数 = 房间内 id 大于游标、且不是自己发送的消息数，借助 (room_name, id) 索引一条查询算出所有房间。
+"""
+import hashlib
+import time
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+CURSOR_FLUSH_INTERVAL = 30
+CURSOR_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def cursor_cache_key(user_id, room_name):
+    room = hashlib.blake2b(room_name.encode(), digest_size=8).hexdigest()
+    return f'chatread:{user_id}:{room}'
+
+
+def _load_states(user_id, room_names):
+    """返回 {房间: (已读ID, 已落库ID, 落库时间)}，缓存未命中的从数据库补齐"""
+    from .models import ChatReadCursor
+
+    keys = {room: cursor_cache_key(user_id, room) for room in room_names}
+    cached = cache.get_many(keys.values())
+    states = {room: cached[key] for room, key in keys.items() if key in cached}
+
+    missing = [room for room in room_names if room not in states]
+    if missing:
+        stored = dict(
+            ChatReadCursor.objects.filter(user_id=user_id, room_name__in=missing)
+            .values_list('room_name', 'last_read_id')
+        )
+        loaded = {room: (stored.get(room, 0), stored.get(room, 0), 0) for room in missing}
+        cache.set_many({keys[room]: state for room, state in loaded.items()}, CURSOR_CACHE_TIMEOUT)
+        states.update(loaded)
+    return states
+
+
+def get_cursors(user_id, room_names):
+    """返回 {房间: 已读到的最后消息ID}"""
+    return {room: state[0] for room, state in _load_states(user_id, room_names).items()}
+
+
+def _write_cursor(user_id, room_name, message_id):
+    from .models import ChatReadCursor
+
+    # 只向前推进，并发的旧请求不会把游标改小
+    updated = ChatReadCursor.objects.filter(
+        user_id=user_id, room_name=room_name, last_read_id__lt=message_id
+    ).update(last_read_id=message_id, updated_at=timezone.now())
+    if not updated:
+        ChatReadCursor.objects.bulk_create(
+            [ChatReadCursor(user_id=user_id, room_name=room_name, last_read_id=message_id)],
+            ignore_conflicts=True
+        )
+
+
+def mark_read(user_id, room_name, message_id):
+    """将游标推进到 message_id，游标确有前进时返回True"""
+    last_read, flushed, flushed_at = _load_states(user_id, [room_name])[room_name]
+    if message_id <= last_read:
+        return False
+
+    now = time.time()
+    if now - flushed_at >= CURSOR_FLUSH_INTERVAL:
+        _write_cursor(user_id, room_name, message_id)
+        flushed, flushed_at = message_id, now
+    cache.set(cursor_cache_key(user_id, room_name), (message_id, flushed, flushed_at), CURSOR_CACHE_TIMEOUT)
+    return True
+
+
+def unread_counts(user_id, room_names):
+    """返回 {房间: 未读消息数}，所有房间共用一条分组计数查询"""
+    from .models import ChatMessage
+
+    if not room_names:
+        return {}
+    cursors = get_cursors(user_id, room_names)
+    condition = reduce(or_, (Q(room_name=room, id__gt=last_read) for room, last_read in cursors.items()))
+    counts = dict(
+        ChatMessage.objects.filter(condition).exclude(sender_id=user_id)
+        .order_by().values('room_name').annotate(unread=Count('id')).values_list('room_name', 'unread')
+    )
+    return {room: counts.get(room, 0) for room in room_names}
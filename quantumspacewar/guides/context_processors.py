@@ -1,18 +1,25 @@
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.models import User
 from .models import Guide
 
+STATS_CACHE_KEY = 'site_stats'
+STATS_CACHE_TIMEOUT = 60  # 统计数据允许1分钟的延迟，避免每次渲染页面都执行两次 COUNT
+
+def get_site_stats():
+    """全站统计（带缓存）"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        # 计算活跃用户数（最近30天内登录的用户）
+        thirty_days_ago = timezone.now() - timedelta(days=30)
+        stats = {
+            'total_guides': Guide.objects.count(),
+            'active_users': User.objects.filter(last_login__gte=thirty_days_ago).count(),
+        }
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
 def global_stats(request):
     """全局统计数据上下文处理器，为所有模板提供统一的统计信息"""
-    # 计算总攻略数
-    total_guides = Guide.objects.count()
-    
-    # 计算活跃用户数（最近30天内登录的用户）
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    active_users = User.objects.filter(last_login__gte=thirty_days_ago).count()
-    
-    return {
-        'total_guides': total_guides,
-        'active_users': active_users
-    }
\ No newline at end of file
+    return get_site_stats()
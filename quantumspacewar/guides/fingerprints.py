@@ -0,0 +1,143 @@
+"""攻略内容指纹与重复检测
+
+- 精确重复：正文归一化（全角转半角、忽略大小写、去掉空白和标点）后的 SHA-256，带索引直接查找；
+- 近似重复：正文按字符 SHINGLE_SIZE-gram 切分后计算 NUM_PERM 维 MinHash 签名，分成 BANDS 段做 LSH，
+  每段的哈希存为一个桶号。新内容只需查询与其桶号相同的少量候选，再用签名估计 Jaccard 相似度，
+  不必与全部攻略逐篇比较。
+
+签名由 Guide 的 post_save 信号在正文变化时写入（见 signals.py）。
+"""
+import hashlib
+import re
+import unicodedata
+import zlib
+from array import array
+from functools import lru_cache
+
+from django.conf import settings
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.8
+MIN_SHINGLES = 10  # 太短的内容只做精确比较
+
+_PRIME = (1 << 61) - 1
+_MIX = (0x5BD1E9955BD1E995, 0x27D4EB2F165667C5)  # 把32位 crc 混合到61位空间的乘数与偏移
+_ROTATION = 0x9E3779B97F4A7C15 % _PRIME
+
+_noise_re = re.compile(r'[\W_]+')
+
+
+def normalize(content):
+    return _noise_re.sub('', unicodedata.normalize('NFKC', content).casefold())
+
+
+def content_hash(normalized):
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def shingles(normalized):
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized.encode())} if normalized else set()
+    return {
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(values):
+    """单次置换 MinHash（one permutation hashing）：每个值只哈希一次，按哈希值分到 NUM_PERM 个桶中取最小值，
+    空桶从右侧最近的非空桶借值（旋转致密化），代价与内容长度成线性而不是乘以 NUM_PERM"""
+    mult, offset = _MIX
+    bins = [None] * NUM_PERM
+    for value in values:
+        mixed = (value * mult + offset) % _PRIME
+        index, rest = mixed % NUM_PERM, mixed // NUM_PERM
+        current = bins[index]
+        if current is None or rest < current:
+            bins[index] = rest
+    signature = []
+    for index in range(NUM_PERM):
+        distance = 0
+        while bins[(index + distance) % NUM_PERM] is None:
+            distance += 1
+        signature.append((bins[(index + distance) % NUM_PERM] + distance * _ROTATION) % _PRIME)
+    return signature
+
+
+def band_buckets(signature):
+    """每段签名哈希为一个有符号64位桶号（段号参与哈希，不同段互不碰撞）"""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(array('Q', [band, *rows]).tobytes(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+
+def similarity(a, b):
+    """两个 MinHash 签名估计的 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+class Fingerprint:
+    def __init__(self, content):
+        normalized = normalize(content)
+        self.hash = content_hash(normalized)
+        values = shingles(normalized)
+        self.signature = minhash(values) if len(values) >= MIN_SHINGLES else None
+        self.buckets = band_buckets(self.signature) if self.signature else []
+    
+    def signature_bytes(self):
+        return array('Q', self.signature).tobytes() if self.signature else b''
+
+
+@lru_cache(maxsize=32)
+def fingerprint_for(content):
+    """同一正文在提交校验和保存信号中各用一次，缓存避免重复计算"""
+    return Fingerprint(content)
+
+
+def load_signature(data):
+    return list(array('Q', bytes(data))) if data else None
+
+
+def save_fingerprint(guide):
+    """写入或更新攻略的指纹与LSH桶"""
+    from .models import GuideBucket, GuideFingerprint
+
+    fingerprint = fingerprint_for(guide.content)
+    GuideFingerprint.objects.update_or_create(
+        guide_id=guide.pk,
+        defaults={'content_hash': fingerprint.hash, 'signature': fingerprint.signature_bytes()}
+    )
+    GuideBucket.objects.filter(guide_id=guide.pk).delete()
+    GuideBucket.objects.bulk_create(
+        [GuideBucket(guide_id=guide.pk, bucket=bucket) for bucket in fingerprint.buckets]
+    )
+    return fingerprint
+
+
+def find_duplicate(content, exclude=None):
+    """返回 (攻略ID, 相似度)；没有重复或近似重复时返回 None"""
+    from .models import GuideBucket, GuideFingerprint
+
+    fingerprint = fingerprint_for(content)
+    fingerprints = GuideFingerprint.objects.exclude(guide_id=exclude)
+
+    exact = fingerprints.filter(content_hash=fingerprint.hash).values_list('guide_id', flat=True).first()
+    if exact is not None:
+        return exact, 1.0
+    if not fingerprint.buckets:
+        return None
+
+    threshold = getattr(settings, 'DUPLICATE_GUIDE_THRESHOLD', DEFAULT_THRESHOLD)
+    candidates = GuideBucket.objects.filter(bucket__in=fingerprint.buckets).values('guide_id')
+    best = None
+    for guide_id, data in fingerprints.filter(guide_id__in=candidates).values_list('guide_id', 'signature'):
+        score = similarity(fingerprint.signature, load_signature(data) or ())
+        if score >= threshold and (best is None or score > best[1]):
+            best = (guide_id, score)
+    return best
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import authenticate  # 添加这行导入
 from django.core.exceptions import ValidationError
+from .fingerprints import find_duplicate
 from .models import Guide
 import re
 
@@ -170,6 +171,12 @@ class GuideForm(forms.ModelForm):
             raise ValidationError('内容太短了，至少需要20个字符')
         if len(content) > 10000:
             raise ValidationError('内容太长了，不能超过10000个字符')
+        
+        # 检查是否与已有攻略内容重复或高度相似（基于指纹和LSH，不逐篇比较）
+        duplicate = find_duplicate(content, exclude=self.instance.pk)
+        if duplicate:
+            title = Guide.objects.filter(pk=duplicate[0]).values_list('title', flat=True).first()
+            raise ValidationError(f'内容与已有攻略《{title}》重复（相似度 {duplicate[1]:.0%}）')
         return content
     
     def clean_tags(self):
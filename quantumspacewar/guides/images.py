@@ -0,0 +1,364 @@
+"""外链图片代理与缩略图缓存
+
+攻略封面、用户头像是任意外部URL，页面不再直接引用原图，而是引用 /img/<尺寸>/<签名令牌>/：
+- 令牌是对原图URL的签名，代理只抓取站点自己生成过链接的图片，不能被当作任意URL的转发器；
+- 抓取器可替换（settings.IMAGE_PROXY_FETCHER），默认用标准库 http.client 抓取：拒绝内网地址并固定连接到
+  校验过的IP，限制大小，整个抓取（含重定向与读取）受 IMAGE_PROXY_TIMEOUT 总时限约束；
+- 用 Pillow（requirements.txt 中的依赖）裁剪缩放到固定尺寸；部署环境缺少 Pillow 时退回原样缓存常见位图格式；
+- 结果按 SHA-256(尺寸, URL) 存入磁盘缓存目录，文件修改时间作为最近使用时间，
+  总大小超过 IMAGE_CACHE_MAX_BYTES 时按最近最少使用淘汰；
+- 响应带长期缓存头和 ETag，抓取失败会短暂记住，避免反复请求慢速外站。
+"""
+import hashlib
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import socket
+import ssl
+import tempfile
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .staticfiles import etag_matches
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - 取决于部署环境
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+SIZES = {
+    'avatar': (96, 96),
+    'card': (320, 180),
+    'cover': (960, 540),
+}
+SIGNING_SALT = 'guides.images'
+DEFAULT_MAX_SOURCE_BYTES = 5 * 1024 * 1024
+DEFAULT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_TIMEOUT = 5
+DEFAULT_MAX_AGE = 60 * 60 * 24 * 30
+DEFAULT_FAILURE_TTL = 300
+MAX_REDIRECTS = 3
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+READ_CHUNK = 64 * 1024
+USER_AGENT = 'QuantumSpaceWar-ImageProxy/1.0'
+EVICT_TO = 0.9  # 淘汰到上限的90%，避免每次写入都触发扫描
+CONTENT_TYPES = {'.jpg': 'image/jpeg', '.png': 'image/png', '.gif': 'image/gif', '.webp': 'image/webp'}
+EXTENSIONS = {content_type: ext for ext, content_type in CONTENT_TYPES.items()}
+
+
+class FetchError(Exception):
+    pass
+
+
+def thumbnail_url(url, size):
+    """返回原图URL对应的代理缩略图地址；URL为空时返回空字符串"""
+    if not url:
+        return ''
+    # 不带时间戳的签名：同一图片的代理地址保持不变，浏览器缓存才能命中
+    token = signing.Signer(salt=SIGNING_SALT).sign_object(url, compress=True)
+    return reverse('guides:image_proxy', kwargs={'size': size, 'token': token})
+
+
+def load_token(token):
+    """校验令牌并返回原图URL，无效时返回 None"""
+    try:
+        return signing.Signer(salt=SIGNING_SALT).unsign_object(token)
+    except signing.BadSignature:
+        return None
+
+
+def is_public_address(address):
+    return ipaddress.ip_address(address.split('%')[0]).is_global
+
+
+def resolve_public_host(url):
+    """校验URL并解析主机，返回 (URL各部分, 端口, 已校验的公网IP)；任一解析结果为内网地址时拒绝"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise FetchError(f'不支持的地址: {url}')
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError) as exc:
+        raise FetchError(f'无法解析主机: {parts.hostname}') from exc
+    addresses = [info[4][0] for info in infos]
+    if not addresses or not all(is_public_address(address) for address in addresses):
+        raise FetchError(f'拒绝访问内网地址: {parts.hostname}')
+    return parts, port, addresses[0]
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """连接到已校验的IP而不是重新解析主机名（防止校验后DNS改指内网，即 DNS rebinding），Host 头仍为原主机名"""
+
+    def __init__(self, host, port, address, timeout):
+        super().__init__(host, port, timeout=timeout)
+        self.address = address
+        self.pinned_sock = None
+
+    def connect(self):
+        self.sock = self.pinned_sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS 版本：连接已校验的IP，证书校验与SNI仍使用原主机名"""
+
+    def __init__(self, host, port, address, timeout):
+        super().__init__(host, port, timeout=timeout, context=ssl.create_default_context())
+        self.address = address
+        self.pinned_sock = None
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self.pinned_sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class HttpFetcher:
+    """用标准库抓取外链图片：每一跳（包括重定向）都校验地址并固定连接到校验过的IP，整个抓取共用一个截止时间"""
+    
+    def __init__(self):
+        self.timeout = getattr(settings, 'IMAGE_PROXY_TIMEOUT', DEFAULT_TIMEOUT)
+        self.max_bytes = getattr(settings, 'IMAGE_PROXY_MAX_SOURCE_BYTES', DEFAULT_MAX_SOURCE_BYTES)
+    
+    @staticmethod
+    def remaining(deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise FetchError('抓取超时')
+        return remaining
+    
+    def fetch(self, url):
+        """返回 (图片字节, Content-Type)"""
+        deadline = time.monotonic() + self.timeout
+        for _ in range(MAX_REDIRECTS + 1):
+            parts, port, address = resolve_public_host(url)
+            connection_class = _PinnedHTTPSConnection if parts.scheme == 'https' else _PinnedHTTPConnection
+            connection = connection_class(parts.hostname, port, address, self.remaining(deadline))
+            try:
+                path = parts.path or '/'
+                if parts.query:
+                    path += '?' + parts.query
+                connection.request('GET', path, headers={'User-Agent': USER_AGENT, 'Accept': 'image/*'})
+                connection.pinned_sock.settimeout(self.remaining(deadline))
+                response = connection.getresponse()
+                if response.status in REDIRECT_STATUSES and response.getheader('Location'):
+                    url = urljoin(url, response.getheader('Location'))
+                    continue
+                if response.status != 200:
+                    raise FetchError(f'HTTP {response.status}')
+                content_type = response.msg.get_content_type()
+                if not content_type.startswith('image/'):
+                    raise FetchError(f'不是图片: {content_type}')
+                return self.read(connection, response, deadline), content_type
+            except (http.client.HTTPException, OSError, ValueError) as exc:
+                raise FetchError(str(exc) or exc.__class__.__name__) from exc
+            finally:
+                connection.close()
+        raise FetchError('重定向次数过多')
+    
+    def read(self, connection, response, deadline):
+        """分块读取响应体，每次读取前按剩余时间设置超时，慢速外站无法无限期占用工作进程"""
+        chunks, total = [], 0
+        while True:
+            connection.pinned_sock.settimeout(self.remaining(deadline))
+            chunk = response.read1(READ_CHUNK)
+            if not chunk:
+                return b''.join(chunks)
+            total += len(chunk)
+            if total > self.max_bytes:
+                raise FetchError('图片过大')
+            chunks.append(chunk)
+
+
+class StubFetcher:
+    """本地开发与测试用：不访问网络，按URL生成固定颜色的图片（未安装 Pillow 时返回1像素GIF）"""
+    GIF = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00'
+           b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+    
+    def __init__(self):
+        self.calls = []
+    
+    def fetch(self, url):
+        self.calls.append(url)
+        if Image is None:
+            return self.GIF, 'image/gif'
+        color = hashlib.md5(url.encode()).digest()[:3]
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), tuple(color)).save(buffer, 'PNG')
+        return buffer.getvalue(), 'image/png'
+
+
+def resize(data, content_type, size):
+    """裁剪缩放为固定尺寸；不透明图片输出JPEG，带透明通道的输出PNG"""
+    if Image is None:
+        # 无法重新编码时只缓存常见位图格式（SVG等可能含脚本，不能以本站域名提供）
+        if content_type not in EXTENSIONS:
+            raise FetchError(f'不支持的图片格式: {content_type}')
+        return data, content_type
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source = ImageOps.exif_transpose(source)
+            has_alpha = source.mode in ('RGBA', 'LA') or 'transparency' in source.info
+            image = ImageOps.fit(source.convert('RGBA' if has_alpha else 'RGB'), SIZES[size], Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise FetchError(f'无法解析图片: {exc}') from exc
+    buffer = io.BytesIO()
+    if has_alpha:
+        image.save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue(), 'image/png'
+    image.save(buffer, 'JPEG', quality=82, optimize=True, progressive=True)
+    return buffer.getvalue(), 'image/jpeg'
+
+
+class ThumbnailCache:
+    """磁盘缩略图缓存：按 SHA-256(尺寸, URL) 命名，按修改时间做LRU淘汰"""
+    
+    def __init__(self, root, max_bytes):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.size = None  # 本进程估计的缓存总大小，首次写入时扫描得到
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def key(url, size):
+        return hashlib.sha256(f'{size}\n{url}'.encode()).hexdigest()
+    
+    def _dir(self, key):
+        return os.path.join(self.root, key[:2])
+    
+    def get(self, key):
+        """返回缓存文件路径，命中时刷新其最近使用时间"""
+        directory = self._dir(key)
+        for ext in CONTENT_TYPES:
+            path = os.path.join(directory, key + ext)
+            try:
+                os.utime(path)
+            except OSError:
+                continue
+            return path
+        return None
+    
+    def put(self, key, data, content_type):
+        directory = self._dir(key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, key + EXTENSIONS.get(content_type, '.jpg'))
+        # 先写临时文件再原子替换，并发读取不会看到写了一半的图片
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self.lock:
+            if self.size is None:
+                self.size = self.scan_size()
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self.evict()
+        return path
+    
+    def _files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith('.tmp'):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+    
+    def scan_size(self):
+        return sum(size for _, size, _ in self._files())
+    
+    def evict(self):
+        """按最近使用时间从旧到新删除，直到总大小降到上限的90%以下"""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * EVICT_TO
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self.size = total
+        return total
+
+
+_state = {}
+_lock = threading.Lock()
+
+
+def get_fetcher():
+    with _lock:
+        if 'fetcher' not in _state:
+            path = getattr(settings, 'IMAGE_PROXY_FETCHER', 'guides.images.HttpFetcher')
+            _state['fetcher'] = import_string(path)()
+        return _state['fetcher']
+
+
+def get_cache():
+    with _lock:
+        if 'cache' not in _state:
+            _state['cache'] = ThumbnailCache(
+                settings.IMAGE_CACHE_DIR,
+                getattr(settings, 'IMAGE_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES),
+            )
+        return _state['cache']
+
+
+def reset():
+    """丢弃抓取器与缓存实例（测试或修改配置后使用）"""
+    with _lock:
+        _state.clear()
+
+
+def get_thumbnail(url, size):
+    """返回缩略图的缓存文件路径，必要时抓取并生成；失败时抛出 FetchError"""
+    cache = get_cache()
+    key = cache.key(url, size)
+    path = cache.get(key)
+    if path is None:
+        data, content_type = get_fetcher().fetch(url)
+        data, content_type = resize(data, content_type, size)
+        path = cache.put(key, data, content_type)
+    return path
+
+
+def serve(request, url, size):
+    """返回缩略图响应；抓取失败时返回502并在 IMAGE_PROXY_FAILURE_TTL 秒内不再重试"""
+    failure_key = f'image_proxy:failed:{ThumbnailCache.key(url, size)}'
+    if cache.get(failure_key):
+        return HttpResponse(status=502)
+    try:
+        path = get_thumbnail(url, size)
+    except FetchError as exc:
+        logger.warning('图片代理抓取失败 %s: %s', url, exc)
+        cache.set(failure_key, 1, getattr(settings, 'IMAGE_PROXY_FAILURE_TTL', DEFAULT_FAILURE_TTL))
+        return HttpResponse(status=502)
+
+    name = os.path.basename(path)
+    etag = f'"{name}-{os.path.getsize(path):x}"'
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=CONTENT_TYPES[os.path.splitext(name)[1]])
+        del response['Content-Disposition']
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = f"public, max-age={getattr(settings, 'IMAGE_PROXY_MAX_AGE', DEFAULT_MAX_AGE)}"
+    return response
+
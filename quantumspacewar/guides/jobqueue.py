@@ -0,0 +1,228 @@
+"""基于数据库表的后台任务队列（不依赖消息代理）
+
+- 任务函数用 @job 注册，enqueue() 或 函数.delay() 写入 Job 表，由 manage.py run_jobs 的工作进程执行；
+- 领取任务：数据库支持 SELECT ... FOR UPDATE SKIP LOCKED（PostgreSQL/MySQL 8）时使用行锁跳过，
+  否则（SQLite）用带状态条件的 UPDATE 抢占，只有更新到1行的进程领取成功；
+- 失败按指数退避重试，超过 max_attempts 次标记为失败；
+- 执行期间由心跳线程每 JOB_HEARTBEAT_INTERVAL 秒刷新 locked_at；工作进程异常退出、心跳超过
+  JOB_LOCK_TIMEOUT 未更新的任务会被放回队列，长时间运行但仍存活的任务不会被重复领取；
+- 结果只在任务仍由本进程锁定时写回，锁已被回收的任务不会覆盖其他进程的执行状态；
+- 周期任务（@job(every=...)）由 JobSchedule 表记录下次执行时间，多个工作进程同样用条件 UPDATE 保证每个周期只入队一次；
+- 已完成、已失败的任务分别保留 JOB_DONE_RETENTION、JOB_FAILED_RETENTION 秒后由周期任务清理。
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BASE_DELAY = 10  # 秒，第n次重试等待 base * 2^(n-1)
+MAX_RETRY_DELAY = 60 * 60
+DEFAULT_LOCK_TIMEOUT = 600
+DEFAULT_HEARTBEAT_INTERVAL = 60
+DEFAULT_DONE_RETENTION = 60 * 60 * 24
+DEFAULT_FAILED_RETENTION = 60 * 60 * 24 * 7
+CLAIM_BATCH = 10
+
+REGISTRY = {}
+PERIODIC = {}
+
+
+def job(name=None, max_attempts=DEFAULT_MAX_ATTEMPTS, every=None):
+    """注册任务函数；every 为 timedelta 时同时注册为周期任务"""
+    def decorator(func):
+        job_name = name or f'{func.__module__}.{func.__name__}'
+        REGISTRY[job_name] = func
+        if every is not None:
+            PERIODIC[job_name] = every
+        func.job_name = job_name
+        func.delay = lambda **kwargs: enqueue(job_name, max_attempts=max_attempts, **kwargs)
+        return func
+    return decorator
+
+
+def enqueue(name, run_at=None, max_attempts=DEFAULT_MAX_ATTEMPTS, **kwargs):
+    """写入一个待执行任务；在事务中调用时，事务提交后任务才对工作进程可见"""
+    from .models import Job
+
+    if name not in REGISTRY:
+        raise KeyError(f'未注册的任务: {name}')
+    return Job.objects.create(
+        name=name, kwargs=kwargs, run_at=run_at or timezone.now(), max_attempts=max_attempts
+    )
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'JOB_RETRY_BASE_DELAY', DEFAULT_RETRY_BASE_DELAY)
+    delay = min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(worker, limit=CLAIM_BATCH):
+    """领取最多 limit 个到期任务，返回已标记为运行中的 Job 列表"""
+    from .models import Job
+
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.PENDING, run_at__lte=now).order_by('run_at', 'id')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = list(due.select_for_update(skip_locked=True)[:limit])
+            Job.objects.filter(id__in=[j.id for j in jobs]).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=now
+            )
+    else:
+        jobs = []
+        for candidate in due[:limit]:
+            claimed = Job.objects.filter(id=candidate.id, status=Job.PENDING).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=now
+            )
+            if claimed:
+                jobs.append(candidate)
+
+    for j in jobs:
+        j.status, j.locked_by, j.locked_at = Job.RUNNING, worker, now
+    return jobs
+
+
+class Heartbeat(threading.Thread):
+    """任务执行期间定期刷新 locked_at，表明领取它的工作进程仍然存活"""
+
+    def __init__(self, job_id, worker, interval=None):
+        super().__init__(name=f'job-heartbeat-{job_id}', daemon=True)
+        self.job_id = job_id
+        self.worker = worker
+        self.interval = interval or getattr(settings, 'JOB_HEARTBEAT_INTERVAL', DEFAULT_HEARTBEAT_INTERVAL)
+        self._stopped = threading.Event()
+
+    def beat(self):
+        """刷新锁定时间，返回锁是否仍归本进程所有"""
+        from .models import Job
+
+        return bool(Job.objects.filter(
+            pk=self.job_id, status=Job.RUNNING, locked_by=self.worker
+        ).update(locked_at=timezone.now()))
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                if not self.beat():
+                    break
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def execute(j):
+    """执行一个已领取的任务，仍持有锁时记录结果，返回写回的状态（锁已丢失时返回None）"""
+    from .models import Job
+
+    worker = j.locked_by
+    j.attempts += 1
+    func = REGISTRY.get(j.name)
+    heartbeat = Heartbeat(j.pk, worker)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise KeyError(f'未注册的任务: {j.name}')
+        func(**j.kwargs)
+    except Exception:
+        j.last_error = traceback.format_exc()
+        if j.attempts >= j.max_attempts:
+            j.status = Job.FAILED
+            j.finished_at = timezone.now()
+            logger.error('任务 %s#%s 失败，已重试 %d 次', j.name, j.pk, j.attempts)
+        else:
+            j.status = Job.PENDING
+            j.run_at = timezone.now() + retry_delay(j.attempts)
+            logger.warning('任务 %s#%s 第 %d 次执行失败，将于 %s 重试', j.name, j.pk, j.attempts, j.run_at)
+    else:
+        j.status = Job.DONE
+        j.finished_at = timezone.now()
+    finally:
+        heartbeat.stop()
+    j.locked_by = ''
+    j.locked_at = None
+    written = Job.objects.filter(pk=j.pk, status=Job.RUNNING, locked_by=worker).update(
+        status=j.status, attempts=j.attempts, last_error=j.last_error, run_at=j.run_at,
+        finished_at=j.finished_at, locked_by='', locked_at=None
+    )
+    if not written:
+        logger.warning('任务 %s#%s 的锁已被回收，丢弃 %s 的执行结果', j.name, j.pk, worker)
+        return None
+    return j.status
+
+
+def release_stale():
+    """把心跳超时（工作进程已退出）的任务放回队列"""
+    from .models import Job
+
+    timeout = getattr(settings, 'JOB_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status=Job.PENDING, locked_by='', locked_at=None)
+
+
+def purge_finished():
+    """删除超过保留时间的已完成、已失败任务，返回删除的行数"""
+    from .models import Job
+
+    now = timezone.now()
+    done = getattr(settings, 'JOB_DONE_RETENTION', DEFAULT_DONE_RETENTION)
+    failed = getattr(settings, 'JOB_FAILED_RETENTION', DEFAULT_FAILED_RETENTION)
+    deleted, _ = Job.objects.filter(
+        Q(status=Job.DONE, finished_at__lt=now - timedelta(seconds=done))
+        | Q(status=Job.FAILED, finished_at__lt=now - timedelta(seconds=failed))
+    ).delete()
+    return deleted
+
+
+def schedule_periodic():
+    """为到期的周期任务入队，返回入队的任务名列表"""
+    from .models import JobSchedule
+
+    now = timezone.now()
+    existing = set(JobSchedule.objects.filter(name__in=PERIODIC).values_list('name', flat=True))
+    JobSchedule.objects.bulk_create(
+        [JobSchedule(name=name, next_run_at=now) for name in PERIODIC if name not in existing],
+        ignore_conflicts=True
+    )
+
+    enqueued = []
+    for schedule in JobSchedule.objects.filter(name__in=PERIODIC, next_run_at__lte=now):
+        interval = PERIODIC[schedule.name]
+        won = JobSchedule.objects.filter(
+            pk=schedule.pk, next_run_at=schedule.next_run_at
+        ).update(next_run_at=now + interval)
+        if won:
+            enqueue(schedule.name)
+            enqueued.append(schedule.name)
+    return enqueued
+
+
+def run_pending(worker=None, limit=CLAIM_BATCH):
+    """执行一轮：入队周期任务、回收超时任务、领取并执行到期任务，返回执行的任务数"""
+    worker = worker or worker_id()
+    schedule_periodic()
+    release_stale()
+    jobs = claim(worker, limit)
+    for j in jobs:
+        execute(j)
+    return len(jobs)
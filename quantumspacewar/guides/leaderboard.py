@@ -0,0 +1,199 @@
+"""玩家排行榜
+
+每个进程维护一份按 (-分数, user_id) 排好序的内存索引：
+- 启动后首次访问时用一次走索引的 ORDER BY 查询构建；
+- 索引使用 sortedcontainers.SortedList，UserProfile 保存/删除时由信号增量插入/删除，均为 O(log n)；
+- “我的排名”通过 bisect_left 得到，O(log n)；
+- 缓存中保存各进程共享的版本号，任一进程修改资料后递增。本地索引记录其对应的版本号，
+  每次访问时比较，版本号变化（其他进程有修改）时重建，各进程的排名与分页因此一致；
+  另外每 REBUILD_INTERVAL 秒也会重建一次，吸收绕过信号的批量修改；
+- 排行榜分页结果缓存在 Django 缓存中，键里带有索引对应的版本号，版本号递增后所有进程的分页缓存同时失效，
+  过期的索引不会以新版本号写入分页缓存。
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from sortedcontainers import SortedList
+
+PAGE_SIZE = 20
+PAGE_CACHE_TIMEOUT = 60
+REBUILD_INTERVAL = 300
+
+
+class Leaderboard:
+    """单个排序维度（如经验值、胜率）的排行榜"""
+
+    def __init__(self, field, rebuild_interval=REBUILD_INTERVAL):
+        self.field = field
+        self.rebuild_interval = rebuild_interval
+        self._keys = SortedList()
+        self._key_by_user = {}
+        self._built_at = None
+        self._version = None  # 本地索引对应的共享版本号
+        self._lock = threading.RLock()
+
+    def _ensure_built(self):
+        """本地索引落后于共享版本号或过旧时重建，返回索引对应的版本号（调用方需持有锁）"""
+        version = self.version()
+        if (self._built_at is None or version != self._version
+                or time.monotonic() - self._built_at > self.rebuild_interval):
+            self.rebuild(version)
+        return self._version
+
+    def rebuild(self, version=None):
+        """从数据库重建内存索引"""
+        from .models import UserProfile
+
+        # 查询前读取版本号：查询期间其他进程的修改会使版本号变化，下次访问时再次重建
+        if version is None:
+            version = self.version()
+        rows = UserProfile.objects.order_by(f'-{self.field}', 'user_id').values_list('user_id', self.field)
+        keys = [(-value, user_id) for user_id, value in rows]
+        with self._lock:
+            self._keys = SortedList(keys)
+            self._key_by_user = {key[1]: key for key in keys}
+            self._built_at = time.monotonic()
+            self._version = version
+
+    def reset(self):
+        with self._lock:
+            self._keys = SortedList()
+            self._key_by_user = {}
+            self._built_at = None
+            self._version = None
+        self.bump_version()
+
+    @property
+    def version_key(self):
+        return f'leaderboard:{self.field}:version'
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, 1, None)
+            version = cache.get(self.version_key, 1)
+        return version
+
+    def bump_version(self):
+        """递增共享版本号，使所有进程缓存的分页与本地索引失效，返回新版本号"""
+        try:
+            return cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, 1, None)
+            return None
+
+    def _changed(self):
+        """本进程已增量更新索引：递增版本号，期间没有其他进程修改时本地索引仍是最新的"""
+        version = self.bump_version()
+        with self._lock:
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def update(self, user_id, value):
+        """资料变化时增量调整位置"""
+        key = (-value, user_id)
+        with self._lock:
+            old_key = self._key_by_user.get(user_id)
+            if old_key == key:
+                return
+            # 尚未构建时首次访问会从数据库读取最新数据，这里只需让分页缓存失效
+            if self._built_at is not None:
+                if old_key is not None:
+                    self._keys.remove(old_key)
+                self._keys.add(key)
+                self._key_by_user[user_id] = key
+        self._changed()
+
+    def remove(self, user_id):
+        with self._lock:
+            old_key = self._key_by_user.pop(user_id, None)
+            if old_key is not None:
+                self._keys.remove(old_key)
+        self._changed()
+
+    def rank(self, user_id):
+        """返回用户名次（同分并列），不在榜上返回None"""
+        with self._lock:
+            self._ensure_built()
+            key = self._key_by_user.get(user_id)
+            if key is None:
+                return None
+            return self._keys.bisect_left((key[0],)) + 1
+
+    def total(self):
+        with self._lock:
+            self._ensure_built()
+            return len(self._keys)
+
+    def page(self, page=1, page_size=PAGE_SIZE):
+        """返回某一页的 [(名次, user_id), ...]"""
+        with self._lock:
+            self._ensure_built()
+            start = (page - 1) * page_size
+            entries = []
+            for key in self._keys.islice(start, start + page_size):
+                entries.append((self._keys.bisect_left((key[0],)) + 1, key[1]))
+            return entries
+
+    def cached_page(self, page=1, page_size=PAGE_SIZE):
+        """返回带玩家资料的分页数据（带缓存）"""
+        from .models import UserProfile
+
+        with self._lock:
+            version = self._ensure_built()
+            cache_key = f'leaderboard:{self.field}:{version}:{page}:{page_size}'
+            results = cache.get(cache_key)
+            if results is None:
+                # 在锁内取当前页，保证写入缓存的分页与键中的版本号对应同一份索引
+                entries = self.page(page, page_size)
+
+        if results is None:
+            profiles = UserProfile.objects.select_related('user').in_bulk(
+                [user_id for _, user_id in entries], field_name='user_id'
+            )
+            results = [
+                profile_entry(rank, profiles[user_id])
+                for rank, user_id in entries
+                if user_id in profiles
+            ]
+            cache.set(cache_key, results, PAGE_CACHE_TIMEOUT)
+        return results
+
+
+def profile_entry(rank, profile):
+    return {
+        'rank': rank,
+        'user_id': profile.user_id,
+        'username': profile.user.username,
+        'level': profile.level,
+        'experience': profile.experience,
+        'games_played': profile.games_played,
+        'wins': profile.wins,
+        'win_rate': profile.win_rate,
+    }
+
+
+BOARDS = {
+    'experience': Leaderboard('experience'),
+    'win_rate': Leaderboard('win_rate'),
+}
+
+
+def get_board(name):
+    return BOARDS.get(name)
+
+
+def profile_changed(profile):
+    for field, board in BOARDS.items():
+        board.update(profile.user_id, getattr(profile, field))
+
+
+def profile_removed(user_id):
+    for board in BOARDS.values():
+        board.remove(user_id)
+
+
+def reset_boards():
+    for board in BOARDS.values():
+        board.reset()
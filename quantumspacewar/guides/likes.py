@@ -0,0 +1,52 @@
+"""批量点赞
+
+对多篇攻略的点赞/取消点赞在一个事务中完成：
+- 一条查询读出当前用户已点赞的攻略；
+- 一条 INSERT ... ON CONFLICT DO NOTHING 批量添加，一条 DELETE 批量取消；
+- 最后一条聚合查询返回各攻略的点赞数。
+"""
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Guide
+
+LIKE = 'like'
+UNLIKE = 'unlike'
+TOGGLE = 'toggle'
+MODES = (TOGGLE, LIKE, UNLIKE)
+
+_Like = Guide.liked_by.through
+
+
+def bulk_set_likes(user, guide_ids, mode=TOGGLE):
+    """批量设置点赞状态，返回 ({guide_id: (is_liked, likes_count)}, 不存在的ID列表)"""
+    guide_ids = set(guide_ids)
+    with transaction.atomic():
+        existing = set(Guide.objects.filter(id__in=guide_ids).values_list('id', flat=True))
+        liked = set(_Like.objects.filter(user=user, guide_id__in=existing).values_list('guide_id', flat=True))
+
+        if mode == LIKE:
+            to_add, to_remove = existing - liked, set()
+        elif mode == UNLIKE:
+            to_add, to_remove = set(), liked
+        else:
+            to_add, to_remove = existing - liked, liked
+
+        if to_add:
+            _Like.objects.bulk_create(
+                [_Like(guide_id=guide_id, user=user) for guide_id in to_add], ignore_conflicts=True
+            )
+        if to_remove:
+            _Like.objects.filter(user=user, guide_id__in=to_remove).delete()
+        if to_add or to_remove:
+            # 批量写入不触发 m2m_changed，这里直接刷新增量同步用的变更时间
+            Guide.objects.filter(id__in=to_add | to_remove).update(changed_at=timezone.now())
+
+    counts = dict(
+        Guide.objects.filter(id__in=existing)
+        .annotate(likes=Count('liked_by')).values_list('id', 'likes')
+    )
+    now_liked = (liked | to_add) - to_remove
+    results = {guide_id: (guide_id in now_liked, counts.get(guide_id, 0)) for guide_id in existing}
+    return results, sorted(guide_ids - existing)
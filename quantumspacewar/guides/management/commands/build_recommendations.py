@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from guides.recommendations import DEFAULT_TOP_K, rebuild_recommendations
+
+
+class Command(BaseCommand):
+    """重建相关攻略推荐索引（建议每天夜间执行）"""
+    help = '根据标签、分类和共同点赞重建相关攻略推荐'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='每篇攻略保留的相关攻略数')
+
+    def handle(self, *args, **options):
+        count = rebuild_recommendations(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f'推荐索引已重建，共 {count} 条'))
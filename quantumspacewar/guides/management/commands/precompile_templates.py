@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from guides.warmup import compile_templates
+
+
+class Command(BaseCommand):
+    """部署时编译并校验 guides/templates 下的全部模板"""
+    help = '预编译并校验攻略站模板（语法错误或引用的模板不存在时以非零状态退出）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('templates', nargs='*', help='只检查指定的模板（默认全部）')
+
+    def handle(self, *args, **options):
+        compiled, errors = compile_templates(options['templates'] or None)
+        for name in compiled:
+            self.stdout.write(f'  {name}')
+        for name, error in errors:
+            self.stderr.write(self.style.ERROR(f'  {name}: {error}'))
+        if errors:
+            raise CommandError(f'{len(errors)} 个模板校验失败')
+        self.stdout.write(self.style.SUCCESS(f'已编译 {len(compiled)} 个模板'))
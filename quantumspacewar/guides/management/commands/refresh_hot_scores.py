@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from guides.ranking import refresh_hot_scores
+
+
+class Command(BaseCommand):
+    """刷新攻略热度分（建议通过cron每5分钟执行一次）"""
+    help = '增量刷新攻略热度分'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批写回的行数')
+
+    def handle(self, *args, **options):
+        updated = refresh_hot_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'热度分已刷新，更新 {updated} 篇攻略'))
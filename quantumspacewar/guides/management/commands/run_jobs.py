@@ -0,0 +1,74 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from guides.jobqueue import run_pending, worker_id
+
+DEFAULT_POLL_INTERVAL = 2
+
+
+def work(poll_interval):
+    """工作进程主循环：收到 SIGTERM/SIGINT 后执行完当前任务再退出"""
+    import django
+    django.setup()
+
+    stopping = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *args: stopping.append(True))
+
+    worker = worker_id()
+    while not stopping:
+        close_old_connections()
+        if not run_pending(worker):
+            time.sleep(poll_interval)
+
+
+class Command(BaseCommand):
+    """启动后台任务工作进程（替代热度分、推荐索引的cron任务）"""
+    help = '执行后台任务队列中的任务和周期任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='工作进程数')
+        parser.add_argument('--once', action='store_true', help='执行完当前到期的任务后退出')
+        parser.add_argument('--sleep', type=float, default=None, help='队列为空时的轮询间隔（秒）')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            total = 0
+            while True:
+                count = run_pending()
+                if not count:
+                    break
+                total += count
+            self.stdout.write(self.style.SUCCESS(f'已执行 {total} 个任务'))
+            return
+
+        poll_interval = options['sleep'] or getattr(settings, 'JOB_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        if options['workers'] <= 1:
+            self.stdout.write(f'任务工作进程已启动（{worker_id()}）')
+            work(poll_interval)
+            return
+
+        # 子进程各自建立数据库连接，不能继承父进程的连接
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=work, args=(poll_interval,), daemon=False)
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'已启动 {len(processes)} 个任务工作进程')
+
+        def stop(*args):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, stop)
+        for process in processes:
+            process.join()
+        self.stdout.write('任务工作进程已退出')
@@ -0,0 +1,89 @@
+"""对局结果录入
+
+一场对局的全部玩家结果在一个事务中写入：
+- 先为缺少资料的玩家批量补建 UserProfile；
+- 再用一条带 CASE 的 UPDATE 语句通过 F 表达式累加场次、胜场、经验，
+  并在同一语句中重算胜率与等级（等级只升不降）；
+- match_id 唯一约束保证同一对局重复上报不会重复计分。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast, Greatest, Round
+
+from . import leaderboard
+from .models import GameMatch, UserProfile
+from .profiles import invalidate_profiles
+
+WIN_EXPERIENCE = 30
+LOSS_EXPERIENCE = 10
+EXPERIENCE_PER_LEVEL = 100
+
+
+def _per_player(values, output_field):
+    return Case(
+        *[When(user_id=user_id, then=Value(value)) for user_id, value in values.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def record_match(match_id, results, reported_by=None):
+    """录入一场对局，返回 (GameMatch, created)；重复的 match_id 直接返回已有记录
+
+    results: [{'user_id': int, 'won': bool, 'experience': int（可选）}, ...]
+    """
+    wins = {}
+    experience = {}
+    for result in results:
+        user_id = result['user_id']
+        wins[user_id] = 1 if result['won'] else 0
+        gained = result.get('experience')
+        if gained is None:
+            gained = WIN_EXPERIENCE if result['won'] else LOSS_EXPERIENCE
+        experience[user_id] = gained
+
+    try:
+        with transaction.atomic():
+            match = GameMatch.objects.create(
+                match_id=match_id,
+                reported_by=reported_by,
+                results=results,
+            )
+
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id) for user_id in wins],
+                ignore_conflicts=True,
+            )
+
+            win_delta = _per_player(wins, IntegerField())
+            experience_delta = _per_player(experience, IntegerField())
+            new_wins = F('wins') + win_delta
+            new_games = F('games_played') + 1
+            new_experience = F('experience') + experience_delta
+
+            UserProfile.objects.filter(user_id__in=wins).update(
+                games_played=new_games,
+                wins=new_wins,
+                experience=new_experience,
+                win_rate=Round(
+                    Cast(new_wins, FloatField()) * 100 / Cast(new_games, FloatField()),
+                    2,
+                ),
+                level=Greatest(F('level'), new_experience / EXPERIENCE_PER_LEVEL + 1),
+            )
+
+            transaction.on_commit(lambda: _after_commit(wins.keys()))
+    except IntegrityError:
+        existing = GameMatch.objects.filter(match_id=match_id).first()
+        if existing is None:
+            raise
+        return existing, False
+
+    return match, True
+
+
+def _after_commit(user_ids):
+    # UPDATE 不会触发 post_save 信号，这里清除资料缓存，并一次查询取回新值后增量更新排行榜
+    invalidate_profiles(user_ids)
+    for profile in UserProfile.objects.filter(user_id__in=list(user_ids)):
+        leaderboard.profile_changed(profile)
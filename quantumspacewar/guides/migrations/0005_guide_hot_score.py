@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:40
+
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# 本迁移编写时 guides/ranking.py 热度公式的冻结副本：迁移不能引用会随代码演进的模块
+
+VIEW_WEIGHT = 1
+LIKE_WEIGHT = 10
+DECAY_SECONDS = 45000
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def compute_hot_score(views, likes, created_at):
+    points = views * VIEW_WEIGHT + likes * LIKE_WEIGHT
+    order = math.log10(max(points, 1))
+    seconds = (created_at - EPOCH).total_seconds()
+    return round(order + seconds / DECAY_SECONDS, 7)
+
+
+def backfill_hot_score(apps, schema_editor):
+    Guide = apps.get_model('guides', 'Guide')
+    guides = list(Guide.objects.annotate(likes=Count('liked_by')))
+    for guide in guides:
+        guide.hot_score = compute_hot_score(guide.views, guide.likes, guide.created_at)
+    Guide.objects.bulk_update(guides, ['hot_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0004_userprofile_alter_chatmessage_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guide',
+            name='hot_score',
+            field=models.FloatField(db_index=True, default=0, verbose_name='热度'),
+        ),
+        migrations.RunPython(backfill_hot_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0005_guide_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuideRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='相似度')),
+                ('guide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='guides.guide', verbose_name='攻略')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='guides.guide', verbose_name='相关攻略')),
+            ],
+            options={
+                'verbose_name': '相关攻略推荐',
+                'verbose_name_plural': '相关攻略推荐',
+                'ordering': ['guide', '-score'],
+                'indexes': [models.Index(fields=['guide', '-score'], name='guides_guid_guide_i_5fe484_idx')],
+            },
+        ),
+    ]
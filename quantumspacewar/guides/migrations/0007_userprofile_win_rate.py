@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+def backfill_win_rate(apps, schema_editor):
+    UserProfile = apps.get_model('guides', 'UserProfile')
+    profiles = list(UserProfile.objects.filter(games_played__gt=0))
+    for profile in profiles:
+        profile.win_rate = round((profile.wins / profile.games_played) * 100, 2)
+    UserProfile.objects.bulk_update(profiles, ['win_rate'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0006_guiderecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='win_rate',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='胜率'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='experience',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='经验值'),
+        ),
+        migrations.RunPython(backfill_win_rate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0007_userprofile_win_rate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_id', models.CharField(max_length=64, unique=True, verbose_name='对局ID')),
+                ('results', models.JSONField(default=list, verbose_name='对局结果')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='录入时间')),
+                ('reported_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='上报者')),
+            ],
+            options={
+                'verbose_name': '对局记录',
+                'verbose_name_plural': '对局记录',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
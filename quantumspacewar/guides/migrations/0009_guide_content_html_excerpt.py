@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:51
+
+import re
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+# 本迁移编写时 guides/rendering.py 渲染逻辑的冻结副本：迁移不能引用会随代码演进的模块
+
+EXCERPT_LENGTH = 200
+
+_whitespace_re = re.compile(r'\s+')
+
+
+def backfill_rendered_content(apps, schema_editor):
+    Guide = apps.get_model('guides', 'Guide')
+    guides = list(Guide.objects.only('id', 'content'))
+    for guide in guides:
+        guide.content_html = linebreaks(guide.content, autoescape=True)
+        guide.excerpt = Truncator(_whitespace_re.sub(' ', guide.content).strip()).chars(EXCERPT_LENGTH)
+    Guide.objects.bulk_update(guides, ['content_html', 'excerpt'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0008_gamematch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guide',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='渲染后内容'),
+        ),
+        migrations.AddField(
+            model_name='guide',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='摘要'),
+        ),
+        migrations.RunPython(backfill_rendered_content, migrations.RunPython.noop),
+    ]
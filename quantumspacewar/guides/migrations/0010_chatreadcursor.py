@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0009_guide_content_html_excerpt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_name', models.CharField(max_length=50, verbose_name='聊天室')),
+                ('last_read_id', models.PositiveBigIntegerField(default=0, verbose_name='最后已读消息ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '聊天已读游标',
+                'verbose_name_plural': '聊天已读游标',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room_name', 'id'], name='guides_chat_room_na_aee37e_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatreadcursor',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_cursors', to=settings.AUTH_USER_MODEL, verbose_name='用户'),
+        ),
+        migrations.AddConstraint(
+            model_name='chatreadcursor',
+            constraint=models.UniqueConstraint(fields=('user', 'room_name'), name='unique_chat_cursor'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+# 后台用户列表按 -last_login 排序；auth_user 表不归本应用的模型管理，因此直接通过 schema_editor 建索引
+USER_LAST_LOGIN_INDEX = models.Index(fields=['-last_login'], name='auth_user_last_login_desc')
+
+
+def add_user_last_login_index(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    schema_editor.add_index(User, USER_LAST_LOGIN_INDEX)
+
+
+def remove_user_last_login_index(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    schema_editor.remove_index(User, USER_LAST_LOGIN_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0010_chatreadcursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room_name', '-timestamp'], name='guides_chat_room_na_49f1fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['-timestamp'], name='guides_chat_timesta_3287d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['-created_at'], name='guides_guid_created_5962c3_idx'),
+        ),
+        migrations.RunPython(add_user_last_login_index, remove_user_last_login_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0011_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssistantResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='提示词哈希')),
+                ('backend', models.CharField(max_length=50, verbose_name='后端')),
+                ('model', models.CharField(max_length=100, verbose_name='模型')),
+                ('prompt', models.TextField(verbose_name='提示词')),
+                ('response', models.TextField(verbose_name='回答')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='命中次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='生成时间')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='最近使用时间')),
+            ],
+            options={
+                'verbose_name': '助手回答缓存',
+                'verbose_name_plural': '助手回答缓存',
+                'ordering': ['-last_used_at'],
+            },
+        ),
+    ]
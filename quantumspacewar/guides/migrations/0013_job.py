@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0012_assistantresponse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='任务')),
+                ('next_run_at', models.DateTimeField(verbose_name='下次执行时间')),
+            ],
+            options={
+                'verbose_name': '周期任务',
+                'verbose_name_plural': '周期任务',
+            },
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='任务')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='参数')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '执行中'), ('done', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='计划执行时间')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='已执行次数')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='最多执行次数')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='工作进程')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='领取时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_at'], name='guides_job_status_99a453_idx')],
+            },
+        ),
+    ]
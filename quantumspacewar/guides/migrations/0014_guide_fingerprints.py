@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:36
+
+import hashlib
+import re
+import unicodedata
+import zlib
+from array import array
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# 以下为本迁移编写时 guides/fingerprints.py 的指纹算法的冻结副本：
+# 迁移不能引用会随代码演进的模块，否则日后修改算法会改变（或破坏）历史迁移的结果
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MIN_SHINGLES = 10
+
+_PRIME = (1 << 61) - 1
+_MIX = (0x5BD1E9955BD1E995, 0x27D4EB2F165667C5)
+_ROTATION = 0x9E3779B97F4A7C15 % _PRIME
+
+_noise_re = re.compile(r'[\W_]+')
+
+
+def fingerprint(content):
+    """返回 (归一化内容哈希, 签名字节, 桶号列表)"""
+    normalized = _noise_re.sub('', unicodedata.normalize('NFKC', content).casefold())
+    content_hash = hashlib.sha256(normalized.encode()).hexdigest()
+    if len(normalized) <= SHINGLE_SIZE:
+        values = {zlib.crc32(normalized.encode())} if normalized else set()
+    else:
+        values = {
+            zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode())
+            for i in range(len(normalized) - SHINGLE_SIZE + 1)
+        }
+    if len(values) < MIN_SHINGLES:
+        return content_hash, b'', []
+
+    mult, offset = _MIX
+    bins = [None] * NUM_PERM
+    for value in values:
+        mixed = (value * mult + offset) % _PRIME
+        index, rest = mixed % NUM_PERM, mixed // NUM_PERM
+        if bins[index] is None or rest < bins[index]:
+            bins[index] = rest
+    signature = []
+    for index in range(NUM_PERM):
+        distance = 0
+        while bins[(index + distance) % NUM_PERM] is None:
+            distance += 1
+        signature.append((bins[(index + distance) % NUM_PERM] + distance * _ROTATION) % _PRIME)
+
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(array('Q', [band, *rows]).tobytes(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return content_hash, array('Q', signature).tobytes(), buckets
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Guide = apps.get_model('guides', 'Guide')
+    GuideFingerprint = apps.get_model('guides', 'GuideFingerprint')
+    GuideBucket = apps.get_model('guides', 'GuideBucket')
+    fingerprints, buckets = [], []
+    for guide_id, content in Guide.objects.values_list('id', 'content').iterator():
+        content_hash, signature, guide_buckets = fingerprint(content)
+        fingerprints.append(GuideFingerprint(guide_id=guide_id, content_hash=content_hash, signature=signature))
+        buckets += [GuideBucket(guide_id=guide_id, bucket=bucket) for bucket in guide_buckets]
+    GuideFingerprint.objects.bulk_create(fingerprints, batch_size=500)
+    GuideBucket.objects.bulk_create(buckets, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0013_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuideFingerprint',
+            fields=[
+                ('guide', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='guides.guide', verbose_name='攻略')),
+                ('content_hash', models.CharField(db_index=True, max_length=64, verbose_name='归一化内容哈希')),
+                ('signature', models.BinaryField(blank=True, verbose_name='MinHash签名')),
+            ],
+            options={
+                'verbose_name': '攻略指纹',
+                'verbose_name_plural': '攻略指纹',
+            },
+        ),
+        migrations.CreateModel(
+            name='GuideBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(db_index=True, verbose_name='桶号')),
+                ('guide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='guides.guide', verbose_name='攻略')),
+            ],
+            options={
+                'verbose_name': '攻略LSH桶',
+                'verbose_name_plural': '攻略LSH桶',
+            },
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:55
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_updated_at(apps, schema_editor):
+    Guide = apps.get_model('guides', 'Guide')
+    Guide.objects.update(changed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0014_guide_fingerprints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guide',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='变更时间'),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['changed_at', 'id'], name='guides_guid_changed_7876ae_idx'),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils import timezone
 
+from .ranking import compute_hot_score
+from .rendering import make_excerpt, render_content_html
+
 class Guide(models.Model):
     """攻略模型"""
     CATEGORY_CHOICES = [
@@ -16,27 +20,103 @@ class Guide(models.Model):
     
     title = models.CharField(max_length=200, verbose_name='标题')
     content = models.TextField(verbose_name='内容')
+    content_html = models.TextField(blank=True, editable=False, verbose_name='渲染后内容')
+    excerpt = models.CharField(max_length=300, blank=True, editable=False, verbose_name='摘要')
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='作者')
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other', verbose_name='分类')
     tags = models.CharField(max_length=500, blank=True, verbose_name='标签')
     views = models.PositiveIntegerField(default=0, verbose_name='浏览量')
     liked_by = models.ManyToManyField(User, related_name='liked_guides', blank=True, verbose_name='点赞用户')
     cover_image = models.URLField(max_length=500, blank=True, verbose_name='封面图片')
+    hot_score = models.FloatField(default=0, db_index=True, verbose_name='热度')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    # 任何对外可见的变化（内容、点赞、浏览量）都会刷新，供增量同步接口使用
+    changed_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='变更时间')
     
     class Meta:
         verbose_name = '攻略'
         verbose_name_plural = '攻略'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['changed_at', 'id']),
+        ]
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        # 新攻略立即获得基于发布时间的热度分，之后由定时任务增量刷新
+        if self._state.adding and not self.hot_score:
+            self.hot_score = compute_hot_score(self.views, 0, timezone.now())
+        # 保存时预渲染正文和摘要，列表与详情页不再逐次过滤整篇内容
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_html', 'excerpt'}
+        self.changed_at = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'changed_at'}
+        super().save(*args, **kwargs)
+    
+    def render_content(self):
+        self.content_html = render_content_html(self.content)
+        self.excerpt = make_excerpt(self.content)
+    
+    def get_absolute_url(self):
+        return reverse('guides:guide_detail', kwargs={'pk': self.pk})
+    
+    def get_tags_list(self):
+        return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
+    
     @property
     def likes_count(self):
         return self.liked_by.count()
 
+class GuideRecommendation(models.Model):
+    """相关攻略推荐（由 build_recommendations 离线生成）"""
+    guide = models.ForeignKey(Guide, on_delete=models.CASCADE, related_name='recommendations', verbose_name='攻略')
+    related = models.ForeignKey(Guide, on_delete=models.CASCADE, related_name='recommended_for', verbose_name='相关攻略')
+    score = models.FloatField(verbose_name='相似度')
+    
+    class Meta:
+        verbose_name = '相关攻略推荐'
+        verbose_name_plural = '相关攻略推荐'
+        ordering = ['guide', '-score']
+        indexes = [
+            models.Index(fields=['guide', '-score']),
+        ]
+    
+    def __str__(self):
+        return f'{self.guide_id} -> {self.related_id} ({self.score})'
+
+class GuideFingerprint(models.Model):
+    """攻略正文指纹（用于重复检测，见 fingerprints.py）"""
+    guide = models.OneToOneField(Guide, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint', verbose_name='攻略')
+    content_hash = models.CharField(max_length=64, db_index=True, verbose_name='归一化内容哈希')
+    signature = models.BinaryField(blank=True, verbose_name='MinHash签名')
+    
+    class Meta:
+        verbose_name = '攻略指纹'
+        verbose_name_plural = '攻略指纹'
+    
+    def __str__(self):
+        return f'{self.guide_id}: {self.content_hash[:12]}'
+
+class GuideBucket(models.Model):
+    """MinHash LSH 桶：签名相同段落的攻略落在同一桶号下"""
+    guide = models.ForeignKey(Guide, on_delete=models.CASCADE, related_name='lsh_buckets', verbose_name='攻略')
+    bucket = models.BigIntegerField(db_index=True, verbose_name='桶号')
+    
+    class Meta:
+        verbose_name = '攻略LSH桶'
+        verbose_name_plural = '攻略LSH桶'
+    
+    def __str__(self):
+        return f'{self.bucket} -> {self.guide_id}'
+
 class ChatMessage(models.Model):
     """聊天消息模型"""
     ROOM_CHOICES = [
@@ -55,19 +135,42 @@ class ChatMessage(models.Model):
         verbose_name = '聊天消息'
         verbose_name_plural = '聊天消息'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['room_name', 'id']),
+            models.Index(fields=['room_name', '-timestamp']),
+            models.Index(fields=['-timestamp']),
+        ]
     
     def __str__(self):
         return f'{self.sender.username}: {self.content[:50]}'
 
+class ChatReadCursor(models.Model):
+    """聊天室已读游标：每个用户每个房间一行，记录已读到的最后一条消息ID"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_cursors', verbose_name='用户')
+    room_name = models.CharField(max_length=50, verbose_name='聊天室')
+    last_read_id = models.PositiveBigIntegerField(default=0, verbose_name='最后已读消息ID')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '聊天已读游标'
+        verbose_name_plural = '聊天已读游标'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'room_name'], name='unique_chat_cursor'),
+        ]
+    
+    def __str__(self):
+        return f'{self.user_id}@{self.room_name}: {self.last_read_id}'
+
 class UserProfile(models.Model):
     """用户扩展资料模型"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='用户')
     avatar = models.URLField(max_length=500, blank=True, verbose_name='头像')
     bio = models.TextField(max_length=500, blank=True, verbose_name='个人简介')
     level = models.PositiveIntegerField(default=1, verbose_name='等级')
-    experience = models.PositiveIntegerField(default=0, verbose_name='经验值')
+    experience = models.PositiveIntegerField(default=0, db_index=True, verbose_name='经验值')
     games_played = models.PositiveIntegerField(default=0, verbose_name='游戏场次')
     wins = models.PositiveIntegerField(default=0, verbose_name='胜利场次')
+    win_rate = models.FloatField(default=0, db_index=True, editable=False, verbose_name='胜率')
     
     class Meta:
         verbose_name = '用户资料'
@@ -76,8 +179,98 @@ class UserProfile(models.Model):
     def __str__(self):
         return f'{self.user.username} 的资料'
     
-    @property
-    def win_rate(self):
-        if self.games_played > 0:
-            return round((self.wins / self.games_played) * 100, 2)
-        return 0.00
\ No newline at end of file
+    def save(self, *args, **kwargs):
+        # 胜率存储为带索引的列，供排行榜直接排序
+        self.win_rate = self.compute_win_rate(self.wins, self.games_played)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'wins', 'games_played'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'win_rate'}
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def compute_win_rate(wins, games_played):
+        if games_played > 0:
+            return round((wins / games_played) * 100, 2)
+        return 0.00
+
+class GameMatch(models.Model):
+    """已录入的对局（match_id唯一，用于保证重复上报幂等）"""
+    match_id = models.CharField(max_length=64, unique=True, verbose_name='对局ID')
+    reported_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='上报者')
+    results = models.JSONField(default=list, verbose_name='对局结果')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='录入时间')
+    
+    class Meta:
+        verbose_name = '对局记录'
+        verbose_name_plural = '对局记录'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.match_id
+
+class AssistantResponse(models.Model):
+    """攻略助手的回答缓存（按 后端+模型+提示词 的哈希查找，按最近使用时间淘汰）"""
+    key = models.CharField(max_length=64, unique=True, verbose_name='提示词哈希')
+    backend = models.CharField(max_length=50, verbose_name='后端')
+    model = models.CharField(max_length=100, verbose_name='模型')
+    prompt = models.TextField(verbose_name='提示词')
+    response = models.TextField(verbose_name='回答')
+    hits = models.PositiveIntegerField(default=0, verbose_name='命中次数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='生成时间')
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='最近使用时间')
+    
+    class Meta:
+        verbose_name = '助手回答缓存'
+        verbose_name_plural = '助手回答缓存'
+        ordering = ['-last_used_at']
+    
+    def __str__(self):
+        return f'{self.model}: {self.prompt[:50]}'
+
+class Job(models.Model):
+    """后台任务队列（由 manage.py run_jobs 的工作进程领取执行）"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, '等待中'),
+        (RUNNING, '执行中'),
+        (DONE, '已完成'),
+        (FAILED, '失败'),
+    ]
+    
+    name = models.CharField(max_length=100, verbose_name='任务')
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name='参数')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name='状态')
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='计划执行时间')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='已执行次数')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='最多执行次数')
+    last_error = models.TextField(blank=True, verbose_name='最近错误')
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name='工作进程')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='领取时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    
+    class Meta:
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+    
+    def __str__(self):
+        return f'{self.name}#{self.pk} ({self.status})'
+
+class JobSchedule(models.Model):
+    """周期任务的下次执行时间"""
+    name = models.CharField(max_length=100, unique=True, verbose_name='任务')
+    next_run_at = models.DateTimeField(verbose_name='下次执行时间')
+    
+    class Meta:
+        verbose_name = '周期任务'
+        verbose_name_plural = '周期任务'
+    
+    def __str__(self):
+        return f'{self.name} @ {self.next_run_at}'
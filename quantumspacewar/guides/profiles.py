@@ -0,0 +1,46 @@
+"""用户资料的惰性创建与缓存
+
+- get_profile 优先使用 select_related 预取到的资料，其次读缓存，最后查库；
+- 资料不存在时用一条 INSERT ... ON CONFLICT DO NOTHING 惰性创建，并发请求也不会冲突；
+- 资料保存/删除时由信号清除缓存（见 signals.py）。
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .models import UserProfile
+
+PROFILE_CACHE_TIMEOUT = 600
+
+_profile_relation = User.userprofile.related
+
+
+def profile_cache_key(user_id):
+    return f'profile:{user_id}'
+
+
+def get_profile(user):
+    """返回用户资料，不存在时惰性创建"""
+    profile = _profile_relation.get_cached_value(user, default=None)
+    if profile is not None:
+        return profile
+
+    key = profile_cache_key(user.pk)
+    profile = cache.get(key)
+    if profile is None:
+        profile = UserProfile.objects.filter(user_id=user.pk).first()
+        if profile is None:
+            UserProfile.objects.bulk_create([UserProfile(user_id=user.pk)], ignore_conflicts=True)
+            profile = UserProfile.objects.get(user_id=user.pk)
+        cache.set(key, profile, PROFILE_CACHE_TIMEOUT)
+
+    _profile_relation.set_cached_value(user, profile)
+    profile.user = user
+    return profile
+
+
+def invalidate_profile(user_id):
+    cache.delete(profile_cache_key(user_id))
+
+
+def invalidate_profiles(user_ids):
+    cache.delete_many([profile_cache_key(user_id) for user_id in user_ids])
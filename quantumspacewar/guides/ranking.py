@@ -0,0 +1,45 @@
+"""攻略热度排行
+
+热度分采用与时间无关排序的对数公式：
+
+    hot = log10(max(浏览量 * VIEW_WEIGHT + 点赞数 * LIKE_WEIGHT, 1)) + (发布时间 - EPOCH) / DECAY_SECONDS
+
+新发布的攻略天然获得时间加成，旧攻略只有在互动量增长一个数量级时才能追平。
+由于时间项在发布后固定不变，分数只在浏览/点赞变化时才需要重算，
+因此定时任务只需写回发生变化的行，查询时直接按带索引的 hot_score 排序。
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Count
+
+VIEW_WEIGHT = 1
+LIKE_WEIGHT = 10
+DECAY_SECONDS = 45000  # 12.5小时：热度相差10倍的攻略，发布时间相差12.5小时即可抵消
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def compute_hot_score(views, likes, created_at):
+    """根据浏览量、点赞数和发布时间计算热度分"""
+    points = views * VIEW_WEIGHT + likes * LIKE_WEIGHT
+    order = math.log10(max(points, 1))
+    seconds = (created_at - EPOCH).total_seconds()
+    return round(order + seconds / DECAY_SECONDS, 7)
+
+
+def refresh_hot_scores(batch_size=500):
+    """重算所有攻略的热度分，只写回发生变化的行，返回更新条数"""
+    from .models import Guide
+
+    rows = Guide.objects.annotate(likes=Count('liked_by')).values_list(
+        'id', 'views', 'created_at', 'hot_score', 'likes'
+    )
+
+    changed = []
+    for pk, views, created_at, old_score, likes in rows.iterator(chunk_size=batch_size):
+        score = compute_hot_score(views, likes, created_at)
+        if score != old_score:
+            changed.append(Guide(pk=pk, hot_score=score))
+
+    Guide.objects.bulk_update(changed, ['hot_score'], batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,108 @@
+"""基于缓存的限流
+
+采用滑动窗口计数：每个窗口一个计数键（cache.add + cache.incr 原子自增），
+估算值 = 上一窗口计数 × 未过去的比例 + 当前窗口计数，全程不查询数据库；
+只有放行的请求计入窗口，被拒绝的请求会退回计数。
+
+各接口的限额在 settings.RATE_LIMITS 中按作用域配置，例如 {'chat_send': '20/m'}；未配置的作用域不限流。
+"""
+import time
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    retry_after: int
+
+
+def parse_rate(rate):
+    """'20/m' -> (20, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0].lower()]
+
+
+def get_rate(scope):
+    return getattr(settings, 'RATE_LIMITS', {}).get(scope)
+
+
+def client_ip(request):
+    """客户端IP：默认只信任 REMOTE_ADDR；部署在 settings.NUM_PROXIES 层反向代理之后时，
+    取 X-Forwarded-For 中从右数第 NUM_PROXIES 个地址（更靠左的部分可由客户端伪造）"""
+    num_proxies = getattr(settings, 'NUM_PROXIES', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',') if address.strip()]
+        if addresses:
+            return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def request_ident(request, key='user'):
+    """限流主体：'user' 登录用户按ID、游客按IP；'ip' 始终按IP"""
+    if key == 'user' and request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    return f'ip{client_ip(request)}'
+
+
+def hit(scope, ident, rate=None):
+    """记录一次请求并返回是否放行"""
+    rate = rate or get_rate(scope)
+    if not rate:
+        return RateLimitResult(True, 0, 0)
+    limit, period = parse_rate(rate)
+
+    now = time.time()
+    window = int(now // period)
+    current_key = f'rl:{scope}:{ident}:{window}'
+    previous_key = f'rl:{scope}:{ident}:{window - 1}'
+
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:  # 键恰好过期
+        cache.set(current_key, 1, period * 2)
+        current = 1
+    previous = cache.get(previous_key, 0)
+
+    elapsed = (now % period) / period
+    estimated = previous * (1 - elapsed) + current
+    retry_after = int(period * (1 - elapsed)) + 1
+    allowed = estimated <= limit
+    if not allowed:
+        # 被拒绝的请求不计数：先自增占位保证并发下不超额，超限时再退回，
+        # 否则被拦下后持续重试的用户会让下一窗口的估算值一直超限
+        try:
+            cache.decr(current_key)
+        except ValueError:
+            pass
+    return RateLimitResult(allowed, limit, retry_after)
+
+
+def ratelimit(scope, key='user', methods=('POST',), block=True):
+    """
+    视图限流装饰器
+    block=True 时超限直接返回429；否则设置 request.limited 由视图自行处理
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            request.limited = False
+            if request.method in methods:
+                result = hit(scope, request_ident(request, key))
+                if not result.allowed:
+                    if block:
+                        response = HttpResponse('请求太频繁，请稍后再试', status=429)
+                        response['Retry-After'] = str(result.retry_after)
+                        return response
+                    request.limited = True
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+"""相关攻略推荐索引
+
+离线批处理：把每篇攻略表示为稀疏特征向量（标签、分类、点赞用户），
+通过倒排表累加点积（等价于稀疏矩阵 A·Aᵀ，只计算有共同特征的攻略对），
+文档频率超过 MAX_POSTING_LENGTH 的特征（如大分类、热门标签）不遍历倒排表，只为已由其他特征
+找到的候选补上该特征的得分，避免同一分类下的攻略两两比较；再按余弦相似度为每篇攻略保留 top-K 邻居写入 GuideRecommendation 表。
+详情页只需一次按 guide_id 的索引查询即可取出相关攻略。
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+
+TAG_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+LIKE_WEIGHT = 0.8
+DEFAULT_TOP_K = 10
+MAX_POSTING_LENGTH = 1000
+
+
+def build_feature_vectors():
+    """返回 {guide_id: {feature: weight}} 稀疏向量"""
+    from .models import Guide
+
+    vectors = {}
+    for guide in Guide.objects.only('id', 'category', 'tags').iterator():
+        vector = {f'category:{guide.category}': CATEGORY_WEIGHT}
+        for tag in guide.get_tags_list():
+            vector[f'tag:{tag.lower()}'] = TAG_WEIGHT
+        vectors[guide.id] = vector
+
+    likes = Guide.liked_by.through.objects.values_list('guide_id', 'user_id')
+    for guide_id, user_id in likes.iterator():
+        if guide_id in vectors:
+            vectors[guide_id][f'user:{user_id}'] = LIKE_WEIGHT
+
+    return vectors
+
+
+def compute_neighbours(vectors, top_k=DEFAULT_TOP_K, max_posting_length=MAX_POSTING_LENGTH):
+    """计算每篇攻略余弦相似度最高的 top_k 个邻居，返回 {guide_id: [(related_id, score), ...]}"""
+    postings = defaultdict(list)
+    norms = {}
+    for guide_id, vector in vectors.items():
+        norms[guide_id] = math.sqrt(sum(w * w for w in vector.values()))
+        for feature, weight in vector.items():
+            postings[feature].append((guide_id, weight))
+    frequent = {feature for feature, posting in postings.items() if len(posting) > max_posting_length}
+
+    neighbours = {}
+    for guide_id, vector in vectors.items():
+        scores = defaultdict(float)
+        for feature, weight in vector.items():
+            if feature in frequent:
+                continue
+            for other_id, other_weight in postings[feature]:
+                if other_id != guide_id:
+                    scores[other_id] += weight * other_weight
+
+        # 高频特征只对已有候选累加，不扩大候选集
+        shared = [(feature, weight) for feature, weight in vector.items() if feature in frequent]
+        if shared:
+            for other_id in scores:
+                other = vectors[other_id]
+                scores[other_id] += sum(weight * other.get(feature, 0.0) for feature, weight in shared)
+
+        norm = norms[guide_id]
+        ranked = heapq.nlargest(
+            top_k,
+            ((score / (norm * norms[other_id]), other_id) for other_id, score in scores.items()),
+        )
+        neighbours[guide_id] = [(other_id, round(score, 6)) for score, other_id in ranked]
+
+    return neighbours
+
+
+def rebuild_recommendations(top_k=DEFAULT_TOP_K, batch_size=1000):
+    """重建推荐索引，返回写入的推荐条数"""
+    from .models import GuideRecommendation
+
+    neighbours = compute_neighbours(build_feature_vectors(), top_k=top_k)
+    rows = [
+        GuideRecommendation(guide_id=guide_id, related_id=related_id, score=score)
+        for guide_id, related in neighbours.items()
+        for related_id, score in related
+    ]
+
+    with transaction.atomic():
+        GuideRecommendation.objects.all().delete()
+        GuideRecommendation.objects.bulk_create(rows, batch_size=batch_size)
+
+    return len(rows)
@@ -0,0 +1,22 @@
+"""攻略正文预渲染
+
+正文在保存时渲染一次：HTML转义后按段落/换行转换（与模板中的 linebreaks 过滤器一致），
+同时生成纯文本摘要，供首页与列表接口使用。
+"""
+import re
+
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 200
+
+_whitespace_re = re.compile(r'\s+')
+
+
+def render_content_html(content):
+    """返回转义后的安全HTML"""
+    return linebreaks(content, autoescape=True)
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    return Truncator(_whitespace_re.sub(' ', content).strip()).chars(length)
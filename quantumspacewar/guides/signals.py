@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+from django.dispatch import receiver
+
+from . import autocomplete, leaderboard
+from .fingerprints import save_fingerprint
+from .models import Guide, UserProfile
+from .profiles import invalidate_profile
+
+
+@receiver(post_save, sender=UserProfile)
+def update_leaderboard(sender, instance, update_fields=None, **kwargs):
+    """资料保存后清除资料缓存，并在排名字段变化时增量更新排行榜"""
+    invalidate_profile(instance.user_id)
+    if update_fields is None or set(update_fields) & set(leaderboard.BOARDS):
+        leaderboard.profile_changed(instance)
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+    leaderboard.profile_removed(instance.user_id)
+
+
+@receiver(post_save, sender=Guide)
+def prefetch_summary(sender, instance, created, **kwargs):
+    """新攻略提交后在后台任务中预生成AI摘要，不占用发布请求的时间"""
+    if created and getattr(settings, 'ASSISTANT_PREFETCH_SUMMARIES', False):
+        from .tasks import summarize_guide
+        transaction.on_commit(lambda: summarize_guide.delay(guide_id=instance.pk))
+
+
+@receiver(post_save, sender=Guide)
+def update_autocomplete(sender, instance, update_fields=None, **kwargs):
+    """标题、标签或热度变化时增量更新输入联想索引"""
+    if update_fields is None or {'title', 'tags', 'hot_score', 'author'} & set(update_fields):
+        # 事务提交后再更新，回滚的修改不会进入索引，其他进程也不会按未提交的数据重建
+        transaction.on_commit(lambda: autocomplete.guide_saved(instance))
+
+
+@receiver(post_delete, sender=Guide)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    guide_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.guide_deleted(guide_id))
+
+
+@receiver(post_save, sender=Guide)
+def update_fingerprint(sender, instance, created, update_fields=None, **kwargs):
+    """正文变化时更新重复检测用的指纹"""
+    if created or update_fields is None or 'content' in update_fields:
+        save_fingerprint(instance)
+
+
+@receiver(m2m_changed, sender=Guide.liked_by.through)
+def touch_liked_guide(sender, instance, action, reverse, pk_set, **kwargs):
+    """点赞变化刷新攻略的 changed_at，使增量同步能拿到新的点赞数"""
+    if reverse and action == 'pre_clear':
+        # user.liked_guides.clear() 的 post_clear 不带 pk_set，清除前先记下受影响的攻略
+        instance._cleared_guide_ids = list(Guide.objects.filter(liked_by=instance).values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        guide_ids = [instance.pk]
+    elif action == 'post_clear':
+        guide_ids = instance.__dict__.pop('_cleared_guide_ids', ())
+    else:
+        guide_ids = pk_set or ()
+    if guide_ids:
+        Guide.objects.filter(pk__in=guide_ids).update(changed_at=timezone.now())
@@ -0,0 +1,151 @@
+"""静态文件构建与服务
+
+构建（collectstatic）：
+- CompressedManifestStaticFilesStorage 生成带内容哈希的文件名与 staticfiles.json 清单，
+  并为可压缩的文件预先生成 .gz（以及安装了 brotli 时的 .br）版本，只保留比原文件小的压缩结果。
+
+服务（StaticFilesMiddleware，DEBUG 关闭时启用）：
+- 带哈希的文件内容永不变化，返回一年的 immutable 缓存头；未带哈希的文件只缓存较短时间；
+- 按 Accept-Encoding 直接返回预压缩版本，不在请求时压缩；
+- 使用 FileResponse，WSGI 服务器提供 wsgi.file_wrapper 时（如 gunicorn）以 sendfile 零拷贝发送；
+- 位于 CompressionMiddleware 之前，静态文件响应不会被再次压缩。
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+from .middleware import accepted_encodings, brotli
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+DEFAULT_MAX_AGE = 60
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def etag_matches(header, etag):
+    """If-None-Match 弱比较：支持多个ETag、W/ 前缀与 *"""
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return True
+    return etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in etags}
+
+
+def compress_file(path):
+    """为文件生成预压缩版本，返回生成的文件路径列表"""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """带哈希文件名 + 预压缩的静态文件存储"""
+    # 模板引用了尚不存在的文件时退回原文件名，而不是让整个页面报错
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run=dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for hashed_name in hashed_names:
+                compress_file(self.path(hashed_name))
+
+
+class StaticFilesMiddleware:
+    """从 STATIC_ROOT 直接提供静态文件（开发服务器在 DEBUG 下自行处理，此时不启用）"""
+
+    def __init__(self, get_response):
+        if settings.DEBUG or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.root = os.path.realpath(settings.STATIC_ROOT)
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def resolve(self, name):
+        """静态文件名 -> 磁盘路径，越出 STATIC_ROOT 或不存在时返回None"""
+        name = posixpath.normpath(name).lstrip('/')
+        if name.startswith('..') or not name or name == '.':
+            return None
+        path = os.path.realpath(os.path.join(self.root, *name.split('/')))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def negotiate(self, request, path):
+        """按 Accept-Encoding 选择预压缩版本，返回 (编码, 文件路径)，无可用版本时编码为None"""
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            for candidate, suffix in ENCODING_SUFFIXES:
+                if candidate in accepted and os.path.isfile(path + suffix):
+                    return candidate, path + suffix
+        return None, path
+
+    def serve(self, request, name):
+        path = self.resolve(name)
+        if path is None:
+            return None
+
+        stat = os.stat(path)
+        encoding, path = self.negotiate(request, path)
+        # 不同编码的响应体不同，ETag 带上编码，避免缓存用 gzip 的校验值验证未压缩的副本
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        immutable = posixpath.normpath(name) in self.immutable
+        if etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(name)
+            response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+            del response['Content-Disposition']
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.headers['Last-Modified'] = http_date(stat.st_mtime)
+
+        response.headers['ETag'] = etag
+        if immutable:
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={DEFAULT_MAX_AGE}'
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -0,0 +1,33 @@
+"""后台任务（由 manage.py run_jobs 执行）"""
+from datetime import timedelta
+
+from . import jobqueue
+from .jobqueue import job
+
+
+@job('guides.refresh_hot_scores', every=timedelta(minutes=5))
+def refresh_hot_scores():
+    from .ranking import refresh_hot_scores as refresh
+    refresh()
+
+
+@job('guides.rebuild_recommendations', every=timedelta(hours=24))
+def rebuild_recommendations():
+    from .recommendations import rebuild_recommendations as rebuild
+    rebuild()
+
+
+@job('guides.purge_jobs', every=timedelta(hours=1))
+def purge_jobs():
+    jobqueue.purge_finished()
+
+
+@job('guides.summarize_guide')
+def summarize_guide(guide_id):
+    """预先生成攻略的AI摘要，读者打开摘要时直接命中缓存"""
+    from .assistant import get_service, summary_prompt
+    from .models import Guide
+
+    guide = Guide.objects.filter(pk=guide_id).only('id', 'title', 'content').first()
+    if guide is not None:
+        get_service().submit(summary_prompt(guide))[1].result()
@@ -0,0 +1,11 @@
+from django import template
+
+from guides.images import thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(url, size='card'):
+    """把外链图片URL转换为代理缩略图地址：{{ guide.cover_image|thumbnail:'card' }}"""
+    return thumbnail_url(url, size)
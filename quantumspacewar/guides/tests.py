@@ -1,6 +1,32 @@
-from django.test import TestCase
+import gzip
+import importlib
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
 from django.contrib.auth.models import User
-from .models import Guide
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.templatetags.static import static
+from django.utils import timezone
+from . import admin_utils, assistant, autocomplete, chatfilter, fingerprints, images, jobqueue, leaderboard, warmup
+from .assistant import AssistantService, StubBackend, hits_key, pending_key
+from .chatread import get_cursors, mark_read, unread_counts
+from .models import AssistantResponse, Guide, ChatMessage, ChatReadCursor, GuideBucket, Job, JobSchedule, UserProfile
+from .matches import record_match
+from .profiles import get_profile
+from .ratelimit import client_ip, hit
+from .ranking import compute_hot_score, refresh_hot_scores
+from .recommendations import compute_neighbours, rebuild_recommendations
+from .viewdedup import BloomFilter
 
 class GuideModelTest(TestCase):
     def test_guide_creation(self):
@@ -16,4 +42,964 @@ class GuideModelTest(TestCase):
 class ViewTest(TestCase):
     def test_home_page(self):
         response = self.client.get('/')
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class HotScoreTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='hotuser', password='123456')
+
+    def test_migration_backfill_matches_current_formula(self):
+        migration = importlib.import_module('guides.migrations.0005_guide_hot_score')
+        created = timezone.now()
+        for views, likes in ((0, 0), (120, 3), (10 ** 6, 10 ** 4)):
+            self.assertEqual(
+                migration.compute_hot_score(views, likes, created), compute_hot_score(views, likes, created)
+            )
+
+    def test_interaction_raises_score(self):
+        created = timezone.now()
+        self.assertGreater(
+            compute_hot_score(100, 5, created),
+            compute_hot_score(10, 0, created)
+        )
+
+    def test_newer_guide_outranks_equally_popular_older_guide(self):
+        now = timezone.now()
+        self.assertGreater(
+            compute_hot_score(50, 2, now),
+            compute_hot_score(50, 2, now - timedelta(days=1))
+        )
+
+    def test_refresh_writes_only_changed_rows(self):
+        quiet = Guide.objects.create(title='冷门攻略', content='测试内容', author=self.user)
+        popular = Guide.objects.create(title='热门攻略', content='测试内容', author=self.user)
+        refresh_hot_scores()
+        Guide.objects.filter(pk=popular.pk).update(views=1000)
+
+        self.assertEqual(refresh_hot_scores(), 1)
+        self.assertEqual(refresh_hot_scores(), 0)
+        self.assertEqual(Guide.objects.order_by('-hot_score').first(), popular)
+        self.assertNotEqual(quiet.hot_score, 0)
+
+
+class RecommendationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='recuser', password='123456')
+        self.fan = User.objects.create_user(username='fan', password='123456')
+
+    def test_neighbours_ranked_by_shared_features(self):
+        neighbours = compute_neighbours({
+            1: {'tag:刺客': 1.0, 'category:strategy': 0.5},
+            2: {'tag:刺客': 1.0, 'category:strategy': 0.5},
+            3: {'category:strategy': 0.5},
+            4: {'tag:医生': 1.0},
+        }, top_k=2)
+        self.assertEqual([pk for pk, _ in neighbours[1]], [2, 3])
+        self.assertEqual(neighbours[4], [])
+
+    def test_frequent_features_do_not_create_candidates(self):
+        vectors = {
+            1: {'tag:刺客': 1.0, 'category:strategy': 0.5},
+            2: {'tag:刺客': 1.0, 'category:strategy': 0.5},
+            3: {'category:strategy': 0.5},
+        }
+        neighbours = compute_neighbours(vectors, max_posting_length=2)
+        self.assertEqual([pk for pk, _ in neighbours[1]], [2])
+        self.assertEqual(neighbours[1][0][1], 1.0)
+        self.assertEqual(neighbours[3], [])
+
+    def test_detail_page_uses_recommendation_index(self):
+        other = User.objects.create_user(username='other', password='123456')
+        guide = Guide.objects.create(title='刺客入门', content='测试内容', author=self.user, tags='刺客,潜行')
+        similar = Guide.objects.create(title='刺客进阶', content='测试内容', author=other, tags='刺客')
+        guide.liked_by.add(self.fan)
+        similar.liked_by.add(self.fan)
+
+        self.assertGreater(rebuild_recommendations(), 0)
+        response = self.client.get(guide.get_absolute_url())
+        self.assertEqual(list(response.context['related_guides']), [similar])
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        leaderboard.reset_boards()
+        self.profiles = []
+        for name, experience, wins in [('alpha', 300, 3), ('beta', 100, 1), ('gamma', 200, 4)]:
+            user = User.objects.create_user(username=name, password='123456')
+            self.profiles.append(UserProfile.objects.create(
+                user=user, experience=experience, games_played=5, wins=wins
+            ))
+
+    def tearDown(self):
+        leaderboard.reset_boards()
+
+    def test_win_rate_is_stored(self):
+        self.assertEqual(UserProfile.objects.get(pk=self.profiles[2].pk).win_rate, 80.0)
+
+    def test_rank_and_incremental_update(self):
+        board = leaderboard.get_board('experience')
+        alpha, beta, gamma = self.profiles
+        self.assertEqual([uid for _, uid in board.page()], [alpha.user_id, gamma.user_id, beta.user_id])
+        self.assertEqual(board.rank(beta.user_id), 3)
+
+        beta.experience = 500
+        beta.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(board.rank(beta.user_id), 1)
+            self.assertEqual(board.rank(alpha.user_id), 2)
+
+    def test_changes_from_other_workers_trigger_rebuild(self):
+        board = leaderboard.get_board('experience')
+        alpha, beta, gamma = self.profiles
+        self.assertEqual(board.rank(beta.user_id), 3)
+        stale_page = board.cached_page()
+
+        # 模拟其他 worker：直接改库并递增共享版本号，本进程的索引没有收到信号
+        UserProfile.objects.filter(pk=beta.pk).update(experience=500)
+        board.bump_version()
+        self.assertEqual(board.rank(beta.user_id), 1)
+        page = board.cached_page()
+        self.assertNotEqual(page, stale_page)
+        self.assertEqual(page[0]['username'], 'beta')
+
+    def test_ties_share_rank(self):
+        board = leaderboard.get_board('experience')
+        beta = self.profiles[1]
+        beta.experience = 300
+        beta.save()
+        board.rebuild()
+        self.assertEqual(board.rank(beta.user_id), 1)
+        self.assertEqual(board.rank(self.profiles[0].user_id), 1)
+        self.assertEqual(board.rank(self.profiles[2].user_id), 3)
+
+
+class MatchResultTest(TestCase):
+    def setUp(self):
+        leaderboard.reset_boards()
+        self.winner = User.objects.create_user(username='winner', password='123456')
+        self.loser = User.objects.create_user(username='loser', password='123456')
+        UserProfile.objects.create(user=self.winner, experience=90)
+
+    def tearDown(self):
+        leaderboard.reset_boards()
+
+    def test_record_match_updates_all_players(self):
+        results = [
+            {'user_id': self.winner.id, 'won': True},
+            {'user_id': self.loser.id, 'won': False, 'experience': 5},
+        ]
+        match, created = record_match('m-1', results)
+        self.assertTrue(created)
+
+        winner = UserProfile.objects.get(user=self.winner)
+        self.assertEqual((winner.games_played, winner.wins, winner.experience), (1, 1, 120))
+        self.assertEqual(winner.level, 2)
+        self.assertEqual(winner.win_rate, 100.0)
+
+        loser = UserProfile.objects.get(user=self.loser)
+        self.assertEqual((loser.games_played, loser.wins, loser.experience), (1, 0, 5))
+        self.assertEqual(loser.level, 1)
+
+    def test_duplicate_match_is_ignored(self):
+        results = [{'user_id': self.winner.id, 'won': True}]
+        record_match('m-2', results)
+        match, created = record_match('m-2', results)
+        self.assertFalse(created)
+        self.assertEqual(UserProfile.objects.get(user=self.winner).games_played, 1)
+
+
+class ProfileCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='123456')
+
+    def test_profile_created_lazily_and_cached(self):
+        profile = get_profile(self.user)
+        self.assertEqual(profile.level, 1)
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_profile(user).pk, profile.pk)
+
+    def test_profile_update_invalidates_cache(self):
+        profile = get_profile(self.user)
+        profile.bio = '老玩家'
+        profile.save(update_fields=['bio'])
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(get_profile(user).bio, '老玩家')
+
+    def test_select_related_profiles_need_no_extra_queries(self):
+        for i in range(5):
+            sender = User.objects.create_user(username=f'sender{i}', password='123456')
+            UserProfile.objects.create(user=sender)
+            ChatMessage.objects.create(sender=sender, content='你好')
+        cache.clear()
+
+        messages = list(ChatMessage.objects.select_related('sender__userprofile'))
+        with self.assertNumQueries(0):
+            for message in messages:
+                get_profile(message.sender)
+
+
+class ViewDedupTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='123456')
+        self.guide = Guide.objects.create(title='去重测试', content='测试内容', author=self.user)
+
+    def test_repeat_views_counted_once_without_session_flags(self):
+        self.client.force_login(self.user)
+        self.client.get(self.guide.get_absolute_url())
+        self.client.get(self.guide.get_absolute_url())
+
+        self.guide.refresh_from_db()
+        self.assertEqual(self.guide.views, 1)
+        self.assertFalse(any(key.startswith('viewed_guide_') for key in self.client.session.keys()))
+
+    def test_bloom_filter_membership(self):
+        bloom = BloomFilter()
+        for pk in range(100):
+            bloom.add(pk)
+        self.assertTrue(all(pk in bloom for pk in range(100)))
+        self.assertLess(sum(pk in bloom for pk in range(1000, 2000)), 10)
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='chatter', password='123456')
+
+    def test_hit_blocks_after_limit(self):
+        results = [hit('test', 'u1', '3/m').allowed for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertTrue(hit('test', 'u2', '3/m').allowed)
+
+    def test_denied_requests_are_not_counted(self):
+        with mock.patch('guides.ratelimit.time.time', return_value=600.0):
+            self.assertTrue(hit('test', 'u1', '1/m').allowed)
+            self.assertFalse(hit('test', 'u1', '1/m').allowed)
+        # 被拒绝后每分钟重试一次：被拒绝的重试不计数，不会把限制一直延续到后面的窗口
+        with mock.patch('guides.ratelimit.time.time', return_value=690.0):
+            self.assertFalse(hit('test', 'u1', '1/m').allowed)
+        with mock.patch('guides.ratelimit.time.time', return_value=720.0):
+            self.assertTrue(hit('test', 'u1', '1/m').allowed)
+
+    def test_unconfigured_scope_is_not_limited(self):
+        with self.settings(RATE_LIMITS={}):
+            self.assertTrue(all(hit('add_guide', 'u1').allowed for _ in range(5)))
+
+    def test_send_message_is_throttled(self):
+        self.client.force_login(self.user)
+        with self.settings(RATE_LIMITS={'chat_send': '2/m'}):
+            codes = [
+                self.client.post('/chat/general/send/', {'content': '你好'}).status_code
+                for _ in range(3)
+            ]
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertEqual(ChatMessage.objects.count(), 2)
+
+    def test_forwarded_for_is_only_trusted_behind_proxies(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '10.0.0.1')
+        with self.settings(NUM_PROXIES=1):
+            self.assertEqual(client_ip(request), '2.2.2.2')
+        with self.settings(NUM_PROXIES=5):
+            self.assertEqual(client_ip(request), '1.1.1.1')
+
+    def test_login_limit_ignores_spoofed_forwarded_for(self):
+        with self.settings(RATE_LIMITS={'login': '2/m'}):
+            codes = [
+                self.client.post('/login/', {'username': 'x', 'password': 'y'},
+                                 HTTP_X_FORWARDED_FOR=f'9.9.9.{i}').status_code
+                for i in range(3)
+            ]
+        self.assertEqual(codes[-1], 429)
+
+
+class ContentRenderingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='123456')
+
+    def test_content_rendered_and_escaped_on_save(self):
+        guide = Guide.objects.create(
+            title='渲染测试', content='第一段<script>\n\n第二段', author=self.user
+        )
+        self.assertIn('&lt;script&gt;', guide.content_html)
+        self.assertIn('<p>第二段</p>', guide.content_html)
+        self.assertEqual(guide.excerpt, '第一段<script> 第二段')
+
+    def test_content_update_rerenders(self):
+        guide = Guide.objects.create(title='渲染测试', content='旧内容', author=self.user)
+        guide.content = '新内容'
+        guide.save(update_fields=['content'])
+        guide.refresh_from_db()
+        self.assertEqual(guide.content_html, '<p>新内容</p>')
+        self.assertEqual(guide.excerpt, '新内容')
+
+
+class ChatReadCursorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='123456')
+        self.other = User.objects.create_user(username='talker', password='123456')
+        self.messages = [
+            ChatMessage.objects.create(sender=self.other, content=f'消息{i}', room_name='general')
+            for i in range(3)
+        ]
+        ChatMessage.objects.create(sender=self.other, content='攻略', room_name='strategy')
+        ChatMessage.objects.create(sender=self.reader, content='自己的消息', room_name='strategy')
+
+    def test_unread_counts_follow_cursor(self):
+        self.assertEqual(unread_counts(self.reader.id, ['general', 'strategy']), {'general': 3, 'strategy': 1})
+        mark_read(self.reader.id, 'general', self.messages[1].id)
+        self.assertEqual(unread_counts(self.reader.id, ['general', 'strategy']), {'general': 1, 'strategy': 1})
+
+    def test_cursor_writes_are_coalesced(self):
+        with self.assertNumQueries(3):  # 读游标 + UPDATE + INSERT
+            mark_read(self.reader.id, 'general', self.messages[0].id)
+        with self.assertNumQueries(0):
+            mark_read(self.reader.id, 'general', self.messages[2].id)
+            self.assertFalse(mark_read(self.reader.id, 'general', self.messages[1].id))
+        self.assertEqual(ChatReadCursor.objects.get().last_read_id, self.messages[0].id)
+        self.assertEqual(get_cursors(self.reader.id, ['general']), {'general': self.messages[2].id})
+
+    def test_polling_advances_cursor(self):
+        self.client.force_login(self.reader)
+        response = self.client.get('/chat/general/get_messages/', {'last_id': self.messages[0].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(unread_counts(self.reader.id, ['general']), {'general': 0})
+
+
+class AdminChangeListTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='boss', password='123456')
+        self.authors = [User.objects.create_user(username=f'author{i}') for i in range(3)]
+        for author in self.authors:
+            Guide.objects.create(title=f'{author.username}的攻略', content='内容', author=author)
+            ChatMessage.objects.create(sender=author, content='你好', room_name='team')
+        self.client.force_login(self.admin)
+
+    def test_author_filter_uses_autocomplete(self):
+        response = self.client.get('/admin/guides/guide/')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'author__id__exact=%d' % self.authors[1].pk)
+
+        response = self.client.get('/admin/guides/guide/', {'author__id__exact': self.authors[1].pk})
+        self.assertEqual(list(response.context['cl'].result_list), [Guide.objects.get(author=self.authors[1])])
+
+    def test_chat_message_admin_filters(self):
+        response = self.client.get('/admin/guides/chatmessage/', {
+            'room_name__exact': 'team', 'sender__id__exact': self.authors[0].pk
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_paginator_caps_count(self):
+        with mock.patch.object(admin_utils, 'COUNT_LIMIT', 2):
+            paginator = admin_utils.EstimatedCountPaginator(Guide.objects.all(), 1)
+            self.assertEqual(paginator.count, 2)
+
+
+class HealthCheckTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_healthz(self):
+        response = self.client.get('/healthz')
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz_warms_up_once(self):
+        with mock.patch.dict(warmup._state, done=False):
+            response = self.client.get('/readyz')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['status'], 'ready')
+            self.assertGreater(warmup._state['templates'], 0)
+            self.assertIsNotNone(cache.get('site_stats'))
+            with mock.patch.object(warmup, 'compile_templates') as compile_templates:
+                self.client.get('/readyz')
+            compile_templates.assert_not_called()
+
+    def test_precompile_templates_command(self):
+        out = StringIO()
+        call_command('precompile_templates', stdout=out)
+        self.assertIn('home.html', out.getvalue())
+        with mock.patch.object(warmup, 'referenced_templates', return_value=['missing.html']):
+            with self.assertRaises(CommandError):
+                call_command('precompile_templates', stdout=StringIO())
+
+    def test_readyz_reports_unavailable_database(self):
+        with mock.patch('guides.views.check_database', side_effect=RuntimeError('password=secret')):
+            with self.assertLogs('guides.views', 'ERROR'):
+                response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['database'], 'unavailable')
+        self.assertNotIn('secret', response.content.decode())
+
+
+class StaticPipelineTest(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'guides.staticfiles.CompressedManifestStaticFilesStorage'},
+        }
+        override = override_settings(STATIC_ROOT=self.static_root.name, STORAGES=storages)
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_hashed_asset_served_precompressed_and_immutable(self):
+        url = static('css/style.css')
+        self.assertRegex(url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(b'body', gzip.decompress(b''.join(response.streaming_content)))
+
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        # 未压缩的副本ETag不同，不能用gzip版本的ETag验证
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        response.close()
+
+    def test_unhashed_and_missing_assets(self):
+        response = self.client.get('/static/css/style.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response.close()
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+        self.assertEqual(static('images/missing.png'), '/static/images/missing.png')
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        return super().generate(prompt)
+
+
+class AssistantServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = CountingBackend()
+        self.service = AssistantService(self.backend, max_workers=0, max_entries=2)
+
+    def test_repeated_prompt_is_served_from_cache(self):
+        key, future = self.service.submit('如何当好侦探？')
+        self.assertFalse(future.cached)
+        self.assertIn('如何当好侦探', future.result())
+        key2, future = self.service.submit('如何当好侦探？')
+        self.assertEqual(key, key2)
+        self.assertTrue(future.cached)
+        self.assertEqual(self.backend.calls, 1)
+        self.assertEqual(self.service.status(key)[0], 'done')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for i, prompt in enumerate(['a', 'b', 'c']):
+            self.service.submit(prompt)
+            AssistantResponse.objects.filter(prompt=prompt).update(
+                last_used_at=timezone.now() - timedelta(days=10 - i)
+            )
+        self.assertEqual(sorted(AssistantResponse.objects.values_list('prompt', flat=True)), ['b', 'c'])
+
+    def test_identical_concurrent_prompts_are_coalesced(self):
+        release = threading.Event()
+
+        class SlowBackend(CountingBackend):
+            def generate(self, prompt):
+                release.wait(5)
+                return super().generate(prompt)
+
+        backend = SlowBackend()
+        service = AssistantService(backend, executor=ThreadPoolExecutor(2))
+        with mock.patch.object(service, 'cached', return_value=None), mock.patch.object(service, '_store'):
+            key, first = service.submit('同一个问题')
+            _, second = service.submit('同一个问题')
+            self.assertIs(first, second)
+            self.assertEqual(service.status(key), ('pending', None))
+            release.set()
+            self.assertEqual(first.result(5), second.result(5))
+        self.assertEqual(backend.calls, 1)
+
+    def test_backend_errors_are_logged_not_exposed(self):
+        class BrokenBackend(CountingBackend):
+            def generate(self, prompt):
+                raise RuntimeError('api_key=secret')
+
+        service = AssistantService(BrokenBackend(), max_workers=0)
+        with self.assertLogs('guides.assistant', 'ERROR'):
+            key, future = service.submit('出错的问题')
+        self.assertEqual(service.status(key), ('failed', assistant.ERROR_CODE))
+        self.assertNotIn('secret', str(cache.get(assistant.error_key(key))))
+
+    def test_polling_status_does_not_count_hits(self):
+        key, _ = self.service.submit('轮询')
+        for _ in range(3):
+            self.assertEqual(self.service.status(key)[0], 'done')
+        self.assertIsNone(cache.get(hits_key(key)))
+
+    def test_pending_status_is_visible_to_other_workers(self):
+        release = threading.Event()
+
+        class SlowBackend(CountingBackend):
+            def generate(self, prompt):
+                release.wait(5)
+                return super().generate(prompt)
+
+        service = AssistantService(SlowBackend(), executor=ThreadPoolExecutor(1))
+        other_worker = AssistantService(CountingBackend(), max_workers=0)
+        with mock.patch.object(service, '_store'):
+            key, future = service.submit('慢问题')
+            self.assertEqual(other_worker.status(key), ('pending', None))
+            release.set()
+            future.result(5)
+
+        key, _ = self.service.submit('快问题')
+        self.assertIsNone(cache.get(pending_key(key)))
+
+    def test_every_cache_hit_is_counted(self):
+        key, _ = self.service.submit('命中')
+        for _ in range(3):
+            self.service.submit('命中')
+        AssistantResponse.objects.filter(key=key).update(last_used_at=timezone.now() - timedelta(days=1))
+        self.service.submit('命中')
+        self.assertEqual(AssistantResponse.objects.get(key=key).hits, 4)
+        self.service.submit('命中')
+        self.assertEqual(cache.get(hits_key(key)), 1)
+
+
+calls = []
+
+
+@jobqueue.job('tests.record')
+def record_job(value):
+    calls.append(value)
+
+
+@jobqueue.job('tests.flaky', max_attempts=2)
+def flaky_job():
+    raise RuntimeError('boom')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        periodic = mock.patch.dict(jobqueue.PERIODIC, clear=True)
+        periodic.start()
+        self.addCleanup(periodic.stop)
+
+    def test_enqueued_job_runs_once(self):
+        job = record_job.delay(value=1)
+        self.assertEqual(jobqueue.run_pending('w1'), 1)
+        self.assertEqual(jobqueue.run_pending('w2'), 0)
+        self.assertEqual(calls, [1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+
+    def test_claimed_job_is_not_claimed_again(self):
+        record_job.delay(value=1)
+        self.assertEqual(len(jobqueue.claim('w1')), 1)
+        self.assertEqual(jobqueue.claim('w2'), [])
+
+    def test_failed_job_is_retried_with_backoff_then_marked_failed(self):
+        job = flaky_job.delay()
+        jobqueue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobqueue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_stale_running_job_is_released(self):
+        job = record_job.delay(value=2)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, locked_by='dead', locked_at=timezone.now() - timedelta(hours=1)
+        )
+        jobqueue.run_pending()
+        self.assertEqual(calls, [2])
+
+    def test_result_is_not_written_after_lock_is_lost(self):
+        record_job.delay(value=4)
+        j, = jobqueue.claim('w1')
+        Job.objects.filter(pk=j.pk).update(locked_by='w2')
+        self.assertIsNone(jobqueue.execute(j))
+        j.refresh_from_db()
+        self.assertEqual((j.status, j.locked_by), (Job.RUNNING, 'w2'))
+
+    def test_heartbeat_keeps_running_job_locked(self):
+        record_job.delay(value=5)
+        j, = jobqueue.claim('w1')
+        Job.objects.filter(pk=j.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertTrue(jobqueue.Heartbeat(j.pk, 'w1').beat())
+        self.assertEqual(jobqueue.release_stale(), 0)
+        self.assertFalse(jobqueue.Heartbeat(j.pk, 'w2').beat())
+
+    def test_periodic_jobs_are_enqueued_once_per_interval(self):
+        jobqueue.PERIODIC['tests.record'] = timedelta(minutes=5)
+        self.assertEqual(jobqueue.schedule_periodic(), ['tests.record'])
+        self.assertEqual(jobqueue.schedule_periodic(), [])
+        self.assertEqual(Job.objects.filter(name='tests.record').count(), 1)
+        self.assertGreater(JobSchedule.objects.get(name='tests.record').next_run_at, timezone.now())
+
+    @override_settings(ASSISTANT_PREFETCH_SUMMARIES=True)
+    def test_new_guide_enqueues_summary(self):
+        user = User.objects.create_user('writer', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            guide = Guide.objects.create(title='t', content='c', author=user)
+        job = Job.objects.get(name='guides.summarize_guide')
+        self.assertEqual(job.kwargs, {'guide_id': guide.pk})
+
+    def test_finished_jobs_are_purged_after_retention(self):
+        old = timezone.now() - timedelta(days=2)
+        done = record_job.delay(value=1)
+        failed = record_job.delay(value=2)
+        recent = record_job.delay(value=3)
+        Job.objects.filter(pk=done.pk).update(status=Job.DONE, finished_at=old)
+        Job.objects.filter(pk=failed.pk).update(status=Job.FAILED, finished_at=old)
+        Job.objects.filter(pk=recent.pk).update(status=Job.DONE, finished_at=timezone.now())
+        self.assertEqual(jobqueue.purge_finished(), 1)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {failed.pk, recent.pk})
+
+
+class ChatFilterTest(TestCase):
+    def setUp(self):
+        self.filter = chatfilter.ChatFilter(chatfilter.parse_words(['# 注释', 'bad', 'badword', '坏蛋', '!加微信']))
+
+    def test_matches_are_masked_case_and_width_insensitively(self):
+        result = self.filter.check('BAD 你这个坏蛋，ｂａｄword')
+        self.assertFalse(result.rejected)
+        self.assertEqual(result.text, '*** 你这个**，*******')
+
+    def test_reject_words_reject_the_message(self):
+        result = self.filter.check('代练请加微信')
+        self.assertTrue(result.rejected)
+        self.assertEqual(result.matches, ['加微信'])
+
+    def test_clean_text_is_unchanged(self):
+        self.assertEqual(self.filter.check('刺客怎么玩？'), ('刺客怎么玩？', False, []))
+
+    def test_word_file_is_reloaded_when_changed(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write('坏蛋\n')
+        self.addCleanup(os.remove, f.name)
+        self.addCleanup(chatfilter.reset_filter)
+        with self.settings(CHAT_FILTER_WORDS_FILE=f.name, CHAT_FILTER_RELOAD_INTERVAL=0):
+            chatfilter.reset_filter()
+            self.assertEqual(chatfilter.check_message('坏蛋').text, '**')
+            with open(f.name, 'w', encoding='utf-8') as out:
+                out.write('!坏蛋\n')
+            os.utime(f.name, (time.time() + 10, time.time() + 10))
+            self.assertTrue(chatfilter.check_message('坏蛋').rejected)
+
+    def test_send_message_view_filters_content(self):
+        User.objects.create_user('chatter', password='pw')
+        self.client.login(username='chatter', password='pw')
+        response = self.client.post('/chat/general/send/', {'content': '请加微信'})
+        self.assertEqual(response.status_code, 400)
+        self.client.post('/chat/general/send/', {'content': '你是傻逼'})
+        self.assertEqual(ChatMessage.objects.get().content, '你是**')
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset_index()
+        self.addCleanup(autocomplete.reset_index)
+        self.user = User.objects.create_user('Assassin', password='pw')
+        self.cold = Guide.objects.create(title='刺客入门', content='c', author=self.user, tags='刺客,新手', hot_score=1)
+        self.hot = Guide.objects.create(title='刺客进阶', content='c', author=self.user, tags='刺客', hot_score=5)
+
+    def test_suggestions_are_ranked_by_popularity(self):
+        suggestions = autocomplete.suggest('刺客')
+        self.assertEqual(suggestions[0], {'type': 'tag', 'text': '刺客'})
+        self.assertEqual(suggestions[1:], [
+            {'type': 'title', 'text': '刺客进阶', 'id': self.hot.pk},
+            {'type': 'title', 'text': '刺客入门', 'id': self.cold.pk},
+        ])
+        self.assertEqual(autocomplete.suggest('ASS'), [{'type': 'author', 'text': 'Assassin'}])
+        self.assertEqual(autocomplete.suggest('不存在'), [])
+
+    def test_index_is_updated_incrementally(self):
+        autocomplete.suggest('刺客')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cold.title = '侦探入门'
+            self.cold.save(update_fields=['title'])
+            self.assertEqual(len(autocomplete.suggest('侦探')), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual([s['text'] for s in autocomplete.suggest('刺客')], ['刺客', '刺客进阶'])
+            self.assertEqual(autocomplete.suggest('侦探'), [{'type': 'title', 'text': '侦探入门', 'id': self.cold.pk}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hot.delete()
+        self.assertEqual(autocomplete.suggest('刺客'), [{'type': 'tag', 'text': '刺客'}])
+
+    def test_other_process_changes_rebuild_in_background(self):
+        autocomplete.suggest('刺客')
+        rebuilt = autocomplete.PrefixIndex()
+        rebuilt.add_guide(self.hot.pk, '工程师', '', self.user.pk, 'Assassin', 5)
+        release = threading.Event()
+
+        def slow_build():
+            release.wait(5)
+            return rebuilt
+
+        cache.incr(autocomplete.GENERATION_KEY)
+        autocomplete._state['checked'] = 0.0
+        with mock.patch.object(autocomplete, 'build_index', slow_build):
+            # 重建完成前继续使用旧索引
+            self.assertEqual(autocomplete.suggest('工程'), [])
+            self.assertEqual(len(autocomplete.suggest('刺客')), 3)
+            release.set()
+            autocomplete.wait_for_rebuild(5)
+        self.assertEqual(autocomplete.suggest('工程')[0]['id'], self.hot.pk)
+
+    def test_queries_are_safe_during_concurrent_updates(self):
+        index = autocomplete.get_index()
+        errors = []
+
+        def writer():
+            try:
+                for i in range(3000):
+                    autocomplete._changed(lambda index, i=i: index.add_guide(
+                        10000 + i, f'刺客{i}', f'刺客{i % 7}', self.user.pk, 'Assassin', i
+                    ))
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch.object(autocomplete, 'build_index', return_value=index):
+            thread = threading.Thread(target=writer)
+            thread.start()
+            try:
+                while thread.is_alive():
+                    autocomplete.suggest('刺客')
+            except Exception as e:
+                errors.append(e)
+            thread.join()
+            autocomplete.wait_for_rebuild()
+        self.assertEqual(errors, [])
+        self.assertEqual(autocomplete.suggest('刺客2999')[0]['text'], '刺客2999')
+
+    def test_suggestion_view(self):
+        response = self.client.get('/search/suggest/', {'q': '刺客进', 'limit': 5})
+        self.assertEqual(response.json()['suggestions'], [{'type': 'title', 'text': '刺客进阶', 'id': self.hot.pk}])
+
+
+ORIGINAL_CONTENT = (
+    '刺客开局先去反应堆附近蹲守，等工程师落单再动手。动手后立刻从管道撤离，'
+    '不要在尸体旁停留。会议上不要第一个发言，跟着多数人投票，必要时主动带节奏怀疑侦探。'
+)
+
+
+class DuplicateDetectionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('writer', password='pw')
+        self.guide = Guide.objects.create(title='刺客开局思路', content=ORIGINAL_CONTENT, author=self.user)
+
+    def test_fingerprint_is_stored_on_save(self):
+        self.assertEqual(GuideBucket.objects.filter(guide=self.guide).count(), fingerprints.BANDS)
+
+    def test_migration_backfill_matches_current_algorithm(self):
+        migration = importlib.import_module('guides.migrations.0014_guide_fingerprints')
+        for content in (ORIGINAL_CONTENT, '太短', ''):
+            current = fingerprints.Fingerprint(content)
+            self.assertEqual(
+                migration.fingerprint(content), (current.hash, current.signature_bytes(), current.buckets)
+            )
+
+    def test_exact_copy_ignoring_whitespace_and_punctuation(self):
+        copied = ORIGINAL_CONTENT.replace('，', ' , ').replace('。', '!\n')
+        self.assertEqual(fingerprints.find_duplicate(copied), (self.guide.pk, 1.0))
+
+    def test_near_duplicate_is_found(self):
+        edited = ORIGINAL_CONTENT.replace('主动', '')
+        guide_id, score = fingerprints.find_duplicate(edited)
+        self.assertEqual(guide_id, self.guide.pk)
+        self.assertLess(score, 1.0)
+
+    def test_different_content_and_own_guide_are_not_duplicates(self):
+        other = '侦探每局都要记录每个人的行动路线，会议时对照时间线找出说谎的人，再带大家投票。' * 2
+        self.assertIsNone(fingerprints.find_duplicate(other))
+        self.assertIsNone(fingerprints.find_duplicate(ORIGINAL_CONTENT, exclude=self.guide.pk))
+
+    def test_add_guide_rejects_duplicate(self):
+        self.client.login(username='writer', password='pw')
+        response = self.client.post('/add_guide/', {
+            'title': '我的刺客心得', 'content': ORIGINAL_CONTENT, 'category': 'strategy', 'tags': ''
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '刺客开局思路')
+        self.assertEqual(Guide.objects.count(), 1)
+
+
+class FailingFetcher:
+    def __init__(self):
+        self.calls = 0
+
+    def fetch(self, url):
+        self.calls += 1
+        raise images.FetchError('timeout')
+
+
+class ImageProxyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(IMAGE_CACHE_DIR=tmp.name, IMAGE_PROXY_FETCHER='guides.images.StubFetcher')
+        override.enable()
+        self.addCleanup(override.disable)
+        images.reset()
+        self.addCleanup(images.reset)
+        self.cache_dir = tmp.name
+
+    def test_thumbnail_is_fetched_once_and_cached(self):
+        url = images.thumbnail_url('https://img.example.com/cover.png', 'card')
+        self.assertEqual(url, images.thumbnail_url('https://img.example.com/cover.png', 'card'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=2592000', response['Cache-Control'])
+        self.assertTrue(response['Content-Type'].startswith('image/'))
+        b''.join(response.streaming_content)
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(images.get_fetcher().calls, ['https://img.example.com/cover.png'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", W/{response["ETag"]}').status_code, 304)
+
+    def test_unsigned_urls_and_unknown_sizes_are_rejected(self):
+        token = images.thumbnail_url('https://img.example.com/a.png', 'card').split('/')[-2]
+        self.assertEqual(self.client.get(f'/img/card/{token}x/').status_code, 404)
+        self.assertEqual(self.client.get(f'/img/huge/{token}/').status_code, 404)
+
+    def test_fetch_failures_are_remembered(self):
+        fetcher = FailingFetcher()
+        images._state['fetcher'] = fetcher
+        url = images.thumbnail_url('https://slow.example.com/a.png', 'avatar')
+        self.assertEqual(self.client.get(url).status_code, 502)
+        self.assertEqual(self.client.get(url).status_code, 502)
+        self.assertEqual(fetcher.calls, 1)
+
+    def test_least_recently_used_files_are_evicted(self):
+        thumbnails = images.ThumbnailCache(self.cache_dir, max_bytes=250)
+        keys = [thumbnails.key(f'https://img.example.com/{i}.png', 'card') for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            path = thumbnails.put(key, b'x' * 100, 'image/png')
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        thumbnails.get(keys[0])
+        thumbnails.put(keys[2], b'x' * 100, 'image/png')
+        self.assertIsNotNone(thumbnails.get(keys[0]))
+        self.assertIsNone(thumbnails.get(keys[1]))
+        self.assertIsNotNone(thumbnails.get(keys[2]))
+
+    def test_images_are_resized_to_fixed_size(self):
+        path = images.get_thumbnail('https://img.example.com/cover.png', 'card')
+        with images.Image.open(path) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', images.SIZES['card']))
+
+        buffer = BytesIO()
+        images.Image.new('RGBA', (50, 50), (0, 0, 0, 0)).save(buffer, 'PNG')
+        data, content_type = images.resize(buffer.getvalue(), 'image/png', 'avatar')
+        self.assertEqual(content_type, 'image/png')
+        with images.Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.size, images.SIZES['avatar'])
+
+    def test_home_page_uses_proxied_cover(self):
+        user = User.objects.create_user('painter', password='pw')
+        Guide.objects.create(title='封面测试', content='c', author=user, cover_image='https://img.example.com/c.png')
+        response = self.client.get('/')
+        self.assertContains(response, '/img/card/')
+        self.assertNotContains(response, 'https://img.example.com/c.png')
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hosts.append(self.headers['Host'])
+        try:
+            if self.path == '/redirect':
+                self.send_response(302)
+                self.send_header('Location', 'http://internal.example/secret.png')
+                self.end_headers()
+            elif self.path == '/slow.png':
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', '100')
+                self.end_headers()
+                for _ in range(100):
+                    self.wfile.write(b'x')
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            else:
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', '3')
+                self.end_headers()
+                self.wfile.write(b'png')
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageFetcherTest(SimpleTestCase):
+    HOSTS = {'img.example.com': '127.0.0.1', 'internal.example': '10.0.0.1'}
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+        self.server.daemon_threads = True
+        self.server.hosts = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f'http://img.example.com:{self.server.server_port}'
+
+        self.lookups = []
+        real_getaddrinfo, real_is_public = socket.getaddrinfo, images.is_public_address
+
+        def getaddrinfo(host, port, *args, **kwargs):
+            if host in self.HOSTS:
+                self.lookups.append((host, port))
+                return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (self.HOSTS[host], port))]
+            return real_getaddrinfo(host, port, *args, **kwargs)
+
+        for patcher in (
+            mock.patch('socket.getaddrinfo', getaddrinfo),
+            # 测试服务器在本机，把 127.0.0.1 视为公网地址
+            mock.patch.object(images, 'is_public_address', lambda a: a == '127.0.0.1' or real_is_public(a)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_connects_to_the_vetted_address_with_original_host(self):
+        self.assertEqual(images.HttpFetcher().fetch(self.base + '/a.png'), (b'png', 'image/png'))
+        self.assertEqual(self.server.hosts, [f'img.example.com:{self.server.server_port}'])
+        # 只解析一次：连接使用校验时得到的IP，不会再次解析出其他地址
+        self.assertEqual(self.lookups, [('img.example.com', self.server.server_port)])
+
+    def test_redirects_to_private_addresses_are_rejected(self):
+        with self.assertRaisesMessage(images.FetchError, '内网'):
+            images.HttpFetcher().fetch(self.base + '/redirect')
+
+    def test_https_uses_port_443(self):
+        self.assertEqual(images.resolve_public_host('https://img.example.com/a.png')[1:], (443, '127.0.0.1'))
+
+    @override_settings(IMAGE_PROXY_TIMEOUT=0.5)
+    def test_slow_responses_hit_the_total_deadline(self):
+        start = time.monotonic()
+        with self.assertRaises(images.FetchError):
+            images.HttpFetcher().fetch(self.base + '/slow.png')
+        self.assertLess(time.monotonic() - start, 2)
@@ -5,6 +5,8 @@ app_name = 'guides'
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
+    path('img/<str:size>/<str:token>/', views.image_proxy, name='image_proxy'),
     path('register/', views.register, name='register'),
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
@@ -18,6 +20,9 @@ urlpatterns = [
     path('chat/<str:room_name>/', views.chat_room, name='chat_room_with_name'),
     path('chat/<str:room_name>/send/', views.send_message, name='send_message'),
     path('chat/<str:room_name>/get_messages/', views.get_messages, name='get_messages'),
+    # 健康检查
+    path('healthz', views.healthz, name='healthz'),
+    path('readyz', views.readyz, name='readyz'),
 ]
 
 
@@ -0,0 +1,67 @@
+"""攻略浏览去重
+
+每个访客（登录用户按用户ID，游客按IP+UA摘要）在缓存中保存一个定长布隆过滤器，
+记录已计入浏览量的攻略。与逐篇写入 session 相比：
+- 占用固定 1KB，不随浏览篇数增长；
+- 不修改 session，浏览详情页不再触发 django_session 写入；
+- 误判只会导致极少数重复浏览不计数（容量内误判率约0.2%），写满后自动重置。
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from .ratelimit import client_ip
+
+BLOOM_BITS = 8192
+BLOOM_HASHES = 4
+BLOOM_CAPACITY = 500
+VIEW_WINDOW = 60 * 60 * 24  # 24小时内重复浏览不重复计数
+
+
+class BloomFilter:
+    """定长布隆过滤器（双重哈希）"""
+
+    def __init__(self, bits=BLOOM_BITS, hashes=BLOOM_HASHES, data=None, count=0):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray(bits // 8)
+        self.count = count
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        return all(self.data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.data[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+
+def viewer_key(request):
+    if request.user.is_authenticated:
+        return f'viewed:u{request.user.pk}'
+    ip = client_ip(request)
+    agent = request.META.get('HTTP_USER_AGENT', '')
+    return 'viewed:a' + hashlib.blake2b(f'{ip}|{agent}'.encode(), digest_size=12).hexdigest()
+
+
+def mark_viewed(request, guide_id):
+    """记录一次浏览，首次浏览返回True（应计入浏览量）"""
+    key = viewer_key(request)
+    stored = cache.get(key)
+    if stored is not None and stored[1] < BLOOM_CAPACITY:
+        bloom = BloomFilter(data=stored[0], count=stored[1])
+    else:
+        bloom = BloomFilter()
+
+    if guide_id in bloom:
+        return False
+
+    bloom.add(guide_id)
+    cache.set(key, (bytes(bloom.data), bloom.count), VIEW_WINDOW)
+    return True
@@ -1,19 +1,29 @@
+import logging
+
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, F  # 添加F导入
-from django.views.decorators.cache import cache_page
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_page, never_cache
 from django.utils import timezone
-from datetime import timedelta
 from django.db import models  # 添加models导入
 
 
 from django.contrib.auth.forms import AuthenticationForm
 
+from . import autocomplete, images
+from .chatfilter import check_message
+from .chatread import mark_read
 from .models import Guide, ChatMessage
 from .forms import RegisterForm, LoginForm, GuideForm
+from .ratelimit import hit, ratelimit, request_ident
+from .viewdedup import mark_viewed
+from .warmup import check_cache, check_database, warmup
+
+logger = logging.getLogger(__name__)
 
 def home(request):
     """主页 - 显示所有攻略列表（支持搜索和分页）"""
@@ -21,8 +31,8 @@ def home(request):
     search_query = request.GET.get('q', '')
     sort_by = request.GET.get('sort', '-created_at')
     
-    # 基础查询集，使用select_related优化查询
-    guides = Guide.objects.select_related('author')
+    # 基础查询集，使用select_related优化查询；列表只展示摘要，不加载正文
+    guides = Guide.objects.select_related('author').defer('content', 'content_html')
     
     # 搜索功能
     if search_query:
@@ -33,7 +43,7 @@ def home(request):
         )
     
     # 排序
-    valid_sort_fields = ['-created_at', 'created_at', 'title', '-title']
+    valid_sort_fields = ['-created_at', 'created_at', 'title', '-title', '-hot_score']
     if sort_by in valid_sort_fields:
         guides = guides.order_by(sort_by)
     
@@ -69,10 +79,14 @@ def register(request):
     
     return render(request, 'register.html', {'form': form})
 
+@ratelimit('login', key='ip', block=False)
 def user_login(request):
-    """用户登录（增强安全性）"""
+    """用户登录（增强安全性，按IP限流）"""
     if request.method == 'POST':
         form = LoginForm(data=request.POST)
+        if request.limited:
+            messages.error(request, '登录尝试太频繁，请稍后再试')
+            return render(request, 'login.html', {'form': form}, status=429)
         if form.is_valid():
             user = form.get_user()
             
@@ -126,13 +140,8 @@ def add_guide(request):
         form = GuideForm(request.POST)
         if form.is_valid():
             try:
-                # 检查是否短时间内重复提交
-                recent_guides = Guide.objects.filter(
-                    author=request.user,
-                    created_at__gte=timezone.now() - timedelta(minutes=1)
-                )
-                
-                if recent_guides.exists():
+                # 检查是否短时间内重复提交（基于缓存计数，不查询数据库）
+                if not hit('add_guide', request_ident(request)).allowed:
                     messages.warning(request, '发布太频繁了，请稍后再试')
                     return render(request, 'add_guide.html', {'form': form})
                 
@@ -153,20 +162,29 @@ def add_guide(request):
 def guide_detail(request, pk):
     """攻略详情页"""
     try:
-        guide = Guide.objects.select_related('author').get(pk=pk)
+        guide = Guide.objects.select_related('author').defer('content').get(pk=pk)
         
-        # 增加浏览量（简单实现）
-        if not request.session.get(f'viewed_guide_{pk}'):
+        # 增加浏览量（去重状态保存在缓存中的布隆过滤器，不写session）
+        if mark_viewed(request, pk):
             Guide.objects.filter(pk=pk).update(
-                views=models.F('views') + 1
+                views=models.F('views') + 1,
+                changed_at=timezone.now()
             )
-            request.session[f'viewed_guide_{pk}'] = True
+        
+        # 优先使用离线推荐索引，新攻略尚未建立索引时退回作者的其他攻略
+        related_guides = list(
+            Guide.objects.filter(recommended_for__guide_id=pk)
+            .defer('content', 'content_html')
+            .order_by('-recommended_for__score')[:5]
+        )
+        if not related_guides:
+            related_guides = Guide.objects.filter(
+                author=guide.author
+            ).exclude(pk=pk).defer('content', 'content_html')[:5]
         
         context = {
             'guide': guide,
-            'related_guides': Guide.objects.filter(
-                author=guide.author
-            ).exclude(pk=pk)[:5]
+            'related_guides': related_guides
         }
         
         return render(request, 'guide_detail.html', context)
@@ -180,7 +198,7 @@ def my_guides(request):
     """我的攻略列表"""
     guides = Guide.objects.filter(
         author=request.user
-    ).order_by('-created_at')
+    ).defer('content', 'content_html').order_by('-created_at')
     
     paginator = Paginator(guides, 10)
     page_number = request.GET.get('page')
@@ -210,6 +228,8 @@ def chat_room(request, room_name='general'):
     messages = ChatMessage.objects.select_related('sender').filter(
         room_name=room_name
     ).order_by('-timestamp')[:50][::-1]  # 反转顺序，使最新的消息在底部
+    if messages:
+        mark_read(request.user.id, room_name, max(message.id for message in messages))
     
     # 获取所有活跃的聊天室
     active_rooms = ChatMessage.objects.values_list('room_name', flat=True).distinct()
@@ -224,16 +244,25 @@ def chat_room(request, room_name='general'):
 
 
 @login_required
+@ratelimit('chat_send')
 def send_message(request, room_name='general'):
     """发送聊天消息"""
     if request.method == 'POST':
         content = request.POST.get('content', '').strip()
         
         if content:
+            # 过滤违规内容：拒绝词直接退回，其余命中词用*遮盖
+            result = check_message(content)
+            if result.rejected:
+                return render(request, 'chat/message_item.html', {
+                    'message': None,
+                    'error': '消息包含违规内容，未发送'
+                }, status=400)
+            
             # 创建新消息
             new_message = ChatMessage.objects.create(
                 sender=request.user,
-                content=content,
+                content=result.text,
                 room_name=room_name
             )
             
@@ -250,19 +279,20 @@ def send_message(request, room_name='general'):
 @login_required
 def get_messages(request, room_name='general'):
     """获取最新的聊天消息（用于AJAX轮询）"""
-    last_message_id = request.GET.get('last_id', 0)
+    try:
+        last_message_id = int(request.GET.get('last_id', 0))
+    except ValueError:
+        last_message_id = 0
     
     # 获取最新的消息
-    new_messages = ChatMessage.objects.select_related('sender').filter(
+    new_messages = list(ChatMessage.objects.select_related('sender').filter(
         room_name=room_name,
         id__gt=last_message_id
-    ).order_by('created_at')
+    ).order_by('id'))
     
-    # 标记消息为已读
-    if new_messages.exists():
-        ChatMessage.objects.filter(
-            id__in=new_messages.values_list('id', flat=True)
-        ).update(is_read=True)
+    # 推进当前用户在该房间的已读游标（写入经缓存合并）
+    if new_messages:
+        mark_read(request.user.id, room_name, new_messages[-1].id)
     
     # 获取所有活跃的聊天室
     active_rooms = ChatMessage.objects.values_list('room_name', flat=True).distinct()
@@ -275,6 +305,7 @@ def get_messages(request, room_name='general'):
 
 
 @login_required
+@ratelimit('create_room')
 def create_room(request):
     """创建新的聊天室"""
     if request.method == 'POST':
@@ -295,4 +326,50 @@ def create_room(request):
         else:
             messages.error(request, '聊天室名称不能为空')
     
-    return redirect('guides:chat_room')
\ No newline at end of file
+    return redirect('guides:chat_room')
+
+
+def search_suggestions(request):
+    """搜索框输入联想：按前缀返回热度最高的标题、标签和作者"""
+    query = request.GET.get('q', '')
+    try:
+        limit = int(request.GET.get('limit', autocomplete.MAX_SUGGESTIONS))
+    except ValueError:
+        limit = autocomplete.MAX_SUGGESTIONS
+    return JsonResponse({'query': query, 'suggestions': autocomplete.suggest(query, limit)})
+
+
+def image_proxy(request, size, token):
+    """外链图片代理：返回缓存的固定尺寸缩略图（见 images.py）"""
+    url = images.load_token(token)
+    if size not in images.SIZES or url is None:
+        raise Http404('图片不存在')
+    return images.serve(request, url, size)
+
+
+@never_cache
+def healthz(request):
+    """存活检查：进程能处理请求即返回200，不访问数据库"""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+def readyz(request):
+    """就绪检查：完成预热且数据库、缓存可用时返回200，否则返回503"""
+    checks = {}
+    step = 'warmup'
+    try:
+        state = warmup()
+        checks['warmup'] = f"{state['templates']} templates, {state['duration']}s"
+        step = 'database'
+        check_database()
+        checks['database'] = 'ok'
+        step = 'cache'
+        check_cache()
+        checks['cache'] = 'ok'
+    except Exception:
+        # 异常详情（连接串、路径等）只写日志，不返回给未认证的探测请求
+        logger.exception('就绪检查失败：%s', step)
+        checks[step] = 'unavailable'
+        return JsonResponse({'status': 'unavailable', 'checks': checks}, status=503)
+    return JsonResponse({'status': 'ready', 'checks': checks})
@@ -0,0 +1,114 @@
+"""启动预热与就绪状态
+
+warmup() 在进程开始处理请求前完成冷启动开销：
+- 构建URL解析器；
+- 编译 guides/templates 下的全部模板（进入模板加载器缓存）；
+- 建立数据库连接；
+- 预填全站统计、首页攻略列表与排行榜首页缓存，构建输入联想索引。
+
+gunicorn --preload 时由 wsgi.py 在主进程中执行（DJANGO_WARMUP=1），fork 出的工作进程直接继承
+已编译的模板和本地内存缓存；主进程在 fork 前关闭数据库连接，工作进程各自重新连接。
+其余情况由 /readyz 在首次请求时触发。每个进程只预热一次。
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {'done': False, 'duration': None, 'templates': 0}
+
+
+def template_names():
+    """guides/templates 下全部模板的名称（相对路径）"""
+    template_dir = Path(apps.get_app_config('guides').path) / 'templates'
+    return [path.relative_to(template_dir).as_posix() for path in sorted(template_dir.rglob('*.html'))]
+
+
+def referenced_templates(template):
+    """模板中以字符串常量 {% extends %} / {% include %} 引用的模板名"""
+    names = []
+    nodelist = template.template.nodelist
+    for node in nodelist.get_nodes_by_type(ExtendsNode):
+        if isinstance(node.parent_name.var, str):
+            names.append(node.parent_name.var)
+    for node in nodelist.get_nodes_by_type(IncludeNode):
+        if isinstance(node.template.var, str):
+            names.append(node.template.var)
+    return names
+
+
+def compile_templates(names=None):
+    """编译模板并检查其引用的模板是否存在，返回 (成功编译的模板名, [(模板名, 错误)])"""
+    compiled, errors = [], []
+    for name in names if names is not None else template_names():
+        try:
+            template = get_template(name)
+            for referenced in referenced_templates(template):
+                get_template(referenced)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+            errors.append((name, e))
+        else:
+            compiled.append(name)
+    return compiled, errors
+
+
+def prime_caches():
+    from . import autocomplete, leaderboard
+    from .context_processors import get_site_stats
+    from .models import Guide
+
+    get_site_stats()
+    # 首页第一页的查询（与 views.home 相同的列），使数据库页缓存就绪
+    list(Guide.objects.select_related('author').defer('content', 'content_html')[:10])
+    for board in leaderboard.BOARDS.values():
+        board.cached_page(1)
+    autocomplete.get_index()
+
+
+def warmup(close_connections=False):
+    """执行一次预热；close_connections=True 用于 fork 前的主进程"""
+    with _lock:
+        if _state['done']:
+            return _state
+        start = time.monotonic()
+        get_resolver().url_patterns
+        reverse('guides:home')
+        compiled, errors = compile_templates()
+        for name, error in errors:
+            logger.warning('预热时模板 %s 编译失败: %s', name, error)
+        _state['templates'] = len(compiled)
+        connections['default'].ensure_connection()
+        prime_caches()
+        if close_connections:
+            connections.close_all()
+        _state['duration'] = round(time.monotonic() - start, 3)
+        _state['done'] = True
+        logger.info('预热完成：%d 个模板，耗时 %.3f 秒', _state['templates'], _state['duration'])
+        return _state
+
+
+def is_warm():
+    return _state['done']
+
+
+def check_database():
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_cache():
+    cache.set('readyz:probe', 1, 10)
+    if cache.get('readyz:probe') != 1:
+        raise RuntimeError('缓存读写失败')
@@ -1,11 +1,14 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-your-secret-key-here-change-in-production'
 
-DEBUG = True
+# 启动器的生产模式通过 DJANGO_DEBUG=0 关闭调试
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') != '0'
 
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
 
@@ -16,11 +19,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
+    'rest_framework.authtoken',
     'guides.apps.GuidesConfig',  # 注册guides应用
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'guides.staticfiles.StaticFilesMiddleware',  # DEBUG关闭时直接提供 STATIC_ROOT 中的静态文件（预压缩 + 长期缓存）
+    'guides.middleware.CompressionMiddleware',  # gzip/brotli响应压缩，需位于读写响应体的中间件之前
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -48,6 +55,17 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # 生产环境：显式使用缓存加载器（模板只读取、解析一次），并关闭模板调试信息
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['debug'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'quantumspacewar.wsgi.application'
 
 DATABASES = {
@@ -74,19 +92,51 @@ AUTH_PASSWORD_VALIDATORS = [
 # 在文件末尾添加以下优化配置
 
 # 缓存配置
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,  # 5分钟
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000,
-            'CULL_FREQUENCY': 3,
+# 限流、浏览去重、令牌失效、聊天游标、页面缓存版本等状态都保存在缓存中，
+# 多进程部署（gunicorn 多个工作进程）时必须使用进程间共享的后端，否则各进程各自计数、互不失效
+REDIS_URL = os.environ.get('DJANGO_REDIS_URL')
+MEMCACHED_LOCATION = os.environ.get('DJANGO_MEMCACHED_LOCATION')
+if REDIS_URL:
+    # 首选 Redis：incr/add 为原子操作，限流计数在并发下也准确（需安装 redis 包）
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,  # 5分钟
         }
     }
-}
+elif MEMCACHED_LOCATION:
+    # 其次 memcached（如 127.0.0.1:11211）：incr/add 同样是原子操作（需安装 pymemcache 包）
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': MEMCACHED_LOCATION,
+            'TIMEOUT': 300,  # 5分钟
+        }
+    }
+elif DEBUG:
+    # 开发服务器为单进程，使用进程内缓存即可
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 300,  # 5分钟
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000,
+                'CULL_FREQUENCY': 3,
+            }
+        }
+    }
+else:
+    # 生产模式不退回数据库缓存：每次页面访问都会写库，且 DatabaseCache.incr 不是原子操作，限流计数会丢失
+    raise ImproperlyConfigured(
+        '生产模式（DJANGO_DEBUG=0）需要进程间共享的缓存：'
+        '请设置 DJANGO_REDIS_URL（如 redis://127.0.0.1:6379/0）'
+        '或 DJANGO_MEMCACHED_LOCATION（如 127.0.0.1:11211）'
+    )
 
 # 会话配置
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'  # 读会话走缓存，只在修改时写库
 SESSION_COOKIE_AGE = 86400  # 24小时
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_SECURE = False  # 开发环境设为False，生产环境设为True
@@ -146,6 +196,70 @@ LOGGING = {
 # 分页配置
 PAGINATE_BY = 10  # 每页显示条数
 
+# 响应压缩配置
+COMPRESSION_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+
+# REST API配置
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+}
+
+# 限流配置（次数/时间单位 s、m、h、d），由 guides.ratelimit 和 api.throttling 共用
+# 应用前面的反向代理层数：0 表示直接面向客户端，只使用 REMOTE_ADDR；
+# 部署在 nginx 等之后时设为代理层数，才会读取 X-Forwarded-For
+NUM_PROXIES = int(os.environ.get('DJANGO_NUM_PROXIES', '0'))
+
+RATE_LIMITS = {
+    'add_guide': '1/m',
+    'chat_send': '20/m',
+    'create_room': '5/h',
+    'login': '10/m',
+    'assistant': '10/m',
+}
+
+# API令牌配置
+TOKEN_EXPIRE_SECONDS = 1209600  # 令牌有效期2周
+TOKEN_CACHE_TTL = 60  # 令牌→用户解析结果的进程内缓存时间（秒）
+TOKEN_CACHE_MAX_ENTRIES = 10000
+
+# 攻略助手配置（使用 Gemini 时设置 ASSISTANT_BACKEND=guides.assistant.GeminiBackend 与 GEMINI_API_KEY 环境变量）
+ASSISTANT_BACKEND = os.environ.get('ASSISTANT_BACKEND', 'guides.assistant.StubBackend')
+ASSISTANT_MODEL = 'gemini-2.5-pro'
+ASSISTANT_WORKERS = 4  # 后台生成线程数
+ASSISTANT_WAIT_SECONDS = 2  # 请求内最多等待的秒数，超时返回待处理状态由客户端轮询
+ASSISTANT_CACHE_MAX_ENTRIES = 1000
+ASSISTANT_PREFETCH_SUMMARIES = False  # 为真时新攻略发布后由后台任务预生成摘要（需运行 manage.py run_jobs，启动器的生产模式会自动启动）
+
+# 聊天过滤配置（词表格式见文件内说明）
+CHAT_FILTER_WORDS_FILE = BASE_DIR / 'guides' / 'data' / 'chat_blocklist.txt'
+CHAT_FILTER_RELOAD_INTERVAL = 5  # 检查词表文件是否修改的间隔（秒）
+
+# 外链图片代理配置（封面、头像的缩略图缓存）
+IMAGE_PROXY_FETCHER = 'guides.images.HttpFetcher'  # 本地离线开发可改为 guides.images.StubFetcher
+IMAGE_PROXY_TIMEOUT = 5  # 抓取一张外链图片的总时限（秒，含连接、重定向与读取）
+IMAGE_PROXY_MAX_SOURCE_BYTES = 5 * 1024 * 1024  # 原图大小上限
+IMAGE_PROXY_MAX_AGE = 60 * 60 * 24 * 30  # 缩略图响应的浏览器缓存时间（秒）
+IMAGE_PROXY_FAILURE_TTL = 300  # 抓取失败后暂停重试的时间（秒）
+IMAGE_CACHE_DIR = BASE_DIR / 'cache' / 'images'
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 磁盘缓存上限，超过后按最近最少使用淘汰
+
+# 重复攻略检测配置
+DUPLICATE_GUIDE_THRESHOLD = 0.8  # 估计的内容相似度（Jaccard）达到该值即视为重复
+
+# 搜索输入联想配置
+AUTOCOMPLETE_MAX_AGE = 300  # 进程内前缀索引的最长使用时间（秒），到期后重建以同步热度分
+
+# 后台任务队列配置（python manage.py run_jobs 启动工作进程）
+JOB_POLL_INTERVAL = 2  # 队列为空时的轮询间隔（秒）
+JOB_LOCK_TIMEOUT = 600  # 运行中任务的心跳超过该时间未更新视为工作进程已退出，重新入队
+JOB_HEARTBEAT_INTERVAL = 60  # 执行期间刷新锁定时间的间隔（秒），须明显小于 JOB_LOCK_TIMEOUT
+JOB_RETRY_BASE_DELAY = 10  # 失败重试的基础等待时间（秒），按2的幂次递增
+JOB_DONE_RETENTION = 60 * 60 * 24  # 已完成任务保留的时间（秒），之后由 guides.purge_jobs 清理
+JOB_FAILED_RETENTION = 60 * 60 * 24 * 7  # 失败任务保留更久，便于排查
+
 # 文件上传配置
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
@@ -168,6 +282,14 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'  # collectstatic 输出目录（DEBUG 关闭时由应用直接提供）
+
+if not DEBUG:
+    # collectstatic 生成带内容哈希的文件名、清单与 .gz/.br 预压缩文件
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'guides.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -2,4 +2,9 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quantumspacewar.settings')
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# 启动器生产模式（gunicorn --preload）在 fork 工作进程前预热，工作进程共享预热结果
+if os.environ.get('DJANGO_WARMUP') == '1':
+    from guides.warmup import warmup
+    warmup(close_connections=True)
@@ -3,7 +3,13 @@ from tkinter import ttk, messagebox
 import subprocess
 import sys
 import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
 import webbrowser
+from collections import deque
 
 # 设置编码确保中文显示正常
 import io
@@ -13,11 +19,70 @@ if hasattr(sys.stdout, 'buffer'):
 if hasattr(sys.stderr, 'buffer'):
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
+HOST = "127.0.0.1"
+PORT = 8000
+BASE_URL = f"http://{HOST}:{PORT}/"
+READY_URL = BASE_URL + "readyz"  # 就绪检查地址：预热完成且数据库、缓存可用时返回200
+READY_TIMEOUT = 60  # 等待服务器就绪的最长秒数
+POLL_INTERVAL = 200  # 就绪检查与输出刷新的间隔（毫秒）
+LOG_MAX_LINES = 500  # 启动器日志窗口保留的行数
+
+
+def production_workers():
+    """生产模式的工作进程数：2 × CPU核数 + 1"""
+    return (os.cpu_count() or 1) * 2 + 1
+
+
+def has_module(python_exe, module):
+    """检查目标解释器中是否安装了某个模块"""
+    result = subprocess.run(
+        [python_exe, "-c", f"import {module}"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return result.returncode == 0
+
+
+def build_server_command(python_exe, production):
+    """返回 (启动命令, 说明)；生产模式下没有可用的服务器时返回 (None, 错误信息)"""
+    if not production:
+        return [python_exe, "manage.py", "runserver", f"{HOST}:{PORT}"], "开发服务器（runserver）"
+
+    workers = production_workers()
+    if os.name != "nt" and has_module(python_exe, "gunicorn"):
+        # --preload 在主进程中加载应用后再 fork 工作进程，代码与只读数据在进程间写时复制共享
+        return [
+            python_exe, "-m", "gunicorn", "quantumspacewar.wsgi:application",
+            "--bind", f"{HOST}:{PORT}",
+            "--workers", str(workers),
+            "--preload",
+            "--access-logfile", "-",
+            "--error-logfile", "-",
+        ], f"gunicorn（{workers} 个工作进程）"
+    if has_module(python_exe, "waitress"):
+        # Windows 不支持 fork，使用多线程的 waitress
+        return [
+            python_exe, "-m", "waitress",
+            f"--listen={HOST}:{PORT}",
+            f"--threads={workers}",
+            "quantumspacewar.wsgi:application",
+        ], f"waitress（{workers} 个线程）"
+    return None, "生产模式需要安装 gunicorn（Linux/macOS）或 waitress（Windows）：\npip install gunicorn waitress"
+
+
+def server_ready(url=READY_URL):
+    """就绪检查返回200时返回True（503 表示仍在预热或依赖不可用）"""
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
 class AppStarter:
     def __init__(self, root):
         self.root = root
         self.root.title("量子太空杀攻略站 - 启动器")
-        self.root.geometry("600x450")
+        self.root.geometry("600x640")
         self.root.resizable(False, False)
         self.root.iconbitmap(default="")  # 可以添加图标文件
         
@@ -37,7 +102,7 @@ class AppStarter:
         self.title_label.pack(pady=(0, 20))
         
         # 创建介绍文本框
-        self.info_text = tk.Text(self.main_frame, height=15, width=60, bg="#2d2d30", fg="#e0e0e0",
+        self.info_text = tk.Text(self.main_frame, height=12, width=60, bg="#2d2d30", fg="#e0e0e0",
                                 font=("SimHei", 10), wrap=tk.WORD)
         self.info_text.pack(pady=10)
         
@@ -85,7 +150,24 @@ class AppStarter:
         self.admin_button = ttk.Button(self.button_frame, text="管理界面", command=self.visit_admin)
         self.admin_button.pack(side=tk.LEFT, padx=10)
         
+        # 生产模式：多进程服务器、关闭DEBUG（也可通过 --production 参数默认勾选）
+        self.production_var = tk.BooleanVar(value="--production" in sys.argv)
+        self.production_check = ttk.Checkbutton(
+            self.main_frame, text="生产模式（多进程服务器，关闭调试）", variable=self.production_var
+        )
+        self.production_check.pack()
+        
+        # 服务器输出
+        self.log_text = tk.Text(self.main_frame, height=8, width=60, bg="#111111", fg="#b0b0b0",
+                                font=("Consolas", 9), wrap=tk.NONE, state=tk.DISABLED)
+        self.log_text.pack(pady=10)
+        
         self.server_process = None
+        self.jobs_process = None
+        self.output_queue = queue.Queue()
+        self.status_queue = queue.Queue()  # 后台启动线程的提示与结果：(状态, 信息)
+        self.recent_output = deque(maxlen=50)
+        self.launching = False
     
     def start_server(self):
         try:
@@ -136,47 +218,192 @@ class AppStarter:
                             python_exe = path
                             break
             
-            # 启动Django服务器，并指定主机和端口
-            self.server_process = subprocess.Popen(
-                [python_exe, "manage.py", "runserver", "127.0.0.1:8000"],
-                cwd=project_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # 添加延迟以确保服务器有时间启动
-            import time
-            time.sleep(2)
+            if self.server_process and self.server_process.poll() is None:
+                messagebox.showinfo("提示", f"服务器已在运行。\n\n访问地址: {BASE_URL}")
+                return
             
-            # 检查服务器是否仍在运行
-            if self.server_process.poll() is not None:
-                # 如果进程已经退出，获取错误输出
-                stderr_output = self.server_process.stderr.read()
-                messagebox.showerror("服务器启动失败", f"服务器无法启动。错误信息:\n{stderr_output}")
-                self.server_process = None
+            production = self.production_var.get()
+            if production and not (os.environ.get("DJANGO_REDIS_URL") or os.environ.get("DJANGO_MEMCACHED_LOCATION")):
+                # 多个工作进程需要共享缓存（限流计数、页面缓存版本等），生产模式不再退回数据库缓存
+                messagebox.showerror(
+                    "启动失败",
+                    "生产模式需要 Redis 或 memcached 缓存。\n\n"
+                    "请设置环境变量 DJANGO_REDIS_URL（如 redis://127.0.0.1:6379/0）"
+                    "或 DJANGO_MEMCACHED_LOCATION（如 127.0.0.1:11211）后重新启动。"
+                )
                 return
             
-            messagebox.showinfo("成功", "服务器已启动！请保持此窗口打开以运行服务器。\n\n访问地址: http://127.0.0.1:8000/")
+            # 收集静态文件、检查依赖、轮询就绪都可能耗时数秒，放到后台线程执行，避免界面卡死
+            self.start_button.config(state=tk.DISABLED)
+            self.recent_output.clear()
+            self.launching = True
+            threading.Thread(
+                target=self._launch, args=(python_exe, project_dir, production), daemon=True
+            ).start()
+            self.root.after(POLL_INTERVAL, self._drain_output)
+            self.root.after(POLL_INTERVAL, self._check_status)
             
         except Exception as e:
             messagebox.showerror("启动失败", f"无法启动服务器: {str(e)}")
             import traceback
             traceback.print_exc()
     
+    def _launch(self, python_exe, project_dir, production):
+        """后台线程：准备并启动服务器，再等待其就绪；结果放入 status_queue，由主线程显示"""
+        try:
+            command, description = build_server_command(python_exe, production)
+            if command is None:
+                self.status_queue.put(("error", description))
+                return
+            
+            env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+            if production:
+                env["DJANGO_DEBUG"] = "0"
+                env["DJANGO_WARMUP"] = "1"
+                # 关闭DEBUG后由应用自身提供静态文件，启动前先收集到 STATIC_ROOT
+                subprocess.run([python_exe, "manage.py", "collectstatic", "--noinput", "-v", "0"],
+                               cwd=project_dir, env=env, check=True)
+                # 图片代理依赖 Pillow 生成缩略图；缺少时仍可启动（退回缓存原图），只提示用户安装
+                if not has_module(python_exe, "PIL"):
+                    self.status_queue.put(("warning", "缺少依赖 Pillow，图片代理将不生成缩略图而直接返回原图。\n\n"
+                                                      "安装方法：pip install -r requirements.txt"))
+            
+            # 启动服务器；stderr 合并到 stdout，由后台线程持续读取，避免管道缓冲区写满阻塞子进程
+            self.server_process = subprocess.Popen(
+                command,
+                cwd=project_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                env=env
+            )
+            threading.Thread(
+                target=self._read_output, args=(self.server_process.stdout,), daemon=True
+            ).start()
+            if production:
+                # 后台任务工作进程：定时任务、摘要预生成、任务表清理都由它执行
+                self.jobs_process = subprocess.Popen(
+                    [python_exe, "manage.py", "run_jobs"],
+                    cwd=project_dir,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    encoding="utf-8",
+                    errors="replace",
+                    env=env
+                )
+                threading.Thread(
+                    target=self._read_output, args=(self.jobs_process.stdout,), daemon=True
+                ).start()
+            self.output_queue.put(f"正在启动 {description} ...\n")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.status_queue.put(("error", f"无法启动服务器: {str(e)}"))
+            return
+        
+        self.status_queue.put((self._wait_until_ready(self.server_process), None))
+    
+    def _read_output(self, stream):
+        """后台线程：逐行读取服务器输出放入队列（Tk 控件只能在主线程中更新）"""
+        for line in iter(stream.readline, ""):
+            self.output_queue.put(line)
+        stream.close()
+    
+    def _drain_output(self):
+        lines = []
+        try:
+            while True:
+                lines.append(self.output_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if lines:
+            self.recent_output.extend(lines)
+            self._append_log("".join(lines))
+        if self.launching or self.server_process is not None or not self.output_queue.empty():
+            self.root.after(POLL_INTERVAL, self._drain_output)
+    
+    def _append_log(self, text):
+        self.log_text.config(state=tk.NORMAL)
+        self.log_text.insert(tk.END, text)
+        overflow = int(self.log_text.index("end-1c").split(".")[0]) - LOG_MAX_LINES
+        if overflow > 0:
+            self.log_text.delete("1.0", f"{overflow + 1}.0")
+        self.log_text.see(tk.END)
+        self.log_text.config(state=tk.DISABLED)
+    
+    def _wait_until_ready(self, process):
+        """后台线程：轮询就绪地址，代替固定时长的等待；返回 ready / exited / timeout"""
+        deadline = time.monotonic() + READY_TIMEOUT
+        while process.poll() is None:
+            if server_ready():
+                return "ready"
+            if time.monotonic() > deadline:
+                return "timeout"
+            time.sleep(POLL_INTERVAL / 1000)
+        return "exited"
+    
+    def _check_status(self):
+        """主线程：取出后台线程的启动结果并提示用户"""
+        try:
+            status, message = self.status_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(POLL_INTERVAL, self._check_status)
+            return
+        
+        if status == "warning":
+            # 仅提示，启动继续进行
+            messagebox.showwarning("缺少依赖", message)
+            self.root.after(POLL_INTERVAL, self._check_status)
+            return
+        
+        self.launching = False
+        if status == "exited":
+            # 进程已退出：稍等读取线程取完剩余输出再报告错误
+            self.root.after(POLL_INTERVAL, self._report_start_failure)
+            return
+        
+        self.start_button.config(state=tk.NORMAL)
+        if status == "ready":
+            messagebox.showinfo("成功", f"服务器已启动！请保持此窗口打开以运行服务器。\n\n访问地址: {BASE_URL}")
+        elif status == "timeout":
+            messagebox.showwarning("启动超时", f"服务器在 {READY_TIMEOUT} 秒内未就绪，请查看下方日志。")
+        else:
+            messagebox.showerror("启动失败", message)
+    
+    def _report_start_failure(self):
+        self._drain_output()
+        output = "".join(list(self.recent_output)[-20:])
+        self.server_process = None
+        self._stop_jobs()
+        self.start_button.config(state=tk.NORMAL)
+        messagebox.showerror("服务器启动失败", f"服务器无法启动。错误信息:\n{output}")
+    
     def visit_website(self):
-        webbrowser.open("http://127.0.0.1:8000/")
+        webbrowser.open(BASE_URL)
     
     def visit_admin(self):
-        webbrowser.open("http://127.0.0.1:8000/admin/")
+        webbrowser.open(BASE_URL + "admin/")
+    
+    def _stop_jobs(self):
+        if self.jobs_process:
+            try:
+                self.jobs_process.terminate()
+                self.jobs_process.wait(timeout=5)
+            except Exception:
+                self.jobs_process.kill()
+            self.jobs_process = None
     
     def on_closing(self):
         if self.server_process:
             try:
                 self.server_process.terminate()
                 self.server_process.wait(timeout=5)
-            except:
+            except Exception:
                 self.server_process.kill()
+        self._stop_jobs()
         self.root.destroy()
 
 if __name__ == "__main__":